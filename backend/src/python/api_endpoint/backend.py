@@ -1,8 +1,7 @@
 from email.header import Header
-from flask import Flask, request, jsonify, Response, make_response
-import os, random, smtplib, json, threading, base64, tempfile, urllib.request
+from flask import Flask, request, jsonify
+import os, random, smtplib, threading
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 from flask_cors import CORS
 from supabase import create_client
@@ -11,8 +10,7 @@ from concurrent.futures import ThreadPoolExecutor
 import cloudinary
 import cloudinary.uploader
 from datetime import datetime
-import pytz, cv2, requests, torch, httpx
-import numpy as np
+import pytz, httpx
 import time
 
 
@@ -56,72 +54,12 @@ executor = ThreadPoolExecutor(max_workers=3)
 smtp_lock = threading.Lock()
 smtp_pool = []
 
-# ===== Multi-cam first state =====
-
-# โมเดล/ดีเทคชัน
-current_model = None
-model_type = None               # "local" (ใช้ .pt) | "roboflow" (ถ้ามีในอนาคต)
-active_model_url = None
-RF_MIN_CONF = float(os.getenv("RF_MIN_CONF", "0.25"))
-_JPEG_QUALITY_RF = 85
-
-# เธรดฝั่งตรวจจับ
-detector_stop = threading.Event()
-detector_thread = None
-current_location_id = None
-
-# ---- Multi-cam collections ----
-# key = index ของอุปกรณ์ webcam ใน OpenCV (0,1,2,...)
-cameras = {}                    # {cam_id: cv2.VideoCapture}
-display_threads = {}            # {cam_id: Thread}
-display_stops = {}              # {cam_id: Event}
-
-latest_frame_map = {}           # {cam_id: np.ndarray | None}
-latest_jpeg_map  = {}           # {cam_id: bytes | None}
-latest_ts_map    = {}           # {cam_id: float}
-latest_lock = threading.Lock()
-
-primary_cam_id = None           # กล้องหลัก (ถ้าจะให้ detector ใช้ตัวเดียว)
-
-# ---- Legacy aliases (ให้โค้ดเดิมยังรันได้ระหว่างเปลี่ยนเป็น multi-cam) ----
-latest_frame = None             # จะถูกอัปเดตจาก cam หลัก (ถ้าจำเป็น)
-latest_jpeg  = None
-latest_ts    = 0.0
-latest_gen   = 0                # เพิ่มทุกครั้งที่ start-camera ใหม่
-
-# ---- ค่าปรับสำหรับการแสดงผล ----
-DISPLAY_FPS = 60                # 45–60 ก็พอสำหรับ USB cam ส่วนใหญ่
-JPEG_QUALITY_DISPLAY = 60       # 0–100 เท่านั้น (60–85 คือ sweet spot)
-TARGET_DISPLAY_WIDTH = 640
-
-# ไม่ enhance/ไม่ใส่ timestamp ที่ฝั่งแสดงผล (ให้ฝั่งตรวจจับทำเองถ้าต้องการ)
-APPLY_ENHANCE_FOR_DISPLAY = False
-DRAW_TS_ON_DISPLAY = False
-
-
 def _corsify(response):
     response.headers.add("Access-Control-Allow-Origin", "*")
     response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
     response.headers.add("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE,OPTIONS")
     return response
 
-def enhance_lowlight(bgr):
-    """ปรับภาพแสงน้อย: CLAHE + gamma"""
-    # CLAHE บนช่อง Y
-    ycrcb = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)
-    y, cr, cb = cv2.split(ycrcb)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    y = clahe.apply(y)
-    ycrcb = cv2.merge([y, cr, cb])
-    out = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
-
-    # gamma (>1 สว่างขึ้น)
-    gamma = 1.5
-    table = np.array([((i / 255.0) ** (1.0 / gamma)) * 255
-                      for i in np.arange(256)]).astype("uint8")
-    out = cv2.LUT(out, table)
-    return out
-
 def create_smtp_connection():
     """สร้าง SMTP connection แบบ reusable"""
     # ✅ กันเคส env ว่างจนทำให้เกิด 'NoneType'.encode() ใน smtplib
@@ -860,377 +798,10 @@ def upload_sticker_model():
         return jsonify({"error": str(e)}), 500
 
 
-def _try_open_camera_on_index(index: int):
-    """ลองเปิดกล้องด้วย backend หลายแบบบน Windows ตาม index ที่ระบุ"""
-    backends = [cv2.CAP_DSHOW, cv2.CAP_MSMF, None]
-    for be in backends:
-        try:
-            cap = cv2.VideoCapture(index, be) if be is not None else cv2.VideoCapture(index)
-            if not cap.isOpened():
-                try: cap.release()
-                except: pass
-                continue
-
-            # flush buffer
-            for _ in range(10):
-                ok, _ = cap.read()
-                if not ok:
-                    break
-
-            ok, img = cap.read()
-            if ok and img is not None and img.size > 0:
-                return cap, be
-            cap.release()
-        except Exception as e:
-            print(f"⚠️ open camera index={index} with backend {be} failed: {e}")
-    return None, None
-
-
-def _probe_cameras(max_index: int = 8) -> list[int]:
-    """สแกนหา index 0..max_index ที่เปิดได้จริง"""
-    found = []
-    for i in range(max_index + 1):
-        cap, _ = _try_open_camera_on_index(i)
-        if cap is not None:
-            found.append(i)
-            cap.release()
-    return found
-
+# route กล้องทั้งหมด (list/start/stop-camera, frame_raw, stream, camera-settings, cameras/stats, metrics,
+# camera-engines, clips) ย้ายไป FastAPI: api_endpoint/routes_camera_stream.py + api_service/camera_control.py
+# ให้มี CameraEngineClient ตัวเดียวในระบบ (สอง server เปิด engine ของตัวเองจะแย่งกล้องตัวเดียวกัน)
 
-@app.get("/list-cameras")
-def list_cameras():
-    """คืนลิสต์ index ของกล้องที่เปิดได้ (ดีฟอลต์ตัด index 0 ออกเพื่อหลีกเลี่ยงกล้องโน้ตบุ๊ก)"""
-    usb_only = request.args.get("usb_only", "1") == "1"
-    found = _probe_cameras(8)
-    cams = [i for i in found if (not usb_only or i != 0)] or found
-    return _corsify(jsonify({"available": cams}))
-
-
-
-@app.route("/start-camera", methods=["POST", "OPTIONS"])
-def start_camera():
-    if request.method == "OPTIONS":
-        return _corsify(make_response(("", 200)))
-
-    global detector_thread, detector_stop, current_location_id
-    global primary_cam_id, latest_gen
-
-    data = request.get_json() or {}
-    location_id = data.get("location_id")
-    cam_indices = data.get("camera_indices")            # optional: [1,2,...]
-    usb_only    = bool(data.get("usb_only", True))      # ดีฟอลต์ True = ตัด 0 ทิ้ง
-
-    if not location_id:
-        return _corsify(jsonify({"error": "location_id is required"})), 400
-
-    # --- เช็กโมเดล is_active (คง logic เดิมไว้ตามไฟล์ปัจจุบันของคุณ) ---
-    try:
-        model_res = (
-            supabase.table("model")
-            .select("model_url")
-            .eq("location_id", location_id)
-            .eq("is_active", True)
-            .limit(1)
-            .execute()
-        )
-    except Exception as e:
-        return _corsify(jsonify({"error": f"DB error: {e}"})), 500
-
-    if not model_res.data or not (model_res.data[0].get("model_url") or "").strip():
-        return _corsify(jsonify({
-            "error": "No active model for this location.",
-            "code": "NO_ACTIVE_MODEL"
-        })), 401
-
-    # --- เลือกกล้องที่จะเปิด ---
-    if not cam_indices:
-        probed = _probe_cameras(8)
-        cam_indices = [i for i in probed if (not usb_only or i != 0)] or probed
-    if not cam_indices:
-        return _corsify(jsonify({"error": "No webcam found"})), 404
-
-    # --- ปิดของเก่าทั้งหมด (display threads + cameras) ---
-    for ev in list(display_stops.values()):
-        try: ev.set()
-        except: pass
-    for th in list(display_threads.values()):
-        try:
-            if th and th.is_alive():
-                th.join(timeout=1)
-        except: pass
-    display_threads.clear()
-    display_stops.clear()
-
-    for cid, cap in list(cameras.items()):
-        try:
-            if cap and cap.isOpened():
-                cap.release()
-        except: pass
-        cameras.pop(cid, None)
-
-    # --- เปิดทุกกล้องตามรายการ + ตั้งค่า ---
-    opened = []
-    for idx in cam_indices:
-        cap, be = _try_open_camera_on_index(idx)
-        if cap is None:
-            print(f"⚠️ open camera {idx} failed"); continue
-
-        # พยายาม 1280x720@60 ถ้าไม่ไหวลดเป็น 640x480@60
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        cap.set(cv2.CAP_PROP_FPS, 60)
-        try:
-            fps = cap.get(cv2.CAP_PROP_FPS) or 0
-        except Exception:
-            fps = 0
-        if fps < 59:
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            cap.set(cv2.CAP_PROP_FPS, 60)
-
-        for _ in range(12):  # flush หลังตั้งค่า
-            cap.read()
-
-        cameras[idx] = cap
-        display_stops[idx] = threading.Event()
-        th = threading.Thread(target=display_worker, args=(idx,), daemon=True)
-        th.start()
-        display_threads[idx] = th
-        opened.append(idx)
-        print(f"✅ Camera opened index={idx}, backend={be}")
-
-    if not opened:
-        return _corsify(jsonify({"error": "Unable to open any webcam"})), 500
-
-    # กล้องหลัก (สำหรับ detector) = ตัวแรกในลิสต์
-    primary_cam_id = opened[0]
-
-    # รีเซ็ตบัฟเฟอร์ภาพทั้งหมด
-    with latest_lock:
-        for cid in opened:
-            latest_frame_map[cid] = None
-            latest_jpeg_map[cid]  = None
-            latest_ts_map[cid]    = 0.0
-        latest_gen += 1
-
-    current_location_id = location_id
-
-    # รีสตาร์ต detection worker
-    try:
-        if detector_thread and detector_thread.is_alive():
-            detector_stop.set()
-            detector_thread.join(timeout=1)
-    except Exception:
-        pass
-    detector_stop = threading.Event()
-    detector_thread = threading.Thread(target=detection_worker, daemon=True)
-    detector_thread.start()
-
-    base = request.host_url.rstrip("/")
-    streams = [f"{base}/frame_raw?cam={cid}" for cid in opened]
-
-    return _corsify(jsonify({
-        "message": "Cameras started",
-        "opened": opened,
-        "streams": streams,
-        "location_id": current_location_id,
-        "generation": latest_gen
-    })), 200
-
-
-
-# ------------------------- STOP CAMERA ----------------------------------------
-@app.route("/stop-camera", methods=["POST", "OPTIONS"])
-def stop_camera():
-    if request.method == "OPTIONS":
-        return _corsify(make_response(("", 200)))
-
-    global primary_cam_id, detector_thread
-
-    # stop display threads
-    for ev in list(display_stops.values()):
-        try: ev.set()
-        except: pass
-    for th in list(display_threads.values()):
-        try:
-            if th and th.is_alive():
-                th.join(timeout=1)
-        except: pass
-    display_threads.clear()
-    display_stops.clear()
-
-    # release cameras
-    for cid, cap in list(cameras.items()):
-        try:
-            if cap and cap.isOpened():
-                cap.release()
-        except: pass
-        cameras.pop(cid, None)
-
-    # stop detection worker
-    try:
-        detector_stop.set()
-        if detector_thread and detector_thread.is_alive():
-            detector_thread.join(timeout=1)
-    except Exception:
-        pass
-    detector_thread = None
-
-    # clear buffers
-    with latest_lock:
-        latest_frame_map.clear()
-        latest_jpeg_map.clear()
-        latest_ts_map.clear()
-
-    primary_cam_id = None
-
-    # reset model/session flags (คงตามไฟล์เดิมของคุณ)
-    # current_model = None; model_type = None; active_model_url = None
-    # current_location_id = None
-
-    return _corsify(jsonify({"message": "Cameras stopped"})), 200
-
-
-def display_worker(cam_id: int):
-    """
-    อ่านกล้อง cam_id → resize → (optional enhance) → encode JPEG
-    อัปเดต latest_*_map[cam_id]; ถ้าเป็น cam หลัก อัปเดต alias legacy ด้วย
-    """
-    fps_interval = 1.0 / max(1.0, DISPLAY_FPS)
-
-    while not display_stops[cam_id].is_set():
-        try:
-            cap = cameras.get(cam_id)
-            if cap is None or not cap.isOpened():
-                time.sleep(0.02); continue
-
-            ok, img = cap.read()
-            if not ok or img is None or img.size == 0:
-                time.sleep(0.005); continue
-
-            h, w = img.shape[:2]
-            if TARGET_DISPLAY_WIDTH > 0 and w > TARGET_DISPLAY_WIDTH:
-                r = TARGET_DISPLAY_WIDTH / float(w)
-                img = cv2.resize(img, (TARGET_DISPLAY_WIDTH, int(h*r)), interpolation=cv2.INTER_AREA)
-
-            disp = enhance_lowlight(img) if APPLY_ENHANCE_FOR_DISPLAY else img
-
-            ok2, buf = cv2.imencode(".jpg", disp, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY_DISPLAY])
-            if ok2:
-                now = time.time()
-                with latest_lock:
-                    latest_frame_map[cam_id] = disp
-                    latest_jpeg_map[cam_id]  = buf.tobytes()
-                    latest_ts_map[cam_id]    = now
-                    # อัปเดต alias legacy ให้โค้ดเก่าไม่พัง (ใช้ cam หลักเท่านั้น)
-                    if primary_cam_id == cam_id:
-                        global latest_frame, latest_jpeg, latest_ts
-                        latest_frame = disp
-                        latest_jpeg  = latest_jpeg_map[cam_id]
-                        latest_ts    = now
-
-            time.sleep(fps_interval)
-
-        except Exception as e:
-            print(f"display worker error (cam {cam_id}):", e)
-            time.sleep(0.01)
-
-
-
-# --- NEW: background detection worker (no overlay on image) ---
-def detection_worker():
-    """
-    ดึงภาพจากกล้องหลัก (primary_cam_id) ผ่าน latest_frame_map แล้วทำ inference
-    """
-    global model_type, active_model_url, current_model, current_location_id
-
-    while not detector_stop.is_set():
-        try:
-            with latest_lock:
-                pid = primary_cam_id
-                img = None if pid is None else latest_frame_map.get(pid)
-                img = None if img is None else img.copy()
-
-            if img is None:
-                time.sleep(0.02)
-                continue
-
-            enhanced = enhance_lowlight(img)
-
-            if model_type == "roboflow" and active_model_url:
-                rf_url = f"{active_model_url}&confidence={RF_MIN_CONF}&overlap=20"
-                _, buf = cv2.imencode(".jpg", enhanced, [int(cv2.IMWRITE_JPEG_QUALITY), _JPEG_QUALITY_RF])
-                b64 = base64.b64encode(buf).decode("utf-8")
-                r = requests.post(rf_url, json={"image": b64}, timeout=8)
-                _ = r.json().get("predictions", [])
-                # TODO: บันทึกผลตามต้องการ
-
-            elif model_type == "local" and current_model is not None:
-                _ = current_model(enhanced)
-                # TODO: แปลงผล/บันทึก
-
-            time.sleep(0.20)  # ~5Hz
-
-        except Exception as e:
-            print("infer worker error:", e)
-            time.sleep(0.2)
-
-
-
-@app.route("/frame_raw", methods=["GET", "OPTIONS"])
-def frame_raw():
-    """
-    ส่ง JPEG เฟรมล่าสุดของกล้องที่เลือก (?cam=<id>)
-    รองรับ min_ts/min_gen และรอสั้นๆ เพื่อให้ได้เฟรมสด
-    """
-    if request.method == "OPTIONS":
-        return _corsify(make_response(("", 200)))
-
-    def _jpeg_resp(b: bytes, generation=None):
-        resp = make_response(b, 200)
-        resp.mimetype = "image/jpeg"
-        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-        resp.headers["Pragma"] = "no-cache"
-        resp.headers["Expires"] = "0"
-        if generation is not None:
-            resp.headers["X-Frame-Generation"] = str(generation)
-        return _corsify(resp)
-
-    try:
-        cam_id = int(request.args.get("cam", str(primary_cam_id if primary_cam_id is not None else 0)))
-    except Exception:
-        cam_id = primary_cam_id if primary_cam_id is not None else 0
-
-    try:
-        min_ts = float(request.args.get("min_ts", "0"))
-    except Exception:
-        min_ts = 0.0
-
-    try:
-        min_gen = int(request.args.get("min_gen", "0"))
-    except Exception:
-        min_gen = 0
-
-    max_wait_sec = 0.30
-    staleness_limit = 0.5
-    deadline = time.time() + max_wait_sec
-
-    while time.time() < deadline:
-        with latest_lock:
-            data = latest_jpeg_map.get(cam_id)
-            ts   = latest_ts_map.get(cam_id, 0.0)
-            gen  = latest_gen
-
-        if (data and ts > min_ts and gen >= min_gen and (time.time() - ts) <= staleness_limit):
-            return _jpeg_resp(data, gen)
-        time.sleep(0.01)
-
-    # fallback: placeholder
-    black = np.zeros((480, 640, 3), dtype=np.uint8)
-    cv2.putText(black, f"WAITING... CAM {cam_id}", (50, 240),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-    ok2, jpg = cv2.imencode(".jpg", black, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-    return _jpeg_resp(jpg.tobytes() if ok2 else black.tobytes())
 
 # 🚀 เพิ่ม cleanup เมื่อปิด app
 @app.teardown_appcontext
@@ -1251,4 +822,4 @@ def index():
 
 if __name__ == "__main__":
     print(app.url_map)
-    app.run(debug=True) 
\ No newline at end of file
+    app.run(debug=True)
@@ -3,10 +3,13 @@ from fastapi import APIRouter, File, UploadFile, HTTPException, Form
 from typing import Literal
 from ..utils.cloudinary_uploader import CloudinaryUploader
 # from ..utils.sticker_detector import get_sticker_detector
-from ..api_service.ai4thai_ocr_LP_api import recognize_license_plate
-from ..utils.processor import insert_detection_payload
+from ..api_service.plate_ocr import recognize_plates
+from ..api_service.ai4thai_ocr_LP_api import get_ocr_client
+from ..utils.ocr_cache import get_ocr_cache
+from ..utils.ocr_quota import get_ocr_quota, PRIORITY_HIGH, PRIORITY_LOW
+from ..api_service.ocr_engines import get_ocr_chain
 from ..utils.sticker_model_loader import get_yolo_model_for_location, detect_sticker_from_bytes
-from ..api_service.notifications_service import create_from_detection
+from ..api_service.detection_pipeline import insert_and_notify
 from ..utils.sticker_model_loader import resolve_model_local_path_for_location
 import os, asyncio, numpy as np, cv2
 from concurrent.futures import ProcessPoolExecutor
@@ -43,6 +46,13 @@ def _yolo_predict_bytes(image_bytes: bytes, model_path: str, conf: float, iou: f
         "confident": max(confs) if confs else 0.0
     }
 
+def _cancel_pending(*tasks: "asyncio.Future") -> None:
+    for t in tasks:
+        if not t.done():
+            t.cancel()
+        elif not t.cancelled():
+            t.exception()   # อ่าน exception ทิ้ง กัน "Task exception was never retrieved"
+
 @router.post("/detect")
 async def detect(
     file: UploadFile = File(...),
@@ -54,23 +64,31 @@ async def detect(
         # 1) รับไฟล์เป็น bytes
         image_bytes = await file.read()
 
-        # 2) อัปโหลดขึ้น Cloudinary -> ใช้ threadpool กันบล็อก event loop
-        uploader = CloudinaryUploader()
-        image_url = await run_in_threadpool(uploader.upload_bytes, image_bytes, folder="detection")
-
-        # 3) เตรียมค่า YOLO + หาพาธโมเดลของ location
+        # 2) หาพาธโมเดลของ location + เตรียมค่า YOLO ก่อน (ไม่มีโมเดล/โหลดพัง → ยังไม่ได้เริ่มงาน upload/OCR)
         model_path = resolve_model_local_path_for_location(location_id)
         conf = float(os.getenv("STICKER_CONF", "0.50"))
         iou  = float(os.getenv("STICKER_IOU", "0.50"))
+        uploader = CloudinaryUploader()
 
-        # 4) เรียก YOLO ผ่าน ProcessPoolExecutor (multiprocessing)
-        loop = asyncio.get_running_loop()
-        sticker = await loop.run_in_executor(
-            EXECUTOR, _yolo_predict_bytes, image_bytes, model_path, conf, iou
-        )
-
-        # 5) OCR (ใช้ threadpool)
-        ocr = await run_in_threadpool(recognize_license_plate, image_url)
+        # 3) อัปโหลดขึ้น Cloudinary (threadpool) กับ OCR จาก bytes ที่มีอยู่แล้ว ยิงพร้อมกัน
+        #    (ไม่ต้องรอ upload เสร็จแล้วดาวน์โหลดภาพกลับมาจาก URL เพื่อส่ง OCR)
+        upload_task = asyncio.ensure_future(
+            run_in_threadpool(uploader.upload_bytes, image_bytes, folder="detection"))
+        ocr_task = asyncio.ensure_future(recognize_plates(
+            jpeg=image_bytes, location_id=location_id,
+            priority=PRIORITY_LOW if direction == "out" else PRIORITY_HIGH))
+        try:
+            # 4) เรียก YOLO ผ่าน ProcessPoolExecutor (multiprocessing)
+            loop = asyncio.get_running_loop()
+            sticker = await loop.run_in_executor(
+                EXECUTOR, _yolo_predict_bytes, image_bytes, model_path, conf, iou
+            )
+
+            # 5) รอผล upload + OCR (ตัดเฉพาะป้ายถ้ามีโมเดลป้าย, client มี timeout/retry/hedging ในตัว)
+            image_url, ocr = await asyncio.gather(upload_task, ocr_task)
+        finally:
+            # YOLO หรืองานใดงานหนึ่งพัง → ยกเลิกงานที่ยังค้าง ไม่ปล่อย task ลอยอยู่หลังตอบ request ไปแล้ว
+            _cancel_pending(upload_task, ocr_task)
 
         # 6) ประกอบ payload + บันทึกลง DB (ใช้ threadpool)
         payload = {
@@ -83,32 +101,31 @@ async def detect(
             "sticker_result": sticker,  # เก็บไว้ใน meta ถ้าต้องการ
         }
         
-        inserted_resp = await run_in_threadpool(insert_detection_payload, payload)
-        inserted_row = None
-        if hasattr(inserted_resp, "data"):
-            data = inserted_resp.data or []
-            inserted_row = data[0] if isinstance(data, list) and data else data
-        elif isinstance(inserted_resp, dict) and "data" in inserted_resp:
-            data = inserted_resp["data"] or []
-            inserted_row = data[0] if isinstance(data, list) and data else data
-        elif isinstance(inserted_resp, list):
-            inserted_row = inserted_resp[0] if inserted_resp else None
-        else:
-            inserted_row = inserted_resp  # เผื่อฟังก์ชันของคุณคืน row ตรง ๆ
-
-        if not inserted_row:
-            raise HTTPException(status_code=500, detail="Insertion returned empty data")
-
-        # ถ้าฟังก์ชันสร้าง notification ต้องใช้ detections_id ให้ส่ง inserted_row เข้าไป
-        notif_resp = await run_in_threadpool(create_from_detection, inserted_row)
+        # insert + notification ใช้ขั้นตอนเดียวกับกล้องสด (api_service/detection_pipeline.py)
+        try:
+            inserted_row, notification = await run_in_threadpool(insert_and_notify, payload)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
         return {
             "ok": True,
             "detection": inserted_row,
-            "notification": getattr(notif_resp, "data", notif_resp),
+            "notification": notification,
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal error: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal error: {e}")
+
+
+@router.get("/ocr/stats")
+def ocr_stats():
+    """ตัวนับของ OCR engine (remote/local), client (retry/hedge/latency), OCR cache (hit/miss) และการใช้โควตาต่อสถานที่ของ process นี้"""
+    cache = get_ocr_cache()
+    return {
+        "engines": get_ocr_chain().stats(),
+        "client": get_ocr_client().stats(),
+        "cache": cache.stats() if cache is not None else None,
+        "quota": get_ocr_quota().stats(),
+    }
@@ -1,5 +1,6 @@
 # main.py - FastAPI application for Automated Vehicle Tagging System
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -15,13 +16,23 @@ from .router_camera import router as camera_router
 from .routes_models_noti import router as models_router
 from .routes_notifications_permission import router as permissions_router
 from .router_upload_model import router as upload_sticker
+from .routes_camera_stream import router as camera_stream_router, shutdown_cameras
+from ..api_service.ai4thai_ocr_LP_api import get_ocr_client
 
 
 APP_ENV = os.getenv("APP_ENV", "Development for Programer").lower()
 docs_url = None if APP_ENV == "production" else "/docs"
 redoc_url = None if APP_ENV == "production" else "/redoc"
 
-app = FastAPI(title="Automated Vehicle Tagging System API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_cameras()
+    await get_ocr_client().aclose()   # ปิด connection pool ของ OCR (async)
+
+
+app = FastAPI(title="Automated Vehicle Tagging System API", lifespan=lifespan)
 
 # Routers
 app.include_router(overview_router, tags=["overview"])
@@ -35,6 +46,7 @@ app.include_router(camera_router, prefix="/camera", tags=["camera"])
 app.include_router(models_router, prefix="/model", tags=["model"])
 app.include_router(upload_sticker, prefix="/upload", tags=["upload"])
 app.include_router(permissions_router, tags=["permissions"])
+app.include_router(camera_stream_router, tags=["camera-stream"])
 
 @app.get("/")
 def root():
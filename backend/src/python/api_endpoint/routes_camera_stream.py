@@ -0,0 +1,261 @@
+# api_endpoint/routes_camera_stream.py - ควบคุมกล้อง + ส่งภาพสด + สถานะ engine/คลิป (route กล้องทั้งหมดของระบบอยู่ที่นี่ที่เดียว)
+# - logic เปิด/ปิด/สแกนกล้องอยู่ใน api_service/camera_control.py; ไฟล์นี้แค่แปลง request/response
+# - start/stop/list เป็น def ธรรมดา (FastAPI รันใน threadpool เพราะเรียก DB / รอ engine process)
+# - /frame_raw และ /stream เป็น async อ่านเฟรมผ่าน FrameBroadcaster: viewer ที่รอเฟรมเป็นแค่ coroutine ไม่ถือ thread
+import threading
+from dataclasses import asdict
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from ..utils.jpeg_tiers import DEFAULT_TIERS
+from ..utils.adaptive_quality import DEFAULT_LADDER
+from ..utils.placeholder_frames import placeholder_jpeg, RETRY_AFTER, STATE_STOPPED, STATE_STALLED
+from ..api_service.camera_engine import get_camera_engine
+from ..api_service.frame_broadcast import FrameBroadcaster
+from ..api_service import camera_control
+from ..api_service.camera_control import CameraControlError
+
+router = APIRouter()
+
+FRAME_MAX_WAIT = 0.30
+FRAME_STALENESS = 0.5
+
+_broadcaster: Optional[FrameBroadcaster] = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster() -> FrameBroadcaster:
+    # สร้างตอนใช้ครั้งแรก (ไม่สร้าง CameraEngineClient ตอน import)
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = FrameBroadcaster(get_camera_engine())
+        return _broadcaster
+
+
+# ---------- Models ----------
+class StartCameraRequest(BaseModel):
+    location_id: Optional[str] = None
+    camera_indices: Optional[List[int]] = None
+    sources: Optional[Union[List[Any], str, dict]] = None
+    usb_only: bool = True
+    group: Optional[str] = None
+
+
+class StopCameraRequest(BaseModel):
+    group: Optional[str] = None
+
+
+class CameraSettingsRequest(BaseModel):
+    cam_id: int
+    level: Optional[int] = None   # None = กลับไปปรับอัตโนมัติ
+
+
+class UploadClipsRequest(BaseModel):
+    limit: int = 10
+
+
+def _error(status: int, message: str, **extra) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": message, **extra})
+
+
+def _control_error(e: CameraControlError) -> JSONResponse:
+    return _error(e.status, e.message, **e.extra)
+
+
+# ---------- LIST ----------
+@router.get("/list-cameras")
+def list_cameras(usb_only: bool = True, refresh: bool = False):
+    """index ของกล้องที่เปิดได้ (ดีฟอลต์ตัด index 0 ออกเพื่อหลีกเลี่ยงกล้องโน้ตบุ๊ก)"""
+    return camera_control.list_cameras(usb_only=usb_only, refresh=refresh)
+
+
+# ---------- START ----------
+@router.post("/start-camera")
+def start_camera(body: StartCameraRequest, request: Request):
+    try:
+        result = camera_control.start_cameras(
+            body.location_id, group=body.group, camera_indices=body.camera_indices,
+            sources=body.sources, usb_only=body.usb_only)
+    except CameraControlError as e:
+        return _control_error(e)
+
+    base = str(request.base_url).rstrip("/")
+    return {
+        "message": "Cameras started",
+        **result,
+        "streams": [f"{base}/frame_raw?cam={cid}" for cid in result["opened"]],
+        "mjpeg": [f"{base}/stream?cam={cid}" for cid in result["opened"]],
+    }
+
+
+# ---------- STOP ----------
+@router.post("/stop-camera")
+def stop_camera(body: Optional[StopCameraRequest] = None):
+    # ไม่ระบุ group = หยุดทุกกลุ่ม (process ปิดต่อเบื้องหลัง ไม่ถือ request thread)
+    camera_control.stop_cameras(body.group if body else None)
+    return {"message": "Cameras stopped"}
+
+
+# ---------- SETTINGS / STATS ----------
+@router.get("/camera-settings")
+def camera_settings():
+    """ระดับคุณภาพปัจจุบันต่อกล้อง (fps / width / jpeg quality / infer Hz / lag / cpu)"""
+    return {
+        "groups": get_camera_engine().settings(),
+        "levels": [asdict(q) for q in DEFAULT_LADDER],
+    }
+
+
+@router.post("/camera-settings")
+def pin_camera_settings(body: CameraSettingsRequest):
+    """{"cam_id": 1, "level": 2} → ล็อกกล้องที่ระดับ 2 (0 = สูงสุด), level null → กลับไปปรับอัตโนมัติ"""
+    try:
+        ok = get_camera_engine().pin_quality(body.cam_id, body.level)
+    except ValueError as e:
+        return _error(400, f"invalid request: {e}")
+    if not ok:
+        return _error(404, f"camera {body.cam_id} is not running")
+    return {"cam_id": body.cam_id, "level": body.level, "auto": body.level is None}
+
+
+@router.get("/cameras/stats")
+def cameras_stats():
+    """grab fps, เฟรมหลุด, เวลา encode/inference, lag, อายุเฟรมล่าสุด ต่อกล้อง (แยกตามกลุ่ม engine)"""
+    return {"groups": get_camera_engine().stats(),
+            "primary_cam_id": camera_control.state()["primary_cam_id"]}
+
+
+@router.get("/metrics")
+def metrics():
+    """ค่าเดียวกับ /cameras/stats ในรูปแบบ Prometheus"""
+    return Response(get_camera_engine().metrics_text(),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/camera-engines")
+def camera_engines(limit: int = Query(50, ge=1, le=200)):
+    """สถานะ engine process ต่อกลุ่ม + event ล่าสุด (started/vehicle_pass/error/crashed)"""
+    engine = get_camera_engine()
+    return {"groups": engine.groups(), "events": engine.events(limit)}
+
+
+# ---------- CLIPS ----------
+@router.get("/clips")
+def list_clips(
+    location_id: Optional[str] = None,
+    detection_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """ดัชนีคลิปก่อน/หลังเหตุการณ์"""
+    try:
+        return {"clips": camera_control.list_clips(location_id, detection_id, limit)}
+    except CameraControlError as e:
+        return _control_error(e)
+
+
+@router.post("/clips/upload")
+def upload_clips(body: Optional[UploadClipsRequest] = None):
+    """อัปโหลดคลิปที่ยังไม่ขึ้น Cloudinary (ทีละไม่เกิน limit)"""
+    try:
+        return {"uploaded": camera_control.upload_clips(body.limit if body else 10)}
+    except CameraControlError as e:
+        return _control_error(e)
+
+
+# ---------- FRAMES ----------
+_NO_STORE = {
+    "Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
+
+def _jpeg_resp(data: bytes, generation: int, seq: int) -> Response:
+    return Response(data, media_type="image/jpeg", headers={
+        **_NO_STORE,
+        "X-Camera-State": "live",
+        "X-Frame-Generation": str(generation),
+        "X-Frame-Seq": str(seq),
+    })
+
+
+def _placeholder_resp(request: Request, cam_id: int, state: str) -> Response:
+    # render ครั้งเดียวต่อ (กล้อง, สถานะ); client ที่ส่ง If-None-Match มาได้ 304
+    data, etag = placeholder_jpeg(cam_id, state)
+    headers = {
+        "Cache-Control": "no-cache, max-age=0",
+        "ETag": f'"{etag}"',
+        "X-Camera-State": state,
+        "Retry-After": str(RETRY_AFTER.get(state, 1)),
+    }
+    if f'"{etag}"' in (request.headers.get("if-none-match") or ""):
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type="image/jpeg", headers=headers)
+
+
+@router.get("/frame_raw")
+async def frame_raw(
+    request: Request,
+    cam: Optional[int] = None,
+    tier: str = "display",
+    min_ts: float = 0.0,
+    min_gen: int = 0,
+):
+    """
+    JPEG เฟรมล่าสุดของกล้อง (?cam=<id>&tier=thumb|display|evidence)
+    รอเฟรมที่ใหม่กว่า min_ts ได้ไม่เกิน FRAME_MAX_WAIT วินาที (รอแบบ async ไม่ถือ thread)
+    """
+    engine = get_camera_engine()
+    cam_id = camera_control.resolve_cam(cam)
+    if tier not in DEFAULT_TIERS:
+        return _error(400, f"unknown tier: {tier}")
+    if engine.camera_state(cam_id, FRAME_STALENESS) == STATE_STOPPED:
+        return _placeholder_resp(request, cam_id, STATE_STOPPED)
+
+    broadcaster = get_broadcaster()
+    gen = camera_control.state()["generation"]
+    if gen >= min_gen:
+        got = await broadcaster.wait_frame(cam_id, tier, min_ts, FRAME_MAX_WAIT)
+        if got:
+            return _jpeg_resp(got[0], gen, got[1])
+
+    # ไม่มีเฟรมใหม่กว่า min_ts ภายในเวลารอ
+    state = engine.camera_state(cam_id, FRAME_STALENESS)
+    if state == "live":
+        # กล้องปกติ แค่ยังไม่มีเฟรมใหม่กว่าที่ client มี → ส่งเฟรมล่าสุดซ้ำ
+        # channel ของ broadcaster ถูกเก็บทิ้งเมื่อไม่มีคนรอ → ขอเฟรมล่าสุดจาก engine ตรงๆ ก่อนยอมส่งภาพแทน
+        last = broadcaster.last(cam_id, tier) or await run_in_threadpool(engine.frame, cam_id, tier)
+        if last:
+            return _jpeg_resp(last[0], gen, last[1])
+    return _placeholder_resp(request, cam_id, state if state != "live" else STATE_STALLED)
+
+
+@router.get("/stream")
+async def stream(
+    cam: Optional[int] = None,
+    tier: str = "display",
+    fps: float = Query(0.0, ge=0.0, le=60.0),
+):
+    """MJPEG (multipart/x-mixed-replace) ส่งทุกเฟรมใหม่ของกล้อง; fps > 0 จำกัดอัตราต่อ viewer"""
+    cam_id = camera_control.resolve_cam(cam)
+    if tier not in DEFAULT_TIERS:
+        return _error(400, f"unknown tier: {tier}")
+    if get_camera_engine().camera_state(cam_id, FRAME_STALENESS) == STATE_STOPPED:
+        return _error(404, f"camera {cam_id} is not running")
+
+    async def parts():
+        async for data, seq, ts in get_broadcaster().stream(cam_id, tier, max_fps=fps):
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                   + str(len(data)).encode() + b"\r\n\r\n" + data + b"\r\n")
+
+    return StreamingResponse(parts(), media_type="multipart/x-mixed-replace; boundary=frame",
+                             headers=_NO_STORE)
+
+
+def shutdown_cameras() -> None:
+    """เรียกตอน app ปิด: หยุด engine process ทุกกลุ่ม รอให้คลิปที่ค้างถูกเขียนก่อนจบ"""
+    camera_control.stop_cameras(wait=True)
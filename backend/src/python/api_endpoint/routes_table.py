@@ -3,6 +3,7 @@ from fastapi import APIRouter, Query
 from typing import Optional, List, Dict, Any
 from zoneinfo import ZoneInfo
 from ..db.supabase_client import get_supabase_client
+from ..utils.thai_provinces import province_thai
 import re
 
 router = APIRouter()
@@ -20,16 +21,11 @@ def to_db_timestamp_seconds(ts: Optional[str]) -> Optional[str]:
     s = re.sub(r"(Z|[+-]\d{2}:\d{2})$", "", s)
     return s.strip() # "timestamp": "2025-11-03 10:00:42"
 
-# ทำ "th-10:Bangkok (กรุงเทพมหานคร)" เป็น "กรุงเทพมหานคร"
+# ทำ "th-10:Bangkok (กรุงเทพมหานคร)" เป็น "กรุงเทพมหานคร" (ใช้ province_th ที่แปลงไว้ตอนบันทึก ถ้ามี)
 def parse_province(raw: Optional[str]) -> Optional[str]:
     if not raw:
         return None
-    if "(" in raw and ")" in raw:
-        try:
-            return raw.split("(")[-1].split(")")[0]
-        except Exception:
-            pass
-    return raw
+    return province_thai(raw) or raw
 
 def first_image(image_path: Any) -> Optional[str]:
     if isinstance(image_path, list) and image_path:
@@ -99,7 +95,7 @@ def list_records(
         items.append({
             "detections_id": r.get("detections_id"),
             "license_plate": plate.get("lp_number"),
-            "province": parse_province(plate.get("province")),
+            "province": plate.get("province_th") or parse_province(plate.get("province")),
             "type_car": plate.get("vehicle_body_type"),
             "vehicle_color": plate.get("vehicle_color"),
             "location": location_name,
@@ -1,16 +1,43 @@
 # api_service/ai4thai_ocr_LP_api.py - OCR License Plate Recognition API service from ai for thai
-import requests
-import logging
+# - connection pool แบบ keep-alive ใช้ซ้ำทุก request (ไม่เปิด TLS ใหม่ทุกครั้ง) ทั้งฝั่ง sync และ async
+# - timeout ชัดเจน (connect/read) + retry จำกัดจำนวนแบบ jitter เฉพาะ error ชั่วคราว (timeout / 429 / 5xx)
+# - async: hedged request (ยิงซ้ำอีกครั้งถ้าตอบช้าเกิน OCR_HEDGE_AFTER แล้วเอาอันที่เสร็จก่อน) + จำกัดจำนวน request พร้อมกันตาม quota
+# - single-flight: ภาพเดียวกัน (hash ของ bytes) ที่ถูกส่งพร้อมกัน (สองประตู / retry ซ้อน) ใช้ request เดียวร่วมกัน
+#   ใช้ได้ข้าม sync/async และข้าม event loop (คนรอทุกคนรอ concurrent Future ตัวเดียวกัน)
+#   ฝั่ง async request ที่ใช้ร่วมกันเป็น task แยกบน loop ของ client (ไม่ได้อยู่ใน task ของคนยิง): คนยิงถูกยกเลิก
+#   คนรอที่เหลือยังได้ผล; ยกเลิก request จริงก็ต่อเมื่อไม่เหลือคนรอแล้ว
+# - ฝั่ง async ยิง HTTP บน event loop ของ client เอง (thread "ocr-http"): AsyncClient + Semaphore ชุดเดียวทั้ง process
+#   ใช้ซ้ำได้ทุก loop ของผู้เรียก ไม่มี connection pool ค้างผูกกับ loop ที่ปิดไปแล้ว
+# - ทุก HTTP call ที่ยิงจริงถูกบันทึกลง utils/ocr_quota ต่อสถานที่ (จำนวน, latency, bytes, ประเภท error)
+import asyncio
+import concurrent.futures
+import hashlib
 import json
+import logging
 import os
-from typing import Optional, Dict, Any
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import httpx
 from dotenv import load_dotenv
+from ..utils.ocr_quota import get_ocr_quota
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 API_KEY_MAIN = os.getenv("API_KEY_MAIN")
 URL = "https://api.aiforthai.in.th/lpr-iapp"
 
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "3.0"))
+OCR_READ_TIMEOUT = float(os.getenv("OCR_READ_TIMEOUT", "10.0"))
+OCR_RETRIES = int(os.getenv("OCR_RETRIES", "2"))                  # จำนวนครั้งที่ลองซ้ำ (ไม่นับครั้งแรก)
+OCR_BACKOFF = float(os.getenv("OCR_BACKOFF", "0.3"))              # ฐานของ backoff (วินาที) × 2^attempt แบบ full jitter
+OCR_HEDGE_AFTER = float(os.getenv("OCR_HEDGE_AFTER", "0"))        # >0 = ยิง request สำรองเมื่อรอเกินนี้ (วินาที)
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))  # request ที่ค้างพร้อมกันได้ (ตาม quota ของ API)
+OCR_SINGLE_FLIGHT = os.getenv("OCR_SINGLE_FLIGHT", "1") == "1"
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
 FILTER_KEYS = [
     "conf", # เปอร์เซ็นต์ความเชื่อมั่น
     "status", # Response code
@@ -24,51 +51,387 @@ FILTER_KEYS = [
     "vehicle_color" # สีรถยนต์
 ]
 
-def recognize_license_plate(image_url: str) -> Optional[Dict[str, Any]]:
-    if not API_KEY_MAIN or not URL:
-        logger.error("API_KEY_MAIN or URL is missing in .env.")
-        return None
-    headers = {'apikey': API_KEY_MAIN}
-    try:
-        response_img = requests.get(image_url)
-        response_img.raise_for_status() 
-        image_bytes = response_img.content 
 
-        files = [('file', ('image.jpg', image_bytes, 'image/jpeg'))]
-        response = requests.post(URL, headers=headers, files=files)
+class _Retryable(Exception):
+    pass
 
-        if response.status_code != 200:
-            logger.error(f"HTTP {response.status_code}: {response.text}")
-            return None
 
-        json_response = response.json()
-        response_filtered = {key: json_response[key] for key in FILTER_KEYS if key in json_response}
-        return response_filtered
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OCR_READ_TIMEOUT, connect=OCR_CONNECT_TIMEOUT)
 
-    except requests.RequestException as e:
-        logger.error(f"Request failed: {e}")
-    except json.JSONDecodeError:
-        logger.error("Failed to decode JSON response.")
-    return None
 
-def recognize_license_plate_from_bytes(image_bytes: bytes) -> Optional[Dict[str, Any]]:
-    if not API_KEY_MAIN or not URL:
-        logger.error("API_KEY_MAIN or URL is missing in .env.")
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=max(2, OCR_MAX_CONCURRENCY * 2),
+                        max_keepalive_connections=max(1, OCR_MAX_CONCURRENCY),
+                        keepalive_expiry=60.0)
+
+
+def _error_class(e: Exception) -> str:
+    if isinstance(e, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(e, httpx.TransportError):
+        return "transport"
+    if isinstance(e, _Retryable):
+        return str(e).replace("HTTP ", "http_")
+    return type(e).__name__
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, OCR_BACKOFF * (2 ** attempt))
+
+
+def _parse(response: httpx.Response) -> Optional[Dict[str, Any]]:
+    """แปลง response → dict เฉพาะ FILTER_KEYS; status ชั่วคราว → _Retryable; error อื่น → None"""
+    if response.status_code in _RETRY_STATUS:
+        raise _Retryable(f"HTTP {response.status_code}")
+    if response.status_code != 200:
+        logger.error(f"HTTP {response.status_code}: {response.text}")
         return None
-    headers = {'apikey': API_KEY_MAIN}
     try:
-        files = [('file', ('image.jpg', image_bytes, 'image/jpeg'))]
-        response = requests.post(URL, headers=headers, files=files)
-        if response.status_code != 200:
-            logger.error(f"HTTP {response.status_code}: {response.text}")
-            return None
         json_response = response.json()
-        return {k: json_response[k] for k in FILTER_KEYS if k in json_response}
-    except requests.RequestException as e:
-        logger.error(f"Request failed: {e}")
     except json.JSONDecodeError:
         logger.error("Failed to decode JSON response.")
-    return None
+        return None
+    return {k: json_response[k] for k in FILTER_KEYS if k in json_response}
+
+
+class _Flight:
+    """request ที่กำลังยิงของภาพหนึ่ง (single-flight) + จำนวนคนที่ยังรอผล"""
+
+    def __init__(self):
+        self.fut: concurrent.futures.Future = concurrent.futures.Future()
+        self.waiters = 0
+        self.task: Optional[concurrent.futures.Future] = None   # งานบน loop ของ client (เฉพาะคนยิงฝั่ง async)
+
+
+class OCRClient:
+    """
+    ตัวเรียก AI4Thai LPR ที่ใช้ connection pool ร่วมกัน
+    - sync: httpx.Client ตัวเดียว (thread-safe) + BoundedSemaphore จำกัด concurrency
+    - async: httpx.AsyncClient + asyncio.Semaphore ตัวเดียว อยู่บน event loop ของ client เอง
+      (client ของ httpx ผูกกับ loop ที่สร้าง) ผู้เรียกจาก loop ไหนก็ส่งงานมาที่ loop นี้
+    """
+
+    def __init__(self, url: str = URL, api_key: Optional[str] = API_KEY_MAIN,
+                 retries: int = OCR_RETRIES, hedge_after: float = OCR_HEDGE_AFTER,
+                 max_concurrency: int = OCR_MAX_CONCURRENCY):
+        self.url = url
+        self.api_key = api_key
+        self.retries = max(0, retries)
+        self.hedge_after = hedge_after
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._sync: Optional[httpx.Client] = None
+        self._sync_sem = threading.BoundedSemaphore(self.max_concurrency)
+        self._io: Optional[asyncio.AbstractEventLoop] = None   # loop ของ thread "ocr-http"
+        self._async: Optional[Tuple[httpx.AsyncClient, asyncio.Semaphore]] = None   # ใช้บน self._io เท่านั้น
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.last_latency = 0.0
+        self.single_flight = OCR_SINGLE_FLIGHT
+        self._inflight: Dict[bytes, _Flight] = {}   # hash ของภาพ -> request ที่กำลังรอ
+
+    def _headers(self) -> Dict[str, str]:
+        return {"apikey": self.api_key or ""}
+
+    def _configured(self) -> bool:
+        if not self.api_key or not self.url:
+            logger.error("API_KEY_MAIN or URL is missing in .env.")
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls, "retried": self.retried, "failures": self.failures,
+            "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+            "coalesced": self.coalesced, "inflight": len(self._inflight),
+            "last_latency_s": round(self.last_latency, 3),
+        }
+
+    # ---------- single-flight ----------
+    def _join(self, image_bytes: bytes) -> Tuple[bytes, _Flight, bool]:
+        """(key, flight, เป็นคนยิงเองหรือไม่) คนแรกของภาพนั้นยิง request คนที่ตามมารอผลเดียวกัน"""
+        key = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+            return key, flight, leader
+
+    def _finish(self, key: bytes, flight: _Flight, result: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        if not flight.fut.done():
+            flight.fut.set_result(dict(result) if result else result)   # สำเนา กันคนยิงแก้ dict ก่อนคนรอได้อ่าน
+
+    def _task_done(self, key: bytes, flight: _Flight, task: concurrent.futures.Future) -> None:
+        result = None
+        if not task.cancelled():
+            if task.exception() is not None:
+                logger.error(f"OCR request failed: {task.exception()}")
+            else:
+                result = task.result()
+        self._finish(key, flight, result)
+
+    def _leave(self, key: bytes, flight: _Flight) -> None:
+        """คนรอฝั่ง async ถูกยกเลิก: ไม่เหลือใครรอแล้ว → ยกเลิก request (คนที่มาใหม่ยิงใหม่ ไม่มารอตัวที่ถูกยกเลิก)"""
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight.task is None:
+                return
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        flight.task.cancel()
+
+    # ---------- sync ----------
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync is None:
+                self._sync = httpx.Client(timeout=_timeout(), limits=_limits())
+            return self._sync
+
+    def recognize_bytes_sync(self, image_bytes: bytes,
+                             location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        if not self._configured():
+            return None
+        if not self.single_flight:
+            return self._recognize_sync(image_bytes, location_id)
+        key, flight, leader = self._join(image_bytes)
+        if not leader:
+            result = flight.fut.result()
+            return dict(result) if result else result
+        result = None
+        try:
+            result = self._recognize_sync(image_bytes, location_id)
+            return result
+        finally:
+            self._finish(key, flight, result)
+
+    def _recognize_sync(self, image_bytes: bytes, location_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        client = self._sync_client()
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            started = time.monotonic()
+            try:
+                with self._sync_sem:
+                    r = client.post(self.url, headers=self._headers(),
+                                    files={"file": ("image.jpg", image_bytes, "image/jpeg")})
+                self.last_latency = time.monotonic() - started
+                result = _parse(r)
+                get_ocr_quota().record(location_id, self.last_latency, len(image_bytes),
+                                       None if r.status_code == 200 else f"http_{r.status_code}")
+                return result
+            except (httpx.TransportError, _Retryable) as e:
+                get_ocr_quota().record(location_id, time.monotonic() - started, len(image_bytes), _error_class(e))
+                if attempt >= self.retries:
+                    self.failures += 1
+                    logger.error(f"Request failed: {e}")
+                    return None
+                self.retried += 1
+                time.sleep(_backoff(attempt))
+        return None
+
+    def fetch_image_sync(self, image_url: str) -> Optional[bytes]:
+        try:
+            r = self._sync_client().get(image_url)
+            r.raise_for_status()
+            return r.content
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {e}")
+            return None
+
+    # ---------- async ----------
+    def _io_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._io is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=_run_io_loop, args=(loop,), name="ocr-http", daemon=True).start()
+                self._io = loop
+            return self._io
+
+    async def _on_io(self, coro):
+        """รัน coro บน loop ของ client แล้วรอผลจาก loop ของผู้เรียก (ผู้เรียกถูกยกเลิก = งานบน loop ของ client ถูกยกเลิกด้วย)"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._io_loop()))
+
+    def _loop_state(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        # เรียกบน loop ของ client เท่านั้น (thread เดียว)
+        if self._async is None:
+            self._async = (httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+                           asyncio.Semaphore(self.max_concurrency))
+        return self._async
+
+    async def _post_once(self, image_bytes: bytes, location_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        client, sem = self._loop_state()
+        async with sem:
+            started = time.monotonic()
+            try:
+                r = await client.post(self.url, headers=self._headers(),
+                                      files={"file": ("image.jpg", image_bytes, "image/jpeg")})
+                result = _parse(r)
+            except (httpx.TransportError, _Retryable) as e:
+                get_ocr_quota().record(location_id, time.monotonic() - started, len(image_bytes), _error_class(e))
+                raise
+            self.last_latency = time.monotonic() - started
+        get_ocr_quota().record(location_id, self.last_latency, len(image_bytes),
+                               None if r.status_code == 200 else f"http_{r.status_code}")
+        return result
+
+    async def _post_hedged(self, image_bytes: bytes, location_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if self.hedge_after <= 0:
+            return await self._post_once(image_bytes, location_id)
+        _, sem = self._loop_state()
+        first = asyncio.ensure_future(self._post_once(image_bytes, location_id))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+            # ยิงสำรองเฉพาะตอนยังมีโควตาว่าง ไม่แย่งคิวกับ request อื่น
+            if done or sem.locked():
+                return await first
+            self.hedged += 1
+            second = asyncio.ensure_future(self._post_once(image_bytes, location_id))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                # ตัวที่เสร็จก่อนพัง รออีกตัว; ถ้าพังทั้งคู่ส่ง error ตัวสุดท้ายออกไปให้ retry
+                if not pending:
+                    raise next(iter(done)).exception()
+        finally:
+            # ผู้เรียกถูกยกเลิกระหว่างรอ (รวมช่วงก่อนยิงสำรอง) → ไม่ปล่อย request ค้างวิ่งต่อ
+            for task in pending:
+                task.cancel()
+        return None
+
+    async def recognize_bytes(self, image_bytes: bytes,
+                              location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """location_id ใช้บันทึกการใช้งานต่อสถานที่ (utils/ocr_quota) เท่านั้น"""
+        if not self._configured():
+            return None
+        if not self.single_flight:
+            return await self._on_io(self._recognize_async(image_bytes, location_id))
+        key, flight, leader = self._join(image_bytes)
+        if leader:
+            # request จริงเป็นของ flight ไม่ใช่ของ task คนยิง: คนยิงถูกยกเลิก (เช่น /detect ยกเลิกงานที่ค้าง)
+            # คนที่รอภาพเดียวกันอยู่ยังได้ผลตามปกติ
+            flight.task = asyncio.run_coroutine_threadsafe(
+                self._recognize_async(image_bytes, location_id), self._io_loop())
+            flight.task.add_done_callback(lambda t: self._task_done(key, flight, t))
+        try:
+            # shield: คนรอถูกยกเลิกไม่ทำให้ request ของคนอื่นถูกยกเลิกไปด้วย
+            result = await asyncio.shield(asyncio.wrap_future(flight.fut))
+        except asyncio.CancelledError:
+            self._leave(key, flight)
+            raise
+        return dict(result) if result else result
+
+    async def _recognize_async(self, image_bytes: bytes, location_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._post_hedged(image_bytes, location_id)
+            except (httpx.TransportError, _Retryable) as e:
+                if attempt >= self.retries:
+                    self.failures += 1
+                    logger.error(f"Request failed: {e}")
+                    return None
+                self.retried += 1
+                await asyncio.sleep(_backoff(attempt))
+        return None
+
+    async def fetch_image(self, image_url: str) -> Optional[bytes]:
+        return await self._on_io(self._fetch_image(image_url))
+
+    async def _fetch_image(self, image_url: str) -> Optional[bytes]:
+        client, _ = self._loop_state()
+        try:
+            r = await client.get(image_url)
+            r.raise_for_status()
+            return r.content
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {e}")
+            return None
+
+    async def _drain_io(self) -> None:
+        # บน loop ของ client: ยกเลิก request ที่ค้าง แล้วปิด connection pool
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        state, self._async = self._async, None
+        if state is not None:
+            await state[0].aclose()
+
+    def _close_async(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            loop, self._io = self._io, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain_io(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ closing OCR async client failed: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    async def aclose(self) -> None:
+        """ปิด AsyncClient + loop ของ client (เรียกตอนไม่มีผู้ใช้แล้ว เช่น ตอนคิว/process ปิด; ใช้ใหม่ได้ สร้างให้อีกรอบ)"""
+        await asyncio.get_running_loop().run_in_executor(None, self._close_async)
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._sync = self._sync, None
+        if client is not None:
+            client.close()
+        self._close_async()
+
+
+def _run_io_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.close()
+
+
+_client: Optional[OCRClient] = None
+_client_lock = threading.Lock()
+
+
+def get_ocr_client() -> OCRClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OCRClient()
+        return _client
+
+
+def recognize_license_plate(image_url: str) -> Optional[Dict[str, Any]]:
+    client = get_ocr_client()
+    if not client._configured():
+        return None
+    image_bytes = client.fetch_image_sync(image_url)
+    if image_bytes is None:
+        return None
+    return client.recognize_bytes_sync(image_bytes)
+
+def recognize_license_plate_from_bytes(image_bytes: bytes) -> Optional[Dict[str, Any]]:
+    return get_ocr_client().recognize_bytes_sync(image_bytes)
+
+async def recognize_license_plate_async(image_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """เวอร์ชัน async (hedging + จำกัด concurrency) ใช้จาก FastAPI / live detection queue"""
+    return await get_ocr_client().recognize_bytes(image_bytes)
 
 
 # ตัวอย่างผลลัพธ์
@@ -83,4 +446,4 @@ def recognize_license_plate_from_bytes(image_bytes: bytes) -> Optional[Dict[str,
 #     "vehicle_brand": "toyota",
 #     "vehicle_body_type": "truck-standard",
 #     "vehicle_color": "white"
-# }
\ No newline at end of file
+# }
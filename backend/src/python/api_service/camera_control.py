@@ -0,0 +1,235 @@
+# api_service/camera_control.py - สั่งเปิด/ปิด/สแกนกล้อง (logic เดียวของทั้งระบบ เรียกจาก routes_camera_stream)
+# - หาโมเดล active ของสถานที่ → วางแผนแหล่งภาพ (webcam index / RTSP / HTTP / ไฟล์) → สั่ง CameraEngineClient
+# - CameraProbeCache / ClipIndex / สถานะ primary_cam_id + generation มีชุดเดียว
+# - error คืนเป็น CameraControlError(status, message, **extra) ให้ route แปลงเป็น response ของ framework ตัวเอง
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..db.supabase_client import get_supabase_client
+from ..utils.capture_source import DeviceSource, make_source
+from ..utils.camera_probe import CameraProbeCache
+from ..utils.clip_recorder import ClipIndex
+from .camera_engine import get_camera_engine, CLIPS_ENABLED, CLIP_DIR, CLIP_MAX_BYTES
+
+PROBE_MAX_INDEX = 8
+
+
+class CameraControlError(Exception):
+    def __init__(self, status: int, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.extra = extra
+
+
+_probe: Optional[CameraProbeCache] = None
+_clip_index: Optional[ClipIndex] = None
+_singleton_lock = threading.Lock()
+
+_state_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "primary_cam_id": None,   # กล้องที่ /frame_raw ใช้ถ้าไม่ระบุ cam
+    "generation": 0,          # เพิ่มทุกครั้งที่ start-camera ใหม่
+    "location_id": None,
+    "model_id": None,
+}
+
+
+def get_camera_probe() -> CameraProbeCache:
+    global _probe
+    with _singleton_lock:
+        if _probe is None:
+            _probe = CameraProbeCache(
+                ttl=float(os.getenv("CAMERA_PROBE_TTL", "30")),
+                timeout=float(os.getenv("CAMERA_PROBE_TIMEOUT", "2.0")))
+        return _probe
+
+
+def get_clip_index() -> Optional[ClipIndex]:
+    """ดัชนีคลิปก่อน/หลังเหตุการณ์ (engine เป็นคนเขียนคลิป ฝั่ง API แค่ค้น/อัปโหลด) None = ปิดการอัดคลิป"""
+    global _clip_index
+    if not CLIPS_ENABLED:
+        return None
+    with _singleton_lock:
+        if _clip_index is None:
+            _clip_index = ClipIndex(CLIP_DIR, CLIP_MAX_BYTES)
+        return _clip_index
+
+
+def state() -> Dict[str, Any]:
+    with _state_lock:
+        return dict(_state)
+
+
+def resolve_cam(cam: Optional[int]) -> int:
+    if cam is not None:
+        return cam
+    with _state_lock:
+        pid = _state["primary_cam_id"]
+    return pid if pid is not None else 0
+
+
+# ---------- list ----------
+def list_cameras(usb_only: bool = True, refresh: bool = False) -> Dict[str, Any]:
+    """index ของกล้องที่เปิดได้ (usb_only ตัด index 0 ออกเพื่อหลีกเลี่ยงกล้องโน้ตบุ๊ก) refresh = probe ใหม่ ไม่ใช้ cache"""
+    in_use = get_camera_engine().devices_in_use()
+    found = get_camera_probe().probe(PROBE_MAX_INDEX, in_use=in_use, force=refresh)
+    cams = [i for i in found if (not usb_only or i != 0)] or found
+    return {"available": cams, "in_use": in_use}
+
+
+# ---------- start ----------
+def active_model(location_id: str) -> Dict[str, Any]:
+    """โมเดล is_active ของสถานที่ {"model_id", "model_url"}"""
+    try:
+        res = (
+            get_supabase_client().table("model")
+            .select("model_id, model_url")
+            .eq("location_id", location_id)
+            .eq("is_active", True)
+            .limit(1)
+            .execute()
+        )
+    except Exception as e:
+        raise CameraControlError(500, f"DB error: {e}")
+    if not res.data or not (res.data[0].get("model_url") or "").strip():
+        raise CameraControlError(401, "No active model for this location.", code="NO_ACTIVE_MODEL")
+    return res.data[0]
+
+
+def plan_cameras(group: str, camera_indices: Optional[List[Any]] = None,
+                 sources: Any = None, usb_only: bool = True) -> List[Dict[str, Any]]:
+    """
+    เลือกแหล่งภาพที่จะเปิด (validate ที่นี่ เปิดจริงใน engine process)
+    ไม่ระบุอะไรเลย = probe หา webcam ที่ว่าง
+    """
+    engine = get_camera_engine()
+    extra_sources = sources or []
+    if not isinstance(extra_sources, list):
+        extra_sources = [extra_sources]
+    try:
+        planned = [{"cam_id": int(i), "source": int(i), "device": True} for i in (camera_indices or [])]
+        streams = []
+        for spec in extra_sources:
+            src = make_source(spec)
+            if isinstance(src, DeviceSource):
+                # webcam ที่ส่งมาใน sources ใช้ index ของตัวเองเป็น cam_id เหมือน camera_indices
+                planned.append({"cam_id": src.index, "source": src.index, "device": True})
+            else:
+                streams.append(spec)
+    except (TypeError, ValueError) as e:
+        raise CameraControlError(400, f"invalid camera source: {e}")
+    devices = [p["cam_id"] for p in planned]
+    if len(devices) != len(set(devices)):
+        raise CameraControlError(400, f"camera index listed more than once: {sorted(devices)}")
+    stream_ids = engine.allocate_stream_ids(len(streams))
+    planned += [{"cam_id": cid, "source": spec, "device": False}
+                for cid, spec in zip(stream_ids, streams)]
+
+    if not planned:
+        # กล้องของกลุ่มนี้เองจะถูกปิดก่อนเปิดใหม่ จึงนับว่าว่าง
+        mine = set(engine.cam_ids(group))
+        in_use = [i for i in engine.devices_in_use() if i not in mine]
+        probed = [i for i in get_camera_probe().probe(PROBE_MAX_INDEX, in_use=in_use) if i not in in_use]
+        picks = [i for i in probed if (not usb_only or i != 0)] or probed
+        planned = [{"cam_id": i, "source": i, "device": True} for i in picks]
+    if not planned:
+        raise CameraControlError(404, "No webcam found")
+    return planned
+
+
+def start_cameras(location_id: Optional[str], group: Optional[str] = None,
+                  camera_indices: Optional[List[Any]] = None, sources: Any = None,
+                  usb_only: bool = True) -> Dict[str, Any]:
+    """
+    เปิด engine ของกลุ่ม (ของเก่าในกลุ่มเดียวกันถูกปิดก่อน)
+    คืน {"group", "opened", "sources", "failed", "location_id", "generation"}
+    """
+    if not location_id:
+        raise CameraControlError(400, "location_id is required")
+    group = str(group or "default")   # 1 engine process ต่อกลุ่มกล้อง
+
+    model = active_model(location_id)
+    planned = plan_cameras(group, camera_indices, sources, usb_only)
+
+    try:
+        result = get_camera_engine().start(group, {
+            "location_id": location_id,
+            "model_id": model.get("model_id"),
+            "model_url": model.get("model_url"),
+            "cameras": planned,
+        })
+    except ValueError as e:
+        raise CameraControlError(409, str(e))
+    except (RuntimeError, TimeoutError) as e:
+        raise CameraControlError(500, str(e))
+    finally:
+        get_camera_probe().invalidate()
+
+    opened = result.get("opened") or []
+    if not opened:
+        raise CameraControlError(500, "Unable to open any webcam", failed=result.get("failed") or [])
+
+    with _state_lock:
+        _state["primary_cam_id"] = opened[0]
+        _state["generation"] += 1
+        _state["location_id"] = location_id
+        _state["model_id"] = model.get("model_id")
+        gen = _state["generation"]
+
+    return {
+        "group": group,
+        "opened": opened,
+        "sources": result.get("sources") or {},
+        "failed": result.get("failed") or [],
+        "location_id": location_id,
+        "generation": gen,
+    }
+
+
+# ---------- stop ----------
+def stop_cameras(group: Optional[str] = None, wait: bool = False) -> None:
+    """
+    หยุด engine ของกลุ่ม (None = ทุกกลุ่ม) คลิปที่ค้างถูกเขียนก่อน process จบ
+    ดีฟอลต์ไม่รอ process ปิด (ทำต่อเบื้องหลัง) เพื่อไม่ถือ request thread
+    """
+    engine = get_camera_engine()
+    engine.stop(group, wait=wait)
+    get_camera_probe().invalidate()
+
+    remaining = engine.cam_ids()
+    with _state_lock:
+        if _state["primary_cam_id"] not in remaining:
+            _state["primary_cam_id"] = remaining[0] if remaining else None
+
+
+# ---------- clips ----------
+def list_clips(location_id: Optional[str] = None, detection_id: Optional[str] = None,
+               limit: int = 100) -> List[Dict[str, Any]]:
+    index = get_clip_index()
+    if index is None:
+        raise CameraControlError(404, "Clip recording is disabled")
+    return index.list_clips(location_id=location_id, detection_id=detection_id, limit=limit)
+
+
+def upload_clips(limit: int = 10) -> int:
+    """อัปโหลดคลิปที่ยังไม่ขึ้น Cloudinary (ทีละไม่เกิน limit) คืนจำนวนที่อัปโหลดสำเร็จ"""
+    index = get_clip_index()
+    if index is None:
+        raise CameraControlError(404, "Clip recording is disabled")
+    if not 1 <= limit <= 100:
+        raise CameraControlError(400, "invalid limit: limit must be 1..100")
+
+    import cloudinary.uploader
+    from ..utils.cloudinary_uploader import CloudinaryUploader
+    try:
+        CloudinaryUploader()   # ตั้งค่า cloudinary จาก env (โยน error ถ้าไม่ครบ)
+    except RuntimeError as e:
+        raise CameraControlError(500, str(e))
+
+    def _upload(path: str) -> str:
+        res = cloudinary.uploader.upload(path, folder="clips", resource_type="video")
+        return res.get("secure_url") or ""
+
+    return index.upload_pending(_upload, limit=limit)
@@ -0,0 +1,1018 @@
+# api_service/camera_engine.py - pipeline กล้อง + ตรวจจับ รันใน process แยกจาก API (1 process ต่อกลุ่มกล้อง)
+# - CameraEngine: capture / display / clip / detection workers (เดิมอยู่ใน backend.py) ทำงานใน engine process
+# - เฟรมส่งกลับ API ผ่าน SharedFrameSlot (shared memory, เขียนเฉพาะตอนมีคนดู) / event ส่งผ่าน multiprocessing.Queue
+# - CameraEngineClient: ฝั่ง API สั่ง start/stop, ดูแล process (restart อัตโนมัติถ้าตาย), encode JPEG ตาม tier ให้ viewer
+import atexit
+import os
+import queue
+import threading
+import time
+import multiprocessing as mp
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import cv2
+from dotenv import load_dotenv
+
+from ..utils.vehicle_tracker import VehicleTracker, Track, box_area
+from ..utils.tripwire import load_tripwires, direction_from_trajectory
+from ..utils.lowlight import auto_enhance
+from ..utils.jpeg_tiers import TieredJpegEncoder, Tier, DEFAULT_TIERS
+from ..utils.capture_source import CaptureSource, make_source
+from ..utils.frame_ring import FrameRing
+from ..utils.clip_recorder import ClipRecorder
+from ..utils.shared_frame import SharedFrameSlot
+from ..utils.plate_localizer import get_plate_localizer
+from .roboflow_client import RoboflowClient, RemoteInferenceError
+from .detection_pipeline import LiveDetectionQueue, DetectionJob
+from ..utils.placeholder_frames import STATE_STARTING, STATE_STALLED, STATE_STOPPED
+from ..utils.camera_stats import CameraStats, render_prometheus
+from ..utils.adaptive_quality import AdaptiveController, QualityLevel, DEFAULT_LADDER, cpu_percent
+
+load_dotenv()
+
+# ---- ค่าปรับสำหรับการแสดงผล ----
+# fps / ความกว้าง / JPEG quality / ความถี่ inference มาจาก AdaptiveController ต่อกล้อง
+# (ขั้นบนสุด DEFAULT_LADDER[0] = 60fps, 640px, q60, 5Hz) ลดลงเองเมื่อเครื่องรับไม่ไหว
+ADAPTIVE_QUALITY = os.getenv("ADAPTIVE_QUALITY", "1") == "1"   # 0 = ล็อกที่คุณภาพสูงสุดตลอด
+ADAPT_INTERVAL = float(os.getenv("ADAPT_INTERVAL", "2.0"))
+FRAME_RING_SIZE = int(os.getenv("FRAME_RING_SIZE", "16"))  # ~250ms ที่ 60fps
+
+# ไม่ enhance/ไม่ใส่ timestamp ที่ฝั่งแสดงผล (ให้ฝั่งตรวจจับทำเองถ้าต้องการ)
+APPLY_ENHANCE_FOR_DISPLAY = False
+
+# engine จะ copy เฟรมลง shared memory เฉพาะตอนที่ API ขอเฟรมภายใน DEMAND_WINDOW วินาทีล่าสุด
+DEMAND_WINDOW = 2.0
+
+# ---- โมเดล/ดีเทคชัน ----
+RF_MIN_CONF = float(os.getenv("RF_MIN_CONF", "0.25"))
+_JPEG_QUALITY_RF = 85
+STICKER_CONF = float(os.getenv("STICKER_CONF", "0.50"))
+STICKER_IOU = float(os.getenv("STICKER_IOU", "0.50"))
+# ความกว้างภาพที่ป้อน YOLO / tracker / OCR (คงที่ ไม่ขึ้นกับ display_width ของ AdaptiveController
+# ไม่งั้นพอระดับคุณภาพลด ภาพที่ใช้ตรวจจับจะเล็กลงกลางคันของ track)
+DETECT_WIDTH = int(os.getenv("DETECT_WIDTH", "640"))
+
+# โมเดลตรวจจับรถ (ใช้ร่วมกับ tracker ให้ 1 คันที่ผ่าน = 1 detection)
+CAR_DETECTION_PATH = os.getenv("CAR_DETECTION_PATH")
+CAR_MIN_CONF = float(os.getenv("CAR_MIN_CONF", "0.50"))
+CAR_CLASSES = {"car", "truck", "bus", "motorcycle"}
+
+# ---- Vehicle tracking ----
+TRACK_IOU = 0.3                 # IoU ขั้นต่ำที่ถือว่าเป็นคันเดิม
+TRACK_MAX_MISSED = 10           # ไม่เห็นกี่รอบ detector (~5Hz) ถึงถือว่ารถผ่านไปแล้ว
+TRACK_MIN_HITS = 3              # เห็นน้อยกว่านี้ถือเป็น noise
+TRACK_TOP_K = int(os.getenv("TRACK_TOP_K", "3"))           # เก็บเฟรมดีสุดกี่เฟรมต่อคัน (เฟรมที่ 2.. ใช้ OCR ซ้ำตอนผลกำกวม)
+TRACK_TOP_GAP = float(os.getenv("TRACK_TOP_GAP", "0.3"))   # เฟรมที่เก็บต้องห่างกันอย่างน้อยกี่วินาที
+
+# ---- คลิปก่อน/หลังเหตุการณ์ต่อ detection (engine เขียนไฟล์ + ดัชนี, API อ่านดัชนีผ่าน ClipIndex) ----
+CLIPS_ENABLED = os.getenv("CLIPS_ENABLED", "1") == "1"
+CLIP_DIR = os.getenv("CLIP_DIR", "clips")
+CLIP_FPS = float(os.getenv("CLIP_FPS", "10"))
+CLIP_MAX_BYTES = int(float(os.getenv("CLIP_MAX_MB", "2048")) * 1024 * 1024)
+# tier ของคลิปแยกจาก tier display ของ viewer: ขนาดคงที่ ไม่ตามระดับคุณภาพ และไม่นับเป็นคนดู
+CLIP_TIER = Tier(int(os.getenv("CLIP_WIDTH", "640")), int(os.getenv("CLIP_JPEG_QUALITY", "60")))
+
+# ---- supervisor ----
+ENGINE_START_TIMEOUT = float(os.getenv("ENGINE_START_TIMEOUT", "20"))
+ENGINE_STOP_TIMEOUT = float(os.getenv("ENGINE_STOP_TIMEOUT", "30"))   # รอ engine เก็บงานค้างก่อน terminate
+RESTART_MIN_BACKOFF = 1.0
+RESTART_MAX_BACKOFF = 30.0
+RESTART_RESET_AFTER = 60.0      # รันได้นานกว่านี้ถือว่าเสถียร รีเซ็ต backoff
+
+# cam_id ของ webcam = index ใน OpenCV (0,1,2,...)
+# แหล่งภาพอื่น (RTSP/HTTP/ไฟล์วิดีโอ) ได้ id จาก allocate_stream_ids() ตั้งแต่ STREAM_CAM_ID_BASE ขึ้นไป
+STREAM_CAM_ID_BASE = 100
+
+
+def display_tier(q: QualityLevel) -> Tier:
+    return Tier(q.display_width, q.jpeg_quality)
+
+
+def new_jpeg_encoder() -> TieredJpegEncoder:
+    # tier "display" ตามระดับคุณภาพปัจจุบัน ส่วน thumb/evidence ใช้ค่า default
+    return TieredJpegEncoder({
+        **DEFAULT_TIERS,
+        "display": display_tier(DEFAULT_LADDER[0]),
+    })
+
+
+def new_clip_encoder() -> TieredJpegEncoder:
+    # ฝั่ง engine ใช้ encode เฟรมป้อน clip_recorder อย่างเดียว (viewer ใช้ encoder ฝั่ง API)
+    return TieredJpegEncoder({"clip": CLIP_TIER})
+
+
+# =====================================================================
+# engine process
+# =====================================================================
+
+class CameraEngine:
+    """
+    pipeline ของกล้อง 1 กลุ่ม (ทำงานใน engine process เท่านั้น)
+    config: {"group", "location_id", "model_id", "model_url",
+             "cameras": [{"cam_id", "source", "slot"}, ...], "pins": {cam_id: level}}
+    """
+
+    def __init__(self, config: Dict[str, Any], events_q):
+        self.group = config.get("group", "default")
+        self.location_id = config.get("location_id")
+        self.model_id = config.get("model_id")
+        self.camera_specs = config.get("cameras") or []
+        self.pins = config.get("pins") or {}   # {cam_id: level} ที่ผู้ใช้ล็อกไว้
+        self.events_q = events_q
+
+        # โมเดลสติกเกอร์
+        self.current_model = None
+        self.model_type = None          # "local" (ใช้ .pt) | "roboflow" (remote + local เป็นตัวสำรอง)
+        self.active_model_url = config.get("model_url")
+        self.roboflow: Optional[RoboflowClient] = None
+
+        self.car_model = None
+        self.car_model_lock = threading.Lock()
+        self.tripwires_by_cam: Dict[int, list] = {}
+
+        self.cameras: Dict[int, CaptureSource] = {}
+        self.frame_rings: Dict[int, FrameRing] = {}
+        self.slots: Dict[int, SharedFrameSlot] = {}
+        self.jpeg_encoders: Dict[int, TieredJpegEncoder] = {}   # ใช้ป้อน clip_recorder ใน process นี้
+        self.primary_cam_id: Optional[int] = None
+        self.adaptive = AdaptiveController(enabled=ADAPTIVE_QUALITY)
+        self.stats: Dict[int, CameraStats] = {}
+
+        self.stop_event = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self.pipeline = LiveDetectionQueue(workers=3, jpeg_quality=_JPEG_QUALITY_RF, on_done=self._on_recorded)
+        self.clip_recorder = ClipRecorder(
+            CLIP_DIR,
+            pre_seconds=float(os.getenv("CLIP_PRE_SECONDS", "5")),
+            post_seconds=float(os.getenv("CLIP_POST_SECONDS", "3")),
+            fps=CLIP_FPS,
+            max_disk_bytes=CLIP_MAX_BYTES,
+            # request ตอน emit ซึ่งช้ากว่าเฟรมของเหตุการณ์ได้ถึง TRACK_MAX_MISSED รอบ detector ที่ระดับช้าสุด
+            max_event_delay=(TRACK_MAX_MISSED + 1) / min(q.infer_hz for q in DEFAULT_LADDER) + 2.0,
+        ) if CLIPS_ENABLED else None
+
+    def _event(self, kind: str, **data) -> None:
+        try:
+            self.events_q.put_nowait({"type": kind, "group": self.group, "ts": time.time(), **data})
+        except Exception:
+            pass  # คิวเต็ม/ปิดแล้ว ไม่ให้ pipeline สะดุดเพราะ event
+
+    # ---------- lifecycle ----------
+    def start(self) -> List[int]:
+        opened, sources, failed = [], {}, []
+        for spec in self.camera_specs:
+            cam_id = spec["cam_id"]
+            try:
+                src = make_source(spec["source"])
+            except (TypeError, ValueError) as e:
+                failed.append({"cam_id": cam_id, "error": str(e)}); continue
+            if not src.open():
+                print(f"⚠️ open camera {src.describe()} failed")
+                failed.append({"cam_id": cam_id, "error": f"open {src.describe()} failed"}); continue
+
+            src.apply_preferred_mode()
+
+            self.cameras[cam_id] = src
+            self.frame_rings[cam_id] = FrameRing(FRAME_RING_SIZE)
+            self.jpeg_encoders[cam_id] = new_clip_encoder()
+            if spec.get("slot"):
+                self.slots[cam_id] = SharedFrameSlot.attach(spec["slot"])
+            self.adaptive.register(cam_id)
+            self.stats[cam_id] = CameraStats(cam_id, src.describe())
+            pinned = (self.pins or {}).get(cam_id)
+            if pinned is not None:
+                self.adaptive.pin(cam_id, pinned)
+
+            self._spawn(self.capture_worker, cam_id)
+            self._spawn(self.display_worker, cam_id)
+            if self.clip_recorder is not None:
+                self._spawn(self.clip_worker, cam_id)
+            opened.append(cam_id)
+            sources[cam_id] = src.describe()
+            print(f"✅ Camera opened id={cam_id}, source={src.describe()}")
+
+        if opened:
+            # กล้องหลัก (สำหรับ detector) = ตัวแรกในลิสต์
+            self.primary_cam_id = opened[0]
+            self.pipeline.start()
+            self.tripwires_by_cam = load_tripwires(self.location_id)
+            self._spawn(self.detection_worker)
+            self._spawn(self.adapt_worker)
+
+        self._event("started", opened=opened, sources=sources, failed=failed, pid=os.getpid())
+        return opened
+
+    def _spawn(self, target, *args) -> None:
+        th = threading.Thread(target=target, args=args, daemon=True)
+        th.start()
+        self.threads.append(th)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        for th in self.threads:
+            th.join(timeout=1)
+        for src in self.cameras.values():
+            try: src.release()
+            except: pass
+        if self.roboflow is not None:
+            self.roboflow.close()
+        self.pipeline.stop(timeout=20)     # รองานที่ค้างในคิว (upload/OCR/insert) ให้เสร็จ
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop(timeout=self.clip_recorder.post_seconds + 5)
+        for slot in self.slots.values():
+            slot.close()
+        self._event("stopped")
+
+    # ---------- workers ----------
+    def capture_worker(self, cam_id: int):
+        """
+        grab จากกล้อง cam_id ต่อเนื่องลง frame_rings[cam_id] ให้เร็วที่สุดเท่าที่กล้องส่งมา
+        (driver buffer ไม่ค้าง เฟรมสดเสมอ ไม่ขึ้นกับความเร็วของ display/detection)
+        แหล่งที่ไม่ใช่ภาพสด (ไฟล์ replay) ถูกเว้นจังหวะที่นี่ตาม cap.frame_interval
+        """
+        ring = self.frame_rings[cam_id]
+        cap = self.cameras[cam_id]
+        stats = self.stats[cam_id]
+        next_due = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                if not cap.isOpened():
+                    time.sleep(0.02); continue
+
+                interval = cap.frame_interval
+                if interval > 0:
+                    wait = next_due - time.monotonic()
+                    if wait > 0 and self.stop_event.wait(wait):
+                        break
+                    # ถ้าช้ากว่ากำหนดมาก ไม่ต้องเร่งไล่ (เหมือนกล้องจริงที่ drop เฟรม)
+                    next_due = max(next_due + interval, time.monotonic())
+
+                ok, raw = cap.read()
+                if not ok or raw is None or raw.size == 0:
+                    stats.on_read_failure()
+                    time.sleep(0.005); continue
+
+                ts = time.time()
+                ring.push(raw, ts)
+                stats.on_grab(ts)
+
+            except Exception as e:
+                print(f"capture worker error (cam {cam_id}):", e)
+                time.sleep(0.01)
+
+    def display_worker(self, cam_id: int):
+        """
+        อ่านเฟรมล่าสุดจาก frame_rings[cam_id] → resize → (optional enhance)
+        → publish เข้า encoder ของ clip + เขียนลง shared memory (เฉพาะตอน API มีคนดู)
+        """
+        last_seq = 0
+        ring = self.frame_rings[cam_id]
+        slot = self.slots.get(cam_id)
+        enc = self.jpeg_encoders[cam_id]
+        stats = self.stats[cam_id]
+
+        while not self.stop_event.is_set():
+            try:
+                tf = ring.wait_newer(last_seq, timeout=0.5)
+                if tf is None:
+                    continue
+                last_seq = tf.seq
+                started = time.time()
+                q = self.adaptive.settings(cam_id)
+                fps_interval = 1.0 / max(1.0, q.display_fps)
+
+                raw = tf.frame
+                img = raw
+                h, w = img.shape[:2]
+                if q.display_width > 0 and w > q.display_width:
+                    r = q.display_width / float(w)
+                    img = cv2.resize(img, (q.display_width, int(h*r)), interpolation=cv2.INTER_AREA)
+
+                disp = auto_enhance(img) if APPLY_ENHANCE_FOR_DISPLAY else img
+
+                enc.publish(raw, tf.ts, prescaled={disp.shape[1]: disp})
+                if slot is not None and slot.demand_age() < DEMAND_WINDOW:
+                    # ส่งเฟรมเต็มให้ API (tier evidence ต้องใช้) ถ้าใหญ่เกินช่องค่อยส่งภาพย่อ
+                    if not slot.write(disp if APPLY_ENHANCE_FOR_DISPLAY else raw, tf.ts):
+                        slot.write(disp, tf.ts)
+
+                # lag = เฟรมรอนานแค่ไหนกว่าจะถูกหยิบ, busy = สัดส่วนเวลาที่ใช้ต่อเฟรม
+                spent = time.time() - started
+                self.adaptive.observe(cam_id, lag=started - tf.ts, busy=spent / fps_interval)
+                stats.on_display(started, started - tf.ts, spent)
+
+                # จำกัดไม่เกิน display_fps ของระดับปัจจุบัน (นับเวลาที่ใช้ประมวลผลไปแล้วด้วย)
+                rest = fps_interval - spent
+                if rest > 0:
+                    time.sleep(rest)
+
+            except Exception as e:
+                print(f"display worker error (cam {cam_id}):", e)
+                time.sleep(0.01)
+
+    def clip_worker(self, cam_id: int):
+        """
+        ป้อน JPEG (tier clip) ให้ clip_recorder ที่ CLIP_FPS
+        ต้อง encode ต่อเนื่องเพื่อเก็บ pre-roll แต่ใช้ tier ของตัวเอง (ไม่ทำให้ tier display ดูเหมือนมีคนดู)
+        """
+        interval = 1.0 / max(1.0, CLIP_FPS)
+        last_seq = 0
+        enc = self.jpeg_encoders[cam_id]
+        while not self.stop_event.is_set():
+            try:
+                got = enc.get("clip", viewer=False)
+                if got and got[1] != last_seq:
+                    last_seq = got[1]
+                    self.clip_recorder.feed(cam_id, got[2], got[0])
+            except Exception as e:
+                print(f"clip worker error (cam {cam_id}):", e)
+            time.sleep(interval)
+        self.clip_recorder.drop_camera(cam_id)
+
+    def adapt_worker(self):
+        """ทุก ADAPT_INTERVAL วินาที ประเมิน CPU + lag แล้วปรับระดับคุณภาพของแต่ละกล้อง + ส่ง stats ให้ API"""
+        cpu_percent()  # ครั้งแรกของ psutil คืน 0 เสมอ
+        while not self.stop_event.wait(ADAPT_INTERVAL):
+            try:
+                changed = self.adaptive.tick(cpu_percent())
+                for cid in changed:
+                    q = self.adaptive.settings(cid)
+                    print(f"⚙️ cam {cid} quality -> {q.display_fps:g}fps {q.display_width}px "
+                          f"q{q.jpeg_quality} infer {q.infer_hz:g}Hz (cpu={self.adaptive.last_cpu})")
+                self.publish_settings()
+                self.publish_stats()
+            except Exception as e:
+                print("adapt worker error:", e)
+
+    def publish_stats(self) -> None:
+        cameras = {cid: st.snapshot(dropped=self.frame_rings[cid].dropped) for cid, st in self.stats.items()}
+        for cid, snap in cameras.items():
+            enc = self.jpeg_encoders.get(cid)
+            if enc is not None:
+                snap["clip_encodes"] = enc.encode_count.get("clip", 0)
+            src = self.cameras.get(cid)
+            snap["reconnects"] = getattr(src, "reconnects", 0)
+        rf = None
+        if self.roboflow is not None:
+            rf = {"breaker": self.roboflow.breaker.state, "trips": self.roboflow.breaker.trips,
+                  "last_latency_ms": round(self.roboflow.last_latency * 1000, 1),
+                  "bytes_sent": self.roboflow.bytes_sent}
+        self._event("stats", cameras=cameras, primary_cam_id=self.primary_cam_id,
+                    model_type=self.model_type, roboflow=rf,
+                    pipeline={"pending": self.pipeline.pending(), "processed": self.pipeline.processed,
+                              "failed": self.pipeline.failed, "dropped": self.pipeline.dropped})
+
+    def publish_settings(self) -> None:
+        self._event("settings", cpu=self.adaptive.last_cpu, cameras=self.adaptive.snapshot())
+
+    def pin_quality(self, cam_id: int, level: Optional[int]) -> None:
+        self.adaptive.pin(cam_id, level)
+        self.publish_settings()
+
+    # ---------- detection ----------
+    def _get_car_model(self):
+        """โหลดโมเดลตรวจจับรถครั้งเดียว (lazy) จาก CAR_DETECTION_PATH"""
+        if self.car_model is None and CAR_DETECTION_PATH and os.path.exists(CAR_DETECTION_PATH):
+            with self.car_model_lock:
+                if self.car_model is None:
+                    from ultralytics import YOLO
+                    self.car_model = YOLO(CAR_DETECTION_PATH)
+        return self.car_model
+
+    def _detect_cars(self, img) -> list[dict]:
+        model = self._get_car_model()
+        if model is None:
+            return []
+        cars = []
+        for r in model(img, conf=CAR_MIN_CONF, verbose=False):
+            for box in r.boxes:
+                cls_name = model.names.get(int(box.cls[0]), "").lower()
+                if cls_name in CAR_CLASSES:
+                    cars.append({"bbox": box.xyxy[0].tolist(), "confidence": float(box.conf[0])})
+        return cars
+
+    def _load_sticker_model(self) -> None:
+        """
+        โหลดโมเดลสติกเกอร์ของ location (ตัวเดียวกับที่ /detect ใช้) มารันในเครื่อง
+        ถ้า model_url เป็น endpoint ของ Roboflow ใช้ remote เป็นหลัก และใช้โมเดล local เป็นตัวสำรองตอน remote ช้า/ล่ม
+        """
+        if self.active_model_url and "roboflow" in self.active_model_url:
+            self.roboflow = RoboflowClient(self.active_model_url, confidence=RF_MIN_CONF,
+                                           jpeg_quality=_JPEG_QUALITY_RF)
+            self.model_type = "roboflow"
+        try:
+            from ultralytics import YOLO
+            from ..utils.sticker_model_loader import resolve_model_local_path_for_location
+            path = resolve_model_local_path_for_location(self.location_id)
+            self.current_model = YOLO(path)
+            self.model_type = self.model_type or "local"
+            print(f"✅ sticker model loaded (local): {path}")
+        except Exception as e:
+            print(f"⚠️ local sticker model unavailable, using {self.model_type or 'car-only'}:", e)
+
+    def _detect_stickers_local(self, enhanced) -> list[tuple[list[float], float]]:
+        stickers = []
+        for r in self.current_model.predict(enhanced, conf=RF_MIN_CONF, iou=STICKER_IOU, verbose=False):
+            for b in r.boxes:
+                stickers.append((b.xyxy[0].tolist(), float(b.conf[0])))
+        return stickers
+
+    def _detect_stickers(self, enhanced) -> list[tuple[list[float], float]]:
+        """คืน [(xyxy, conf), ...] ของสติกเกอร์ในเฟรม ตาม model_type ปัจจุบัน"""
+        if self.model_type == "roboflow" and self.roboflow is not None and self.roboflow.available():
+            try:
+                return self.roboflow.infer(enhanced)
+            except RemoteInferenceError as e:
+                print(f"⚠️ {e} (breaker={self.roboflow.breaker.state})")
+        # local เป็นหลัก หรือเป็นตัวสำรองตอน Roboflow ช้า/ล่ม (breaker เปิดอยู่)
+        if self.current_model is not None:
+            return self._detect_stickers_local(enhanced)
+        return []
+
+    @staticmethod
+    def _attach_stickers(cars: list[dict], stickers) -> list[dict]:
+        """ผูกสติกเกอร์เข้ากับรถ: จุดกลางสติกเกอร์อยู่ในกล่องรถ → sticker_conf ของรถคันนั้น"""
+        for car in cars:
+            x1, y1, x2, y2 = car["bbox"]
+            best = 0.0
+            for (sx1, sy1, sx2, sy2), c in stickers:
+                cx, cy = (sx1 + sx2) / 2, (sy1 + sy2) / 2
+                if x1 <= cx <= x2 and y1 <= cy <= y2:
+                    best = max(best, c)
+            car["sticker_conf"] = best
+        return cars
+
+    @staticmethod
+    def _attach_plates(cars: list[dict], plates) -> list[dict]:
+        """
+        ผูกป้ายเข้ากับรถ: จุดกลางป้ายอยู่ในกล่องรถ → plate_area = พื้นที่ป้ายที่ใหญ่สุดของคันนั้น (ไม่เจอ = 0)
+        tracker ใช้เลือกเฟรมที่ป้ายใหญ่สุด (OCR อ่านง่ายสุด) แทนการเดาจากขนาดกล่องรถ
+        """
+        for car in cars:
+            x1, y1, x2, y2 = car["bbox"]
+            best = 0.0
+            for (px1, py1, px2, py2), _ in plates:
+                cx, cy = (px1 + px2) / 2, (py1 + py2) / 2
+                if x1 <= cx <= x2 and y1 <= cy <= y2:
+                    best = max(best, box_area((px1, py1, px2, py2)))
+            car["plate_area"] = best
+        return cars
+
+    def _emit_vehicle_pass(self, cam_id: int, track: Track):
+        """
+        รถ 1 คันผ่านไปแล้ว → ส่งเฟรมที่ดีที่สุดเข้าคิว pipeline (upload + OCR + insert + notification)
+        ไม่บล็อก detection_worker; ผลลัพธ์กลับมาที่ _on_recorded
+        """
+        best = track.best
+        if best is None or not self.location_id:
+            return
+        if self.clip_recorder is not None:
+            # ขอคลิปทันทีตอน emit (ไม่รอ upload/OCR/insert) ให้ pre-roll ยังอยู่ใน ring buffer
+            # detection_id ตามมาผูกทีหลังใน _on_recorded
+            self.clip_recorder.request(cam_id, best.ts, location_id=self.location_id)
+        is_sticker = track.max_sticker_conf >= STICKER_CONF
+        self.pipeline.submit(DetectionJob(
+            location_id=self.location_id,
+            model_id=self.model_id,
+            frame=best.frame,
+            car_box=best.box,
+            alt_frames=[f.frame for f in track.top[1:]],
+            alt_boxes=[f.box for f in track.top[1:]],
+            direction=track.direction or "in",
+            is_sticker=is_sticker,
+            sticker_result={"is_sticker": is_sticker, "count": int(is_sticker),
+                            "confident": round(track.max_sticker_conf, 4)},
+            cam_id=cam_id,
+            ts=best.ts,
+            meta={"track_id": track.track_id, "hits": track.hits},
+        ))
+
+    def _on_recorded(self, job: DetectionJob, row: Dict[str, Any], ocr) -> None:
+        if self.clip_recorder is not None:
+            self.clip_recorder.attach_detection(job.cam_id, job.ts, row.get("detections_id"))
+        print(f"🚗 vehicle pass cam={job.cam_id} track={job.meta.get('track_id')} hits={job.meta.get('hits')} "
+              f"direction={job.direction} sticker={job.is_sticker} plate={(ocr or {}).get('lp_number')}")
+        self._event("vehicle_pass", cam_id=job.cam_id, track_id=job.meta.get("track_id"),
+                    direction=job.direction, is_sticker=job.is_sticker,
+                    detection_id=row.get("detections_id"),
+                    plate=(ocr or {}).get("lp_number"))
+
+    def detection_worker(self):
+        """
+        ดึงเฟรมดิบล่าสุดของกล้องหลัก (primary_cam_id) จาก frame_rings ย่อเป็น DETECT_WIDTH แล้วทำ inference
+        ตรวจจับรถ → tracker → emit 1 event ต่อคัน
+        - กล้องที่มี tripwire: emit ตอนรถข้ามเส้น พร้อม direction ที่คำนวณได้
+        - กล้องที่ไม่มี tripwire: emit ตอนรถออกจากเฟรม (direction = "in")
+        """
+        trackers = {}  # {cam_id: VehicleTracker}
+
+        def _emit(cam_id, finished):
+            for tr in finished:
+                self._emit_vehicle_pass(cam_id, tr)
+
+        self._load_sticker_model()
+        localizer = get_plate_localizer()   # ไม่ตั้ง PLATE_MODEL_PATH = เลือกเฟรมจากขนาดกล่องรถแทน
+        last_seq = 0
+
+        while not self.stop_event.is_set():
+            try:
+                pid = self.primary_cam_id
+                ring = None if pid is None else self.frame_rings.get(pid)
+                tf = None if ring is None else ring.latest()
+                if tf is None or tf.seq == last_seq:
+                    time.sleep(0.02)
+                    continue
+                last_seq = tf.seq
+
+                # ขนาดคงที่จากเฟรมดิบ (ไม่ใช้ภาพของ display_worker ที่ย่อตามระดับคุณภาพ)
+                img = tf.frame
+                h, w = img.shape[:2]
+                if DETECT_WIDTH > 0 and w > DETECT_WIDTH:
+                    img = cv2.resize(img, (DETECT_WIDTH, int(h * DETECT_WIDTH / float(w))),
+                                     interpolation=cv2.INTER_AREA)
+                else:
+                    img = img.copy()   # เฟรมใน ring ใช้ร่วมกับ worker อื่น ห้ามแก้ตรงๆ
+
+                now = time.time()
+                t0 = time.perf_counter()
+                enhanced = auto_enhance(img)  # กลางวันข้าม enhance อัตโนมัติ
+
+                stickers = self._detect_stickers(enhanced)
+                if self._get_car_model() is not None:
+                    cars = self._attach_stickers(self._detect_cars(enhanced), stickers)
+                    if cars and localizer.available():
+                        cars = self._attach_plates(cars, localizer.detect(enhanced))
+                else:
+                    # ไม่มีโมเดลรถ: ติดตามกล่องสติกเกอร์แทน (สติกเกอร์ 1 ใบที่ผ่าน = 1 detection)
+                    cars = [{"bbox": box, "sticker_conf": c} for box, c in stickers if c >= STICKER_CONF]
+                self.stats[pid].on_inference(time.perf_counter() - t0)
+                tracker = trackers.get(pid)
+                if tracker is None:
+                    tracker = trackers[pid] = VehicleTracker(
+                        iou_threshold=TRACK_IOU, max_missed=TRACK_MAX_MISSED, min_hits=TRACK_MIN_HITS,
+                        top_k=TRACK_TOP_K, min_gap=TRACK_TOP_GAP)
+                finished = tracker.update(cars, enhanced, now)
+
+                wires = self.tripwires_by_cam.get(pid)
+                if wires:
+                    h, w = enhanced.shape[:2]
+                    for tr in list(tracker.tracks.values()):
+                        if tr.emitted or tr.last_ts != now:
+                            continue
+                        direction = direction_from_trajectory(wires, tr.centroids, w, h)
+                        if direction:
+                            tr.direction = direction   # ข้ามเส้นล่าสุด (ข้ามกลับ = ทิศเปลี่ยน)
+                        # เกณฑ์ min_hits เดียวกับกล้องที่ไม่มี tripwire: ข้ามเส้นตอนยังเห็นไม่กี่เฟรม → รอจน hits ถึงค่อย emit
+                        if tr.direction and tr.hits >= tracker.min_hits:
+                            tr.emitted = True
+                            _emit(pid, [tr])
+                else:
+                    _emit(pid, finished)
+
+                time.sleep(1.0 / max(0.1, self.adaptive.settings(pid).infer_hz))  # ~5Hz ที่ระดับสูงสุด
+
+            except Exception as e:
+                print("infer worker error:", e)
+                time.sleep(0.2)
+
+        # หยุด worker แล้ว: รถที่ยังค้างอยู่ในเฟรมถือว่าผ่านแล้ว (เฉพาะกล้องที่ไม่มี tripwire)
+        for cid, tracker in trackers.items():
+            pending = tracker.flush()
+            if not self.tripwires_by_cam.get(cid):
+                _emit(cid, pending)
+
+
+def engine_main(config: Dict[str, Any], cmd_q, events_q) -> None:
+    """entry point ของ engine process (spawn) รันจนได้คำสั่ง stop หรือ API process ตาย"""
+    import cloudinary
+    load_dotenv()
+    cloudinary.config(
+        cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    )
+
+    engine = CameraEngine(config, events_q)
+    if not engine.start():
+        engine.stop()
+        return
+
+    parent = mp.parent_process()
+    while True:
+        try:
+            cmd = cmd_q.get(timeout=0.5)
+        except queue.Empty:
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        if cmd == "stop":
+            break
+        if isinstance(cmd, dict) and cmd.get("cmd") == "pin":
+            try:
+                engine.pin_quality(int(cmd["cam_id"]), cmd.get("level"))
+            except (KeyError, TypeError, ValueError) as e:
+                print("⚠️ invalid pin command:", e)
+    engine.stop()
+
+
+# =====================================================================
+# API process
+# =====================================================================
+
+class _EngineGroup:
+    def __init__(self, name: str, config: Dict[str, Any], slots: Dict[int, SharedFrameSlot]):
+        self.name = name
+        self.config = config
+        self.slots = slots
+        self.encoders: Dict[int, TieredJpegEncoder] = {cid: new_jpeg_encoder() for cid in slots}
+        self.published: Dict[int, int] = {cid: 0 for cid in slots}   # slot seq ล่าสุดที่ publish แล้ว
+        self.read_locks: Dict[int, threading.Lock] = {cid: threading.Lock() for cid in slots}
+        self.process: Optional[mp.process.BaseProcess] = None
+        self.cmd_q = None
+        self.events_q = None
+        self.started = threading.Event()
+        self.result: Dict[str, Any] = {}
+        self.settings: Dict[str, Any] = {}     # snapshot ล่าสุดจาก event "settings"
+        self.stats: Dict[str, Any] = {}        # snapshot ล่าสุดจาก event "stats"
+        self.stopping = False
+        # ถือระหว่าง spawn process (ไม่ใช่ lock ของ client) → _shutdown รอ spawn ที่ค้างอยู่เสร็จก่อนอ่าน g.process
+        self.launch_lock = threading.Lock()
+        self.launched_at = 0.0
+        self.restarts = 0
+        self.backoff = RESTART_MIN_BACKOFF
+        self.next_restart = 0.0
+
+    def device_ids(self) -> List[int]:
+        return [c["cam_id"] for c in self.config["cameras"] if c.get("device")]
+
+
+class CameraEngineClient:
+    """
+    ฝั่ง API: 1 engine process ต่อกลุ่มกล้อง
+    - start() สร้าง shared memory ต่อกล้อง → spawn process → รอ event "started"
+    - supervisor thread อ่าน event และ restart process ที่ตายเองแบบ backoff
+    - frame() อ่านเฟรมจาก shared memory แล้ว encode ตาม tier (lazy, แชร์ bytes ระหว่าง viewer)
+    """
+
+    def __init__(self, max_events: int = 200):
+        self._ctx = mp.get_context("spawn")
+        self._groups: Dict[str, _EngineGroup] = {}
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._supervisor: Optional[threading.Thread] = None
+        self._next_stream_id = STREAM_CAM_ID_BASE
+        # กลุ่มที่กำลังปิดอยู่เบื้องหลัง (stop แบบไม่รอ) → (group, thread) ยังนับว่าถือกล้องอยู่จนปิดเสร็จ
+        self._closing: Dict[str, Tuple[_EngineGroup, threading.Thread]] = {}
+        atexit.register(self.stop)
+
+    def allocate_stream_ids(self, n: int) -> List[int]:
+        """
+        จอง cam_id ให้แหล่งภาพที่ไม่ใช่ webcam n ตัว
+        นับต่อเนื่องข้ามทุกกลุ่ม (ไม่นำ id เดิมกลับมาใช้) → กลุ่มที่สองไม่ได้ 100 ซ้ำกับกลุ่มแรก
+        """
+        with self._lock:
+            first = self._next_stream_id
+            self._next_stream_id += n
+        return list(range(first, first + n))
+
+    # ---------- control ----------
+    def start(self, group: str, config: Dict[str, Any], timeout: float = ENGINE_START_TIMEOUT) -> Dict[str, Any]:
+        """
+        config["cameras"] = [{"cam_id", "source", "device": bool}, ...]
+        คืน {"opened": [...], "sources": {...}, "failed": [...]} (opened ว่าง = เปิดไม่ได้สักตัว)
+        """
+        self.stop(group)   # รอให้ process เก่าของกลุ่มนี้ปล่อยกล้องก่อนเปิดใหม่
+
+        cam_ids = [c["cam_id"] for c in config["cameras"]]
+        with self._lock:
+            busy = list(self._groups.values()) + [g for g, _ in self._closing.values()]
+            taken = {cid for g in busy for cid in g.slots}
+        clash = sorted(taken & set(cam_ids))
+        if clash:
+            raise ValueError(f"camera ids already used by another group: {clash}")
+
+        slots = {cid: SharedFrameSlot.create() for cid in cam_ids}
+        config = {**config, "group": group,
+                  "cameras": [{**c, "slot": slots[c["cam_id"]].name} for c in config["cameras"]]}
+        g = _EngineGroup(group, config, slots)
+        with self._lock:
+            self._groups[group] = g
+        with g.launch_lock:
+            self._launch(g)
+        self._ensure_supervisor()
+
+        deadline = time.monotonic() + timeout
+        while not g.started.wait(0.1):
+            if not g.process.is_alive():
+                self._drain(g)   # อาจส่ง "started" มาก่อนจบ process พอดี
+                if g.started.is_set():
+                    break
+                self.stop(group)
+                raise RuntimeError(f"camera engine '{group}' exited during start "
+                                   f"(code={g.process.exitcode})")
+            if time.monotonic() > deadline:
+                self.stop(group)
+                raise TimeoutError(f"camera engine '{group}' did not start within {timeout:.0f}s")
+
+        result = dict(g.result)
+        if not result.get("opened"):
+            self.stop(group)
+        return result
+
+    def _launch(self, g: _EngineGroup) -> None:
+        g.cmd_q = self._ctx.Queue()
+        g.events_q = self._ctx.Queue()
+        g.process = self._ctx.Process(
+            target=engine_main, args=(g.config, g.cmd_q, g.events_q),
+            name=f"camera-engine-{g.name}", daemon=True)
+        g.launched_at = time.monotonic()
+        g.process.start()
+        print(f"🚀 camera engine '{g.name}' started pid={g.process.pid}")
+
+    def stop(self, group: Optional[str] = None, wait: bool = True) -> None:
+        """
+        หยุด engine ของกลุ่มที่ระบุ (None = ทุกกลุ่ม) แล้วคืน shared memory
+        wait=False: คืนทันที ปิด process ต่อใน thread เบื้องหลัง (ใช้จาก request handler ไม่ให้ถือ thread นาน)
+        """
+        with self._lock:
+            names = list(self._groups) if group is None else [group]
+            groups = [self._groups.pop(n) for n in names if n in self._groups]
+            for g in groups:
+                g.stopping = True   # ตั้งใน lock เดียวกับที่ pop → supervisor ไม่ relaunch กลุ่มที่กำลังปิด
+            for g in groups:
+                th = threading.Thread(target=self._shutdown, args=(g,),
+                                      name=f"camera-engine-stop-{g.name}", daemon=True)
+                self._closing[g.name] = (g, th)
+                th.start()
+            closing = [th for n, (_, th) in self._closing.items() if group is None or n == group]
+        if wait:
+            for th in closing:
+                th.join()
+
+    def _shutdown(self, g: _EngineGroup) -> None:
+        try:
+            with g.launch_lock:   # ถ้า supervisor/start กำลัง spawn อยู่ รอให้ได้ process ใหม่มาปิดด้วย
+                proc = g.process
+            if proc is not None and proc.is_alive():
+                try:
+                    g.cmd_q.put("stop")
+                except Exception:
+                    pass
+                proc.join(timeout=ENGINE_STOP_TIMEOUT)
+                if proc.is_alive():
+                    print(f"⚠️ camera engine '{g.name}' did not stop in {ENGINE_STOP_TIMEOUT:.0f}s, terminating")
+                    proc.terminate()
+                    proc.join(timeout=2)
+            self._drain(g)
+            for slot in g.slots.values():
+                slot.close()
+        finally:
+            with self._lock:
+                if self._closing.get(g.name, (None, None))[0] is g:
+                    self._closing.pop(g.name, None)
+
+    # ---------- supervisor ----------
+    def _ensure_supervisor(self) -> None:
+        if self._supervisor is None or not self._supervisor.is_alive():
+            self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+            self._supervisor.start()
+
+    def _drain(self, g: _EngineGroup) -> None:
+        while True:
+            try:
+                ev = g.events_q.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            if ev.get("type") == "started":
+                g.result = {k: ev.get(k) for k in ("opened", "sources", "failed")}
+                g.started.set()
+            elif ev.get("type") == "settings":
+                # ให้ encoder ฝั่ง API ใช้ขนาด/quality เดียวกับที่ engine ปรับไว้
+                for cid, st in (ev.get("cameras") or {}).items():
+                    enc = g.encoders.get(cid)
+                    if enc is not None:
+                        enc.set_tier("display", Tier(st["display_width"], st["jpeg_quality"]))
+                g.settings = {"cpu": ev.get("cpu"), "cameras": ev.get("cameras") or {}, "ts": ev.get("ts")}
+                continue  # มาทุก ADAPT_INTERVAL ไม่ต้องเก็บใน events
+            elif ev.get("type") == "stats":
+                g.stats = ev
+                continue
+            elif ev.get("type") == "error":
+                print(f"⚠️ camera engine '{g.name}' error:", ev.get("error"))
+            self._events.append(ev)
+
+    def _supervise(self) -> None:
+        while True:
+            with self._lock:
+                groups = list(self._groups.values())
+            for g in groups:
+                if g.stopping:
+                    continue
+                self._drain(g)
+                proc = g.process
+                if proc is None or proc.is_alive() or not g.result.get("opened"):
+                    continue
+                # process ตายเอง (crash / driver ค้างจนโดน kill) → restart ด้วย config เดิม
+                now = time.monotonic()
+                if g.next_restart == 0.0:
+                    if now - g.launched_at > RESTART_RESET_AFTER:
+                        g.backoff = RESTART_MIN_BACKOFF
+                    g.next_restart = now + g.backoff
+                    print(f"⚠️ camera engine '{g.name}' exited (code={proc.exitcode}), "
+                          f"restart in {g.backoff:.0f}s")
+                    self._events.append({"type": "crashed", "group": g.name,
+                                         "ts": time.time(), "exitcode": proc.exitcode})
+                elif now >= g.next_restart:
+                    with g.launch_lock:
+                        with self._lock:
+                            # เช็กซ้ำใน lock: stop() อาจ pop กลุ่มนี้ไปหลังจากที่เราหยิบ snapshot มา
+                            if g.stopping:
+                                continue
+                            g.next_restart = 0.0
+                            g.backoff = min(RESTART_MAX_BACKOFF, g.backoff * 2)
+                            g.restarts += 1
+                        # spawn นอก self._lock (ใช้เวลาหลายร้อย ms) ไม่ให้ frame()/stop()/start() ของกลุ่มอื่นค้าง
+                        # stop() ที่ pop กลุ่มนี้ระหว่าง spawn: _shutdown รอ launch_lock แล้วปิด process ใหม่นี้ให้
+                        self._launch(g)
+            time.sleep(0.2)
+
+    # ---------- serving ----------
+    def _group_of(self, cam_id: int) -> Optional[_EngineGroup]:
+        with self._lock:
+            for g in self._groups.values():
+                if cam_id in g.slots:
+                    return g
+        return None
+
+    def frame(self, cam_id: int, tier: str) -> Optional[Tuple[bytes, int, float]]:
+        """JPEG ล่าสุดของกล้องตาม tier → (bytes, seq, ts) หรือ None ถ้ายังไม่มีเฟรม"""
+        g = self._group_of(cam_id)
+        if g is None:
+            return None
+        slot = g.slots[cam_id]
+        slot.touch_demand()   # บอก engine ว่ามีคนดูอยู่ ให้เขียนเฟรมลง shared memory ต่อ
+        seq, _ = slot.header()
+        if not seq:
+            return None
+        enc = g.encoders[cam_id]
+        if seq != g.published[cam_id]:
+            with g.read_locks[cam_id]:
+                if seq != g.published[cam_id]:
+                    got = slot.read()
+                    if got is not None:
+                        enc.publish(got[2], got[1])
+                        g.published[cam_id] = got[0]
+        return enc.get(tier)
+
+    def latest(self, cam_id: int) -> Optional[Tuple[int, float]]:
+        """(seq, ts) ของเฟรมล่าสุดใน shared memory โดยไม่ encode (ราคาถูก ใช้ poll จาก event loop ได้)"""
+        g = self._group_of(cam_id)
+        if g is None:
+            return None
+        slot = g.slots[cam_id]
+        slot.touch_demand()
+        return slot.header()
+
+    def camera_state(self, cam_id: int, staleness: float = 0.5) -> str:
+        """live | starting (ยังไม่มีเฟรมแรก) | stalled (เฟรมเก่าเกิน / engine ตาย) | stopped (ไม่ได้เปิด)"""
+        g = self._group_of(cam_id)
+        if g is None:
+            return STATE_STOPPED
+        seq, ts = g.slots[cam_id].header()
+        if not (g.process and g.process.is_alive()):
+            return STATE_STALLED if seq else STATE_STARTING
+        if not seq:
+            return STATE_STARTING
+        return STATE_STALLED if time.time() - ts > staleness else "live"
+
+    def devices_in_use(self) -> List[int]:
+        with self._lock:
+            groups = list(self._groups.values()) + [g for g, _ in self._closing.values()]
+        return sorted({cid for g in groups for cid in g.device_ids()})
+
+    def cam_ids(self, group: Optional[str] = None) -> List[int]:
+        with self._lock:
+            return sorted(cid for g in self._groups.values()
+                          if group is None or g.name == group for cid in g.slots)
+
+    def groups(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {g.name: {
+                "pid": g.process.pid if g.process else None,
+                "alive": bool(g.process and g.process.is_alive()),
+                "restarts": g.restarts,
+                "cameras": sorted(g.slots),
+            } for g in self._groups.values()}
+
+    def settings(self) -> Dict[str, Dict[str, Any]]:
+        """ระดับคุณภาพปัจจุบันต่อกล้อง แยกตามกลุ่ม (อัปเดตทุก ADAPT_INTERVAL)"""
+        with self._lock:
+            return {g.name: dict(g.settings) for g in self._groups.values()}
+
+    def pin_quality(self, cam_id: int, level: Optional[int]) -> bool:
+        """ล็อกระดับคุณภาพของกล้อง (None = ปรับอัตโนมัติ) คืน False ถ้าไม่มีกล้องนี้"""
+        if level is not None and not 0 <= level < len(DEFAULT_LADDER):
+            raise ValueError(f"level must be 0..{len(DEFAULT_LADDER) - 1}")
+        g = self._group_of(cam_id)
+        if g is None:
+            return False
+        g.config.setdefault("pins", {})[cam_id] = level   # ให้คงอยู่ถ้า engine ถูก restart
+        g.cmd_q.put({"cmd": "pin", "cam_id": cam_id, "level": level})
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        สถานะ/ปริมาณงานต่อกล้อง แยกตามกลุ่ม: ค่าจาก engine (อัปเดตทุก ADAPT_INTERVAL)
+        + อายุเฟรมล่าสุดคิดสด ณ ตอนขอ + เวลา encode JPEG ฝั่ง API ต่อ tier
+        """
+        now = time.time()
+        out = {}
+        with self._lock:
+            groups = list(self._groups.values())
+        for g in groups:
+            st = g.stats or {}
+            cams = {}
+            for cid, snap in (st.get("cameras") or {}).items():
+                snap = dict(snap)
+                snap["last_frame_age_s"] = round(now - snap["last_frame_ts"], 3) if snap.get("last_frame_ts") else None
+                enc = g.encoders.get(cid)
+                if enc is not None:
+                    snap["encode"] = {t: {"count": n, "avg_ms": round(enc.encode_seconds[t] / n * 1000, 2) if n else 0.0}
+                                      for t, n in enc.encode_count.items()}
+                cams[cid] = snap
+            out[g.name] = {
+                "pid": g.process.pid if g.process else None,
+                "alive": bool(g.process and g.process.is_alive()),
+                "restarts": g.restarts,
+                "stats_age_s": round(now - st["ts"], 2) if st.get("ts") else None,
+                "model_type": st.get("model_type"),
+                "pipeline": st.get("pipeline"),
+                "roboflow": st.get("roboflow"),
+                "cameras": cams,
+            }
+        return out
+
+    def metrics_text(self) -> str:
+        """stats() ในรูป Prometheus text format"""
+        all_stats = self.stats()
+        rows = []
+        for group, gs in all_stats.items():
+            for cid, c in gs["cameras"].items():
+                rows.append(({"group": group, "cam": cid}, c, gs))
+        g_only = [({"group": name}, gs) for name, gs in all_stats.items()]
+
+        def cam(key, fn=None):
+            return [(lbl, fn(c) if fn else c.get(key) or 0) for lbl, c, _ in rows]
+
+        def enc(tier_fn):
+            out = []
+            for lbl, c, _ in rows:
+                for tier, e in (c.get("encode") or {}).items():
+                    out.append(({**lbl, "tier": tier}, tier_fn(e)))
+            return out
+
+        metrics = [
+            ("camera_up", "gauge", "Engine process for the camera is alive (1/0)",
+             [(lbl, 1 if gs["alive"] else 0) for lbl, _, gs in rows]),
+            ("camera_grab_fps", "gauge", "Frames grabbed per second (5s window)", cam("grab_fps")),
+            ("camera_display_fps", "gauge", "Frames processed by the display worker per second", cam("display_fps")),
+            ("camera_frames_grabbed_total", "counter", "Frames grabbed from the source", cam("frames_grabbed")),
+            ("camera_frames_dropped_total", "counter", "Frames overwritten in the ring before being read",
+             cam("frames_dropped")),
+            ("camera_read_failures_total", "counter", "Failed reads from the source", cam("read_failures")),
+            ("camera_reconnects_total", "counter", "Stream reconnect attempts", cam("reconnects")),
+            ("camera_last_frame_age_seconds", "gauge", "Seconds since the last grabbed frame",
+             cam(None, lambda c: c["last_frame_age_s"] if c.get("last_frame_age_s") is not None else -1)),
+            ("camera_display_lag_p95_seconds", "gauge", "Frame age when picked up by the display worker (p95)",
+             cam(None, lambda c: c["display_lag"]["p95_ms"] / 1000)),
+            ("camera_inference_p95_seconds", "gauge", "Detection time per frame (p95)",
+             cam(None, lambda c: c["inference_time"]["p95_ms"] / 1000)),
+            ("camera_inference_seconds_total", "counter", "Total detection time", cam("inference_seconds")),
+            ("camera_inferences_total", "counter", "Detection passes", cam("inferences")),
+            ("camera_jpeg_encodes_total", "counter", "JPEG encodes for viewers per tier",
+             enc(lambda e: e["count"])),
+            ("camera_jpeg_encode_avg_seconds", "gauge", "Average JPEG encode time per tier",
+             enc(lambda e: e["avg_ms"] / 1000)),
+            ("camera_engine_restarts_total", "counter", "Engine process restarts after a crash",
+             [(lbl, gs["restarts"]) for lbl, gs in g_only]),
+            ("camera_detection_queue_pending", "gauge", "Vehicle passes waiting for upload/OCR/insert",
+             [(lbl, (gs["pipeline"] or {}).get("pending", 0)) for lbl, gs in g_only]),
+            ("camera_detection_queue_dropped_total", "counter", "Vehicle passes dropped because the queue was full",
+             [(lbl, (gs["pipeline"] or {}).get("dropped", 0)) for lbl, gs in g_only]),
+        ]
+        return render_prometheus(metrics)
+
+    def events(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return list(self._events)[-limit:]
+
+
+_client: Optional[CameraEngineClient] = None
+_client_lock = threading.Lock()
+
+
+def get_camera_engine() -> CameraEngineClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = CameraEngineClient()
+        return _client
@@ -0,0 +1,173 @@
+# api_service/detection_pipeline.py - ขั้นตอนหลังตรวจจับที่ใช้ร่วมกันระหว่าง /detect และกล้องสด
+# insert detections → สร้าง notification (insert_and_notify)
+# กล้องสดส่งงานเข้า LiveDetectionQueue (asyncio queue ใน thread ของตัวเอง) ไม่ต้องยิง HTTP กลับเข้า /detect
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+from ..utils.processor import insert_detection_payload
+from ..utils.cloudinary_uploader import CloudinaryUploader
+from .ai4thai_ocr_LP_api import get_ocr_client
+from .plate_ocr import recognize_track_plates
+from ..utils.ocr_quota import PRIORITY_HIGH, PRIORITY_LOW
+from .notifications_service import create_from_detection
+
+logger = logging.getLogger(__name__)
+
+
+def first_row(resp: Any) -> Optional[Dict[str, Any]]:
+    """ดึง row แรกจากผล insert (รองรับทั้ง APIResponse ของ supabase, dict และ list)"""
+    if hasattr(resp, "data"):
+        data = resp.data or []
+        return data[0] if isinstance(data, list) and data else data
+    if isinstance(resp, dict) and "data" in resp:
+        data = resp["data"] or []
+        return data[0] if isinstance(data, list) and data else data
+    if isinstance(resp, list):
+        return resp[0] if resp else None
+    return resp  # เผื่อฟังก์ชันคืน row ตรง ๆ
+
+
+def insert_and_notify(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Any]:
+    """insert detections 1 แถว แล้วสร้าง notification จากแถวนั้น คืน (row, notification)"""
+    row = first_row(insert_detection_payload(payload))
+    if not row:
+        raise RuntimeError("Insertion returned empty data")
+    notif = create_from_detection(row)
+    return row, getattr(notif, "data", notif)
+
+
+@dataclass
+class DetectionJob:
+    location_id: str
+    model_id: Any
+    frame: np.ndarray                   # เฟรมหลักฐาน (BGR) encode ตอนประมวลผลในคิว
+    car_box: Optional[Tuple[float, float, float, float]] = None   # กล่องรถใน frame (OCR เฉพาะป้ายของคันนี้)
+    alt_frames: List[np.ndarray] = field(default_factory=list)   # เฟรมสำรองของคันเดียวกัน ใช้ OCR ซ้ำถ้าผลแรกกำกวม
+    alt_boxes: List[Tuple[float, float, float, float]] = field(default_factory=list)   # กล่องรถในแต่ละ alt_frames
+    direction: str = "in"
+    is_sticker: bool = False
+    sticker_result: Dict[str, Any] = field(default_factory=dict)
+    cam_id: Optional[int] = None
+    ts: float = 0.0                     # เวลาของเฟรมหลักฐาน (= event_ts ของคลิปที่ขอไว้ตอน emit)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+class LiveDetectionQueue:
+    """
+    คิวงาน detection จากกล้องสด: submit() เรียกจาก thread ไหนก็ได้ (ไม่บล็อก)
+    worker แต่ละตัวทำ encode → (upload ‖ OCR พร้อมกัน) → insert_and_notify แล้วเรียก on_done(job, row, ocr)
+    """
+
+    def __init__(self, workers: int = 3, maxsize: int = 256, jpeg_quality: int = 85,
+                 on_done: Optional[Callable[[DetectionJob, Dict[str, Any], Any], None]] = None):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.jpeg_quality = jpeg_quality
+        self.on_done = on_done
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._uploader: Optional[CloudinaryUploader] = None
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="live-detection-queue", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._queue = asyncio.Queue()   # จำกัดขนาดเองใน _enqueue เพื่อให้ sentinel ตอน stop เข้าคิวได้เสมอ
+        tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._ready.set()
+        try:
+            loop.run_until_complete(asyncio.gather(*tasks))
+            loop.run_until_complete(get_ocr_client().aclose())   # ปิด connection pool ของ OCR ก่อน process ของ engine จบ
+        finally:
+            loop.close()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """ปิดรับงาน แล้วรอให้งานที่อยู่ในคิวทำเสร็จ (ไม่เกิน timeout)"""
+        if self._loop is None or self._thread is None:
+            return
+        for _ in range(self.workers):
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join(timeout)
+
+    # ---------- producer ----------
+    def submit(self, job: DetectionJob) -> bool:
+        if self._loop is None or self._loop.is_closed():
+            return False
+        self._loop.call_soon_threadsafe(self._enqueue, job)
+        return True
+
+    def _enqueue(self, job: DetectionJob) -> None:
+        if self._queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            logger.warning(f"⚠️ live detection queue full, dropped cam={job.cam_id}")
+            return
+        self._queue.put_nowait(job)
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ---------- consumer ----------
+    def _upload(self, jpeg: bytes) -> str:
+        if self._uploader is None:
+            self._uploader = CloudinaryUploader()
+        return self._uploader.upload_bytes(jpeg, folder="detection")
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                if job is None:
+                    return
+                await self._process(loop, job)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ live detection failed (cam {job.cam_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, loop: asyncio.AbstractEventLoop, job: DetectionJob) -> None:
+        ok, buf = await loop.run_in_executor(
+            None, cv2.imencode, ".jpg", job.frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            raise RuntimeError("JPEG encode failed")
+        jpeg = buf.tobytes()
+
+        # upload กับ OCR ไม่ขึ้นต่อกัน ยิงพร้อมกันได้
+        image_url, ocr = await asyncio.gather(
+            loop.run_in_executor(None, self._upload, jpeg),
+            # ตัดเฉพาะป้ายส่ง OCR ถ้ามีโมเดลป้าย; ผลกำกวม → อ่านเฟรมสำรองเพิ่มแล้วโหวตรวม
+            # ขาออกเป็นงานรอง (ใกล้โควตา AI4Thai → ใช้ cache / local แทน) ขาเข้าคือคันที่ต้องตัดสินสิทธิ์
+            recognize_track_plates([job.frame, *job.alt_frames], jpeg, job.location_id,
+                                   priority=PRIORITY_LOW if job.direction == "out" else PRIORITY_HIGH,
+                                   boxes=[job.car_box, *job.alt_boxes]),
+        )
+        payload = {
+            "location_id": job.location_id,
+            "model_id": job.model_id,
+            "image_path": [image_url] if image_url else [],
+            "detected_plate": ocr,
+            "direction": job.direction,
+            "is_sticker": job.is_sticker,
+            "sticker_result": job.sticker_result,
+        }
+        row, _ = await loop.run_in_executor(None, insert_and_notify, payload)
+        if self.on_done is not None:
+            self.on_done(job, row, ocr)
@@ -0,0 +1,108 @@
+# api_service/frame_broadcast.py - กระจายเฟรม JPEG จาก camera engine ให้ viewer แบบ async (FastAPI)
+# poller 1 ตัวต่อ (กล้อง, tier) เช็ก seq ใน shared memory แล้ว encode ครั้งเดียวใน threadpool
+# viewer แต่ละคนเป็นแค่ coroutine ที่รอ asyncio.Condition → viewer ที่รอเฉยๆ ไม่กิน thread ของ OS
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[bytes, int, float]   # (jpeg, seq, ts)
+
+
+class _Channel:
+    def __init__(self):
+        self.cond = asyncio.Condition()
+        self.frame: Optional[Frame] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class FrameBroadcaster:
+    """
+    - wait_frame(cam, tier, min_ts, timeout) → เฟรมแรกที่ใหม่กว่า min_ts หรือ None ถ้าหมดเวลา (ใช้กับ /frame_raw)
+    - stream(cam, tier, max_fps) → async iterator ของเฟรมใหม่ทุกเฟรม (ใช้กับ MJPEG)
+    poller หยุดเองเมื่อไม่มี subscriber เหลือ
+    """
+
+    def __init__(self, engine, poll_interval: float = 0.01):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self._channels: Dict[Tuple[int, str], _Channel] = {}
+
+    def _channel(self, cam_id: int, tier: str) -> _Channel:
+        key = (cam_id, tier)
+        ch = self._channels.get(key)
+        if ch is None:
+            ch = self._channels[key] = _Channel()
+        if ch.task is None or ch.task.done():
+            ch.task = asyncio.get_running_loop().create_task(self._poll(key, ch))
+        return ch
+
+    async def _poll(self, key: Tuple[int, str], ch: _Channel) -> None:
+        cam_id, tier = key
+        last_seq = ch.frame[1] if ch.frame else 0
+        try:
+            while ch.subscribers > 0:
+                head = self.engine.latest(cam_id)
+                if head and head[0] and head[0] != last_seq:
+                    # encode (ถ้ายังไม่มีใน cache ของ tier) อยู่นอก event loop
+                    got = await run_in_threadpool(self.engine.frame, cam_id, tier)
+                    if got is not None and got[1] != last_seq:
+                        last_seq = got[1]
+                        async with ch.cond:
+                            ch.frame = got
+                            ch.cond.notify_all()
+                await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            logger.warning(f"⚠️ frame poller cam={cam_id} tier={tier} stopped: {e}")
+        finally:
+            if ch.subscribers <= 0 and self._channels.get(key) is ch:
+                self._channels.pop(key, None)
+
+    async def wait_frame(self, cam_id: int, tier: str, min_ts: float = 0.0,
+                         timeout: float = 0.3) -> Optional[Frame]:
+        ch = self._channel(cam_id, tier)
+        ch.subscribers += 1
+        try:
+            async with ch.cond:
+                await asyncio.wait_for(
+                    ch.cond.wait_for(lambda: ch.frame is not None and ch.frame[2] > min_ts), timeout)
+                return ch.frame
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            ch.subscribers -= 1
+
+    def last(self, cam_id: int, tier: str) -> Optional[Frame]:
+        ch = self._channels.get((cam_id, tier))
+        return ch.frame if ch else None
+
+    async def stream(self, cam_id: int, tier: str, max_fps: float = 0.0,
+                     idle_timeout: float = 5.0) -> AsyncIterator[Frame]:
+        """ส่งเฟรมใหม่ไปเรื่อยๆ จนไม่มีเฟรมใหม่นาน idle_timeout วินาที (กล้องหยุด/ค้าง)"""
+        ch = self._channel(cam_id, tier)
+        ch.subscribers += 1
+        min_gap = 1.0 / max_fps if max_fps > 0 else 0.0
+        last_seq, last_sent = 0, 0.0
+        try:
+            while True:
+                async with ch.cond:
+                    try:
+                        await asyncio.wait_for(
+                            ch.cond.wait_for(lambda: ch.frame is not None and ch.frame[1] != last_seq),
+                            idle_timeout)
+                    except asyncio.TimeoutError:
+                        return
+                    frame = ch.frame
+                last_seq = frame[1]
+                yield frame
+                if min_gap:
+                    wait = min_gap - (time.monotonic() - last_sent)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    last_sent = time.monotonic()
+        finally:
+            ch.subscribers -= 1
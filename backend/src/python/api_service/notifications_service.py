@@ -2,45 +2,30 @@
 from datetime import datetime
 from typing import Any, Dict, Optional
 from ..db.supabase_client import get_supabase_client
+from .plate_registry import get_plate_registry, normalize_lp, norm_province
 from ..utils.notify_rules import classify_notification, STATUS_NEW, STATUS_READ
 from zoneinfo import ZoneInfo   
 
-TH_NUM_MAP = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
 TH_TZ = ZoneInfo("Asia/Bangkok")  
 
-def normalize_lp(s: Optional[str]) -> Optional[str]:
-    if not s:
-        return None
-    x = s.strip().replace(" ", "")
-    x = x.translate(TH_NUM_MAP)   
-    return x.upper()
 def th_now_str() -> str: 
     return datetime.now(TH_TZ).replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
-def norm_province(s: Optional[str]) -> Optional[str]: # Norm ชื่อจังหวัด
-    if not s:
-        return None
-    return s.strip()
 
 def resolve_registration_for_detection(detection_row: Dict[str, Any]) -> Dict[str, Any]:
     # ตรวจว่าเลขป้าย + จังหวัด ที่ OCR ได้ ตรงกับตาราง license_plate ของสถานที่นั้นหรือไม่
-    sb = get_supabase_client()
-
-    # 1.ดึง location_license
-    loc = (sb.table("locations").select("location_license, location_name")   
-        .eq("location_id", detection_row["location_id"]).single().execute())
-    location_license = (loc.data or {}).get("location_license")
-    location_name = (loc.data or {}).get("location_name") 
+    # ใช้ดัชนีในหน่วยความจำ (plate_registry) แทนการ query Supabase ทุก detection
+    registry = get_plate_registry()
+    location_id = detection_row["location_id"]
 
-    # 2.เตรียมค่า OCR
+    # 1.เตรียมค่า OCR
     dp = detection_row.get("detected_plate") or {}
     status = dp.get("status")
     raw_lp = dp.get("lp_number")
-    raw_prov = dp.get("province")
-    lp_norm = normalize_lp(raw_lp)         
-    prov_norm = norm_province(raw_prov)
+    raw_prov = dp.get("province_code") or dp.get("province")
 
     # ถ้าอ่านป้ายไม่ได้ จะ ไม่มีสิทธิ์ยืนยันว่า registered
-    if status != 200 or not lp_norm:
+    if status != 200 or not normalize_lp(raw_lp):
+        location_license, location_name = registry.location_info(location_id)
         return {
             "is_registered": False,
             "location_license": location_license,
@@ -48,45 +33,11 @@ def resolve_registration_for_detection(detection_row: Dict[str, Any]) -> Dict[st
             "matched_license_id": None,
             "match_policy": "none"}
 
-    # 3.strict: plate + province
-    strict = (sb.table("license_plate").select("license_id, license_text, license_local")
-        .eq("location_license", location_license)
-        .eq("license_text", lp_norm)
-        .eq("license_local", prov_norm if prov_norm else "")
-        .execute()).data or []
-
-    if strict:
-        return {
-            "is_registered": True,
-            "location_license": location_license,
-            "location_name": location_name,
-            "matched_license_id": strict[0]["license_id"],
-            "match_policy": "strict"}
-
-    # 4.plate อย่างเดียว (กรณี province อ่านผิด/เว้นว่าง)
-    loose = (
-        sb.table("license_plate").select("license_id")
-        .eq("location_license", location_license)
-        .eq("license_text", lp_norm)
-        .execute()).data or []
-
-    if loose:
-        return {
-            "is_registered": True,
-            "location_license": location_license,
-            "location_name": location_name,
-            "matched_license_id": loose[0]["license_id"],
-            "match_policy": "plate_only"}
-    
-    # ไม่พบ
-    return {
-        "is_registered": False,
-        "location_license": location_license,
-        "location_name": location_name,
-        "matched_license_id": None,
-        "match_policy": "none"}   
+    # 2.strict: plate + province → plate อย่างเดียว (กรณี province อ่านผิด/เว้นว่าง) → fuzzy → ไม่พบ
+    return registry.lookup(location_id, raw_lp, raw_prov)
 # ถ้าตรงทั้งป้าย+จังหวัด → match_policy='strict'
 # ถ้าตรงเฉพาะป้าย → match_policy='plate_only'
+# ถ้าป้ายใกล้เคียงป้ายที่ลงทะเบียน (OCR อ่านเพี้ยน) → match_policy='fuzzy'
 
 def create_from_detection(detection_row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     reg = resolve_registration_for_detection(detection_row)
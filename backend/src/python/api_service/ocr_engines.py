@@ -0,0 +1,218 @@
+# api_service/ocr_engines.py - ตัวอ่านป้ายทะเบียนแบบเสียบเปลี่ยนได้ (AI4Thai / local offline) + ลำดับการใช้งาน
+# ทุก engine คืน dict รูปแบบเดียวกับ AI4Thai (lp_number, province, conf 0-100, ...) + "ocr_engine" บอกว่ามาจากตัวไหน
+# OCR_ENGINE_MODE:
+#   remote       (ดีฟอลต์) AI4Thai ก่อน ถ้าไม่ได้ผล (ไม่มี key / ล่ม / timeout) ใช้ local แทน
+#   local_first  local ก่อน ถ้าความมั่นใจต่ำกว่า OCR_LOCAL_CONFIRM_CONF ค่อยถาม AI4Thai ยืนยัน
+#   local        local อย่างเดียว (offline)
+#   remote_only  AI4Thai อย่างเดียว (พฤติกรรมเดิม)
+# ก่อนเรียก AI4Thai ทุกครั้งขอสิทธิ์จาก utils/ocr_quota (token bucket + โควตารายวัน) ตาม priority ของงาน
+# ไม่ได้สิทธิ์ = ถือว่า AI4Thai ใช้ไม่ได้รอบนั้น (โหมด remote จะไปใช้ local แทน)
+import asyncio
+import os
+import re
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+import cv2
+import numpy as np
+
+from .ai4thai_ocr_LP_api import get_ocr_client
+from ..utils.thai_provinces import match_thai_province, ai4thai_label
+from ..utils.ocr_quota import get_ocr_quota, PRIORITY_HIGH
+
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE_MODE = os.getenv("OCR_ENGINE_MODE", "remote").lower()
+OCR_LOCAL_CONFIRM_CONF = float(os.getenv("OCR_LOCAL_CONFIRM_CONF", "80"))
+OCR_LOCAL_MODEL_DIR = os.getenv("OCR_LOCAL_MODEL_DIR", "")   # ที่เก็บโมเดลของ easyocr (ไม่ตั้ง = ~/.EasyOCR)
+
+# เลขทะเบียนไทย: [เลขนำ 0-1 หลัก][พยัญชนะ 1-2 ตัว][เลข 1-4 หลัก] เช่น 1กข 2345, กข 123
+_PLATE_RE = re.compile(r"^(\d?)([ก-ฮ]{1,2})(\d{1,4})$")
+
+
+def has_plate(ocr: Optional[Dict[str, Any]]) -> bool:
+    return bool(ocr) and bool((ocr.get("lp_number") or "").strip()) and ocr.get("is_missing_plate") != "yes"
+
+
+def ocr_conf(ocr: Optional[Dict[str, Any]]) -> float:
+    try:
+        return float((ocr or {}).get("conf") or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class OCREngine(ABC):
+    """interface: recognize(jpeg) → dict แบบ AI4Thai หรือ None ถ้าอ่านไม่ได้/ใช้งานไม่ได้"""
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def recognize(self, image_bytes: bytes, location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """อ่านป้ายจาก JPEG คืน dict แบบ AI4Thai + "ocr_engine" หรือ None"""
+
+
+class AI4ThaiEngine(OCREngine):
+    name = "ai4thai"
+
+    def available(self) -> bool:
+        client = get_ocr_client()
+        return bool(client.api_key and client.url)
+
+    async def recognize(self, image_bytes: bytes, location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ocr = await get_ocr_client().recognize_bytes(image_bytes, location_id)
+        return {**ocr, "ocr_engine": self.name} if ocr else None
+
+
+class LocalThaiEngine(OCREngine):
+    """
+    OCR บน CPU ด้วย easyocr (ภาษาไทย + อังกฤษ) ไม่ต้องต่อเน็ต
+    แยกบรรทัดเลขทะเบียน (ตาม _PLATE_RE) กับบรรทัดจังหวัด (เทียบกับรายชื่อจังหวัด)
+    ไม่ได้ติดตั้ง easyocr = ใช้งานไม่ได้ (available() เป็น False)
+    """
+    name = "local"
+
+    def __init__(self):
+        self._reader = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _get_reader(self):
+        if self._reader is not None or self._failed:
+            return self._reader
+        with self._lock:
+            if self._reader is None and not self._failed:
+                try:
+                    import easyocr
+                    kwargs = {"gpu": False, "verbose": False}
+                    if OCR_LOCAL_MODEL_DIR:
+                        kwargs["model_storage_directory"] = OCR_LOCAL_MODEL_DIR
+                    self._reader = easyocr.Reader(["th", "en"], **kwargs)
+                    print("✅ Local Thai OCR ready (easyocr, CPU)")
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"⚠️ local OCR unavailable: {e}")
+        return self._reader
+
+    def available(self) -> bool:
+        return self._get_reader() is not None
+
+    def _read(self, image_bytes: bytes) -> Optional[Dict[str, Any]]:
+        reader = self._get_reader()
+        if reader is None:
+            return None
+        img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        with self._lock:   # Reader ไม่ thread-safe
+            lines = reader.readtext(img, detail=1, paragraph=False)
+        return parse_plate_lines([(box, text, float(conf)) for box, text, conf in lines])
+
+    async def recognize(self, image_bytes: bytes, location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        ocr = await asyncio.get_running_loop().run_in_executor(None, self._read, image_bytes)
+        return {**ocr, "ocr_engine": self.name} if ocr else None
+
+
+def parse_plate_lines(lines: List) -> Optional[Dict[str, Any]]:
+    """[(box, text, conf 0-1)] จาก OCR ทั่วไป → dict แบบ AI4Thai (เรียงบรรทัดจากบนลงล่าง)"""
+    if not lines:
+        return None
+    lines = sorted(lines, key=lambda l: min(p[1] for p in l[0]))
+    plate, plate_conf, province = None, 0.0, None
+    for _, text, conf in lines:
+        compact = "".join(text.split())
+        if plate is None and _PLATE_RE.match(compact):
+            plate, plate_conf = compact, conf
+            continue
+        if province is None:
+            province = match_thai_province(compact)
+    if plate is None:
+        return {"lp_number": "", "is_missing_plate": "yes", "conf": 0.0, "country": "th"}
+    result = {
+        "lp_number": plate,
+        "conf": round(plate_conf * 100.0, 2),
+        "is_missing_plate": "no",
+        "country": "th",
+    }
+    if province:
+        result["province"] = ai4thai_label(*province)
+    return result
+
+
+class OCRChain:
+    """เลือกลำดับ engine ตาม mode; นับว่าแต่ละ engine ถูกเรียก/ได้ผลกี่ครั้ง"""
+
+    def __init__(self, mode: str = OCR_ENGINE_MODE, remote: Optional[OCREngine] = None,
+                 local: Optional[OCREngine] = None, confirm_conf: float = OCR_LOCAL_CONFIRM_CONF):
+        self.mode = mode
+        self.remote = remote or AI4ThaiEngine()
+        self.local = local or LocalThaiEngine()
+        self.confirm_conf = confirm_conf
+        self.counts: Dict[str, int] = {}
+
+    def _count(self, key: str) -> None:
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    async def _try(self, engine: OCREngine, image_bytes: bytes, location_id: Optional[str],
+                   priority: str) -> Optional[Dict[str, Any]]:
+        # available() ของ local อาจโหลดโมเดลครั้งแรก (ช้า) → ทำนอก event loop
+        if not await asyncio.get_running_loop().run_in_executor(None, engine.available):
+            return None
+        if engine is self.remote and not await get_ocr_quota().acquire(location_id, priority):
+            self._count(f"{engine.name}_throttled")
+            return None
+        self._count(f"{engine.name}_calls")
+        try:
+            ocr = await engine.recognize(image_bytes, location_id)
+        except Exception as e:
+            logger.warning(f"⚠️ OCR engine {engine.name} failed: {e}")
+            ocr = None
+        if has_plate(ocr):
+            self._count(f"{engine.name}_reads")
+        return ocr
+
+    async def recognize(self, image_bytes: bytes, location_id: Optional[str] = None,
+                        priority: str = PRIORITY_HIGH) -> Optional[Dict[str, Any]]:
+        """priority: PRIORITY_HIGH / PRIORITY_LOW (งานรองถูกตัดจาก AI4Thai ก่อนเมื่อใกล้โควตา)"""
+        if self.mode == "remote_only":
+            return await self._try(self.remote, image_bytes, location_id, priority)
+        if self.mode == "local":
+            return await self._try(self.local, image_bytes, location_id, priority)
+
+        if self.mode == "local_first":
+            first = await self._try(self.local, image_bytes, location_id, priority)
+            if has_plate(first) and ocr_conf(first) >= self.confirm_conf:
+                return first
+            # local ไม่มั่นใจ → ถาม AI4Thai; AI4Thai ไม่ได้ผลก็ใช้ของ local ที่มี
+            confirm = await self._try(self.remote, image_bytes, location_id, priority)
+            if has_plate(confirm):
+                self._count("confirmed_by_remote")
+                return confirm
+            return first or confirm
+
+        # remote (ดีฟอลต์): local เป็นแค่ทางสำรองตอน AI4Thai ใช้ไม่ได้ (ไม่มี key / ล่ม / timeout)
+        # AI4Thai ตอบปกติแต่ไม่เจอป้าย → เชื่อผลนั้น ไม่เสีย CPU อ่านซ้ำ
+        first = await self._try(self.remote, image_bytes, location_id, priority)
+        if first is not None:
+            return first
+        fallback = await self._try(self.local, image_bytes, location_id, priority)
+        if fallback is not None:
+            self._count("local_fallbacks")
+        return fallback
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.counts}
+
+
+_chain: Optional[OCRChain] = None
+_chain_lock = threading.Lock()
+
+
+def get_ocr_chain() -> OCRChain:
+    global _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = OCRChain()
+        return _chain
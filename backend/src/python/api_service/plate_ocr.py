@@ -0,0 +1,169 @@
+# api_service/plate_ocr.py - OCR ป้ายทะเบียนจากเฟรม: หา/ตัดป้ายในเครื่องก่อน แล้วส่งเฉพาะ crop เข้า OCR (ocr_engines)
+# - กล้องสดส่งกล่องรถ (car_box) ของ track มาด้วย → OCR เฉพาะป้ายที่อยู่ในกล่องนั้น 1 ป้าย (ไม่อ่านป้ายของคันอื่นในคิว)
+#   ไม่เจอป้ายในกล่อง → ส่งเฉพาะส่วนของรถคันนั้นแทนทั้งเฟรม
+# - ไม่มี car_box (/detect) + เจอหลายป้าย → OCR ทุกป้ายพร้อมกัน คืนป้ายที่มั่นใจสุดเป็นผลหลัก + รายการทั้งหมดใน "plates"
+# - ไม่มีโมเดลป้าย / ไม่เจอป้าย / OCR crop ไม่ได้ผล → ส่งทั้งเฟรม (หรือส่วนของรถ) เหมือนเดิม
+# - ผล OCR ของ crop ถูก cache ตาม (location, dHash ของ crop); ไม่ cache ทั้งเฟรม เพราะ hash ของทั้งเฟรมขึ้นกับฉากหลัง
+#   มากกว่าตัวป้าย รถคนละคันในมุมเดียวกันอาจได้ hash ใกล้กัน
+# - recognize_track_plates: รถจากกล้องสดมีหลายเฟรม → OCR เฟรมดีสุดก่อน ถ้าไม่มั่นใจ (conf < OCR_REQUERY_CONF)
+#   หรือไม่พบในทะเบียน ค่อย OCR เฟรมถัดไปแล้วโหวตรวมทีละตัวอักษร (เสีย OCR เพิ่มเฉพาะคันที่กำกวม)
+#   ทุกเฟรมอ่านแค่ป้ายในกล่องรถของ track นั้น 1 ป้าย (OCR 1 ครั้งต่อเฟรม, โหวตไม่ปนป้ายของคันอื่น)
+# - priority ส่งต่อถึง ocr_engines/ocr_quota: OCR ซ้ำจากเฟรมสำรองเป็นงานรองเสมอ (ใกล้โควตาก็ข้ามไป)
+import asyncio
+import os
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+from ..utils.plate_localizer import get_plate_localizer, PlateCrop
+from ..utils.ocr_cache import get_ocr_cache
+from ..utils.plate_vote import vote_plates
+from ..utils.ocr_quota import PRIORITY_HIGH, PRIORITY_LOW
+from .ocr_engines import get_ocr_chain, has_plate, ocr_conf
+from .plate_registry import get_plate_registry
+
+logger = logging.getLogger(__name__)
+
+FULL_FRAME_JPEG_QUALITY = 85
+CAR_BOX_PAD = 0.05   # ขยายกล่องรถตอนตัดส่งทั้งคัน (กันป้ายที่ชิดขอบกล่องโดนตัด)
+
+Box = Tuple[float, float, float, float]
+OCR_REQUERY_CONF = float(os.getenv("OCR_REQUERY_CONF", "85"))   # conf (0-100) ต่ำกว่านี้ → OCR เฟรมสำรองเพิ่ม
+
+
+async def _ocr_crop(crop: PlateCrop, location_id: Optional[str], priority: str) -> Optional[Dict[str, Any]]:
+    cache = get_ocr_cache() if crop.thumb is not None else None
+    ocr = None
+    if cache is not None:
+        # get() เทียบภาพ + อาจอ่าน SQLite → ไม่ทำบน event loop; put() แค่ memory + เข้าคิวเขียน เรียกตรงได้
+        ocr = await asyncio.get_running_loop().run_in_executor(
+            None, cache.get, location_id, crop.phash, crop.thumb)
+    cached = ocr is not None
+    if not cached:
+        ocr = await get_ocr_chain().recognize(crop.jpeg, location_id, priority)
+        if not has_plate(ocr):
+            return None
+        if cache is not None:
+            cache.put(location_id, crop.phash, crop.thumb, ocr)
+    read = {**ocr, "plate_box": list(crop.box), "plate_conf": round(crop.conf, 4)}
+    if cached:
+        read["ocr_cached"] = True
+    return read
+
+
+def _car_region(img: np.ndarray, box: Box) -> np.ndarray:
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = box
+    px, py = (x2 - x1) * CAR_BOX_PAD, (y2 - y1) * CAR_BOX_PAD
+    x1, y1 = max(0, int(x1 - px)), max(0, int(y1 - py))
+    x2, y2 = min(w, int(x2 + px)), min(h, int(y2 + py))
+    return img[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else img
+
+
+async def _ocr_full(img: Optional[np.ndarray], jpeg: Optional[bytes],
+                   location_id: Optional[str], priority: str,
+                   car_box: Optional[Box] = None) -> Optional[Dict[str, Any]]:
+    if car_box is not None and img is not None:
+        img, jpeg = _car_region(img, car_box), None   # ส่งเฉพาะรถคันนี้ ไม่ใช่ทั้งฉาก
+    if jpeg is None:
+        if img is None:
+            return None
+        loop = asyncio.get_running_loop()
+        ok, buf = await loop.run_in_executor(
+            None, cv2.imencode, ".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), FULL_FRAME_JPEG_QUALITY])
+        if not ok:
+            return None
+        jpeg = buf.tobytes()
+    return await get_ocr_chain().recognize(jpeg, location_id, priority)
+
+
+def _localize(img: Optional[np.ndarray], jpeg: Optional[bytes], car_box: Optional[Box] = None):
+    localizer = get_plate_localizer()
+    if not localizer.available():
+        return img, []
+    if img is None and jpeg is not None:
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return img, []
+    if car_box is not None:
+        return img, localizer.crops(img, max_plates=1, within=car_box)
+    return img, localizer.crops(img)
+
+
+async def recognize_plates(img: Optional[np.ndarray] = None,
+                           jpeg: Optional[bytes] = None,
+                           location_id: Optional[str] = None,
+                           priority: str = PRIORITY_HIGH,
+                           car_box: Optional[Box] = None) -> Optional[Dict[str, Any]]:
+    """
+    img: เฟรม BGR (ถ้ามี) ใช้หาป้าย; jpeg: เฟรมเดียวกันที่ encode แล้ว (ใช้ตอนต้อง fallback ส่งทั้งเฟรม)
+    location_id: ส่วนหนึ่งของ key ของ OCR cache (ป้ายเดียวกันคนละสถานที่ไม่ใช้ผลร่วมกัน) + ใช้นับโควตาต่อสถานที่
+    car_box: กล่องรถ xyxy ในพิกัดของ img → OCR แค่ป้ายของรถคันนี้ 1 ป้าย (None = ทุกป้ายในเฟรม)
+    ต้องมีอย่างน้อยหนึ่งอย่าง คืนผล OCR รูปแบบเดียวกับ recognize_license_plate_from_bytes
+    """
+    # โหลดโมเดล / decode / YOLO ล้วนบล็อก → ทำใน threadpool ทีเดียว
+    try:
+        img, crops = await asyncio.get_running_loop().run_in_executor(None, _localize, img, jpeg, car_box)
+    except Exception as e:
+        logger.warning(f"⚠️ plate localization failed: {e}")
+        crops = []
+
+    if crops:
+        reads = [r for r in await asyncio.gather(*[_ocr_crop(c, location_id, priority) for c in crops]) if r]
+        if reads:
+            reads.sort(key=ocr_conf, reverse=True)
+            best = dict(reads[0])
+            if len(reads) > 1:
+                best["plates"] = reads
+            return best
+
+    return await _ocr_full(img, jpeg, location_id, priority, car_box)
+
+
+def _is_registered(location_id: Optional[str], ocr: Dict[str, Any]) -> bool:
+    if not location_id:
+        return True   # ไม่มีสถานที่ให้เทียบ ใช้แค่ conf ตัดสิน
+    try:
+        reg = get_plate_registry().lookup(location_id, ocr.get("lp_number"), ocr.get("province"))
+    except Exception as e:
+        logger.warning(f"⚠️ registry check before re-query failed: {e}")
+        return True   # เช็กไม่ได้ → ไม่เสีย OCR เพิ่ม
+    return bool(reg.get("is_registered"))
+
+
+async def recognize_track_plates(frames: List[np.ndarray],
+                                 jpeg: Optional[bytes] = None,
+                                 location_id: Optional[str] = None,
+                                 requery_conf: float = OCR_REQUERY_CONF,
+                                 priority: str = PRIORITY_HIGH,
+                                 boxes: Optional[List[Optional[Box]]] = None) -> Optional[Dict[str, Any]]:
+    """
+    frames: เฟรมของรถคันเดียวกัน เรียงดีสุดก่อน (frames[0] คือเฟรมหลักฐาน, jpeg คือ frames[0] ที่ encode แล้ว)
+    boxes: กล่องรถของคันนี้ในแต่ละเฟรม (จาก tracker, ลำดับเดียวกับ frames) → ทุกเฟรมอ่านแค่ป้ายของคันนี้ 1 ป้าย
+           ผลที่เอาไปโหวตจึงมาจากรถคันเดียวกันเสมอ ไม่ปนตัวอักษรของคันอื่นในเฟรม
+    OCR frames[0]; ถ้ายังกำกวมค่อยอ่านเฟรมถัดไปทีละเฟรมจนกว่าผลรวมจะมั่นใจและพบในทะเบียน หรือเฟรมหมด
+    """
+    boxes = list(boxes or [])
+    boxes += [None] * (len(frames) - len(boxes))
+    first = await recognize_plates(frames[0] if frames else None, jpeg, location_id, priority,
+                                   boxes[0] if boxes else None)
+    reads = [first] if has_plate(first) else []
+    fused = vote_plates(reads)
+    requeried = 0
+    loop = asyncio.get_running_loop()
+    for frame, box in zip(frames[1:], boxes[1:]):
+        # พอแล้วเมื่อมั่นใจ และ (พบในทะเบียน หรือ มีเฟรมที่สองอ่านตรงกัน = ยืนยันว่าไม่ได้ลงทะเบียนจริง)
+        if fused is not None and ocr_conf(fused) >= requery_conf and (
+                len(reads) > 1 or await loop.run_in_executor(None, _is_registered, location_id, fused)):
+            break
+        requeried += 1
+        ocr = await recognize_plates(frame, None, location_id, PRIORITY_LOW, box)
+        if has_plate(ocr):
+            reads.append(ocr)
+            fused = vote_plates(reads)
+    if fused is None:
+        return first
+    if requeried:
+        fused["ocr_requeried"] = requeried
+    return fused
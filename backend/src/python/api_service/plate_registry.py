@@ -0,0 +1,275 @@
+# api_service/plate_registry.py - ดัชนีป้ายทะเบียนที่ลงทะเบียนไว้ต่อสถานที่ (in-memory) สำหรับตรวจสิทธิ์ตอนมี detection
+# เดิมทุก detection ยิง Supabase 3 ครั้งติดกัน (locations → strict → plate อย่างเดียว) ตอนนี้เหลือ dict lookup
+# - โหลดแบบ lazy ครั้งแรกที่สถานที่นั้นมี detection แล้ว reload ทั้งชุดทุก REGISTRY_TTL วินาที (จับแถวที่ถูกลบได้)
+# - ระหว่างนั้นถ้าหาไม่เจอ และดัชนีเก่ากว่า REGISTRY_MISS_RECHECK วินาที → ดึงเฉพาะแถวที่เปลี่ยน (updated_at)
+#   ก่อนตอบว่าไม่ได้ลงทะเบียน (รถที่เพิ่งเพิ่มในแอปไม่ถูกแจ้งเตือนผิดนาน); ตารางไม่มี updated_at → reload ทั้งชุดแทน
+# - ไม่ตรงเป๊ะ → ลองจับคู่แบบ fuzzy (utils/plate_fuzzy) ทนตัวอักษรที่ OCR อ่านเพี้ยน ได้ match_policy='fuzzy'
+#   ยอมรับเฉพาะผู้สมัครที่ดีที่สุดเพียงตัวเดียวที่ราคาไม่เกิน REGISTRY_FUZZY_MAX_COST (ถ้าเสมอกันหลายป้าย = ไม่ตัดสิน)
+# - แอปเขียนตาราง license_plate ตรงผ่าน Supabase; โค้ดฝั่ง backend ที่แก้ทะเบียนเองเรียก invalidate() ได้
+import os
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from ..db.supabase_client import get_supabase_client
+from ..utils.plate_fuzzy import FuzzyPlateIndex
+from ..utils.thai_provinces import province_code
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_TTL = float(os.getenv("REGISTRY_TTL", "60"))
+REGISTRY_MISS_RECHECK = float(os.getenv("REGISTRY_MISS_RECHECK", "10"))
+REGISTRY_FUZZY = os.getenv("REGISTRY_FUZZY", "1") == "1"
+REGISTRY_FUZZY_MAX_COST = float(os.getenv("REGISTRY_FUZZY_MAX_COST", "0.8"))  # 0.8 ≈ สับสน 1-2 ตัว; แทนตัวอื่นใดๆ ราคา 1
+_PAGE = 1000   # จำนวนแถวสูงสุดต่อ request ของ PostgREST
+_UNDEFINED_COLUMN = "42703"   # SQLSTATE ที่ PostgREST ส่งกลับเมื่อ select/filter คอลัมน์ที่ไม่มีอยู่
+
+TH_NUM_MAP = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+
+
+def normalize_lp(s: Optional[str]) -> Optional[str]:
+    if not s:
+        return None
+    x = s.strip().replace(" ", "")
+    x = x.translate(TH_NUM_MAP)
+    return x.upper()
+
+
+def _missing_updated_at(e: Exception) -> bool:
+    """error จาก PostgREST บอกว่าไม่มีคอลัมน์ updated_at หรือไม่ (error อื่น เช่น timeout/สิทธิ์ ต้องไม่ปิดโหมด incremental)"""
+    code = getattr(e, "code", None)
+    msg = str(getattr(e, "message", None) or e)
+    if "updated_at" not in msg:
+        return False
+    return code == _UNDEFINED_COLUMN or (code is None and "does not exist" in msg)
+
+
+def norm_province(s: Optional[str]) -> Optional[str]: # Norm ชื่อจังหวัด → รหัส ISO (TH-10) ถ้ารู้จัก
+    if not s:
+        return None
+    return province_code(s) or s.strip()
+
+
+@dataclass
+class _LocationIndex:
+    location_license: Optional[str] = None
+    location_name: Optional[str] = None
+    by_plate: Dict[str, List[Tuple[str, Any]]] = field(default_factory=dict)   # plate → [(province, license_id)]
+    rows: Dict[Any, Tuple[str, str]] = field(default_factory=dict)              # license_id → (plate, province)
+    fuzzy: FuzzyPlateIndex = field(default_factory=FuzzyPlateIndex)
+    loaded_at: float = 0.0
+    checked_at: float = 0.0
+    max_updated_at: Optional[str] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        lid = row.get("license_id")
+        self._remove(lid)
+        plate = normalize_lp(row.get("license_text"))
+        if not plate:
+            return
+        prov = norm_province(row.get("license_local")) or ""
+        self.rows[lid] = (plate, prov)
+        self.by_plate.setdefault(plate, []).append((prov, lid))
+        self.fuzzy.add(plate)
+        ts = row.get("updated_at")
+        if ts and (self.max_updated_at is None or str(ts) > self.max_updated_at):
+            self.max_updated_at = str(ts)
+
+    def _remove(self, lid: Any) -> None:
+        old = self.rows.pop(lid, None)
+        if old is None:
+            return
+        entries = [e for e in self.by_plate.get(old[0], []) if e[1] != lid]
+        if entries:
+            self.by_plate[old[0]] = entries
+        else:
+            self.by_plate.pop(old[0], None)
+            self.fuzzy.discard(old[0])
+
+
+class PlateRegistry:
+    def __init__(self, ttl: float = REGISTRY_TTL, miss_recheck: float = REGISTRY_MISS_RECHECK,
+                 fuzzy: bool = REGISTRY_FUZZY, fuzzy_max_cost: float = REGISTRY_FUZZY_MAX_COST):
+        self.ttl = ttl
+        self.miss_recheck = miss_recheck
+        self.fuzzy = fuzzy
+        self.fuzzy_max_cost = fuzzy_max_cost
+        self._lock = threading.Lock()
+        self._locations: Dict[str, _LocationIndex] = {}
+        self._incremental = True     # False เมื่อรู้ว่าตารางไม่มีคอลัมน์ updated_at
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self.lookups = 0
+        self.fuzzy_matches = 0
+        self.fuzzy_ambiguous = 0
+
+    def _index(self, location_id: str) -> _LocationIndex:
+        with self._lock:
+            idx = self._locations.get(location_id)
+            if idx is None:
+                idx = self._locations[location_id] = _LocationIndex()
+            return idx
+
+    # ---------- load ----------
+    def _fetch_plates(self, location_license: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        sb = get_supabase_client()
+        cols = "license_id, license_text, license_local" + (", updated_at" if self._incremental else "")
+        out: List[Dict[str, Any]] = []
+        start = 0
+        while True:
+            q = sb.table("license_plate").select(cols).eq("location_license", location_license)
+            if since is not None:
+                # gte ไม่ใช่ gt: แถวที่แก้ใน timestamp เดียวกับ max_updated_at จะไม่หลุด (แถวซ้ำ _add แทนที่ของเดิม)
+                q = q.gte("updated_at", since)
+            rows = q.range(start, start + _PAGE - 1).execute().data or []
+            out.extend(rows)
+            if len(rows) < _PAGE:
+                return out
+            start += _PAGE
+
+    def _full_load(self, location_id: str, idx: _LocationIndex) -> None:
+        sb = get_supabase_client()
+        loc = (sb.table("locations").select("location_license, location_name")
+               .eq("location_id", location_id).single().execute())
+        fresh = _LocationIndex(location_license=(loc.data or {}).get("location_license"),
+                               location_name=(loc.data or {}).get("location_name"))
+        if fresh.location_license:
+            try:
+                rows = self._fetch_plates(fresh.location_license)
+            except Exception as e:
+                if not self._incremental or not _missing_updated_at(e):
+                    raise
+                # ตารางไม่มี updated_at → เลิกใช้โหมด incremental แล้วโหลดใหม่
+                logger.info(f"license_plate has no updated_at, using full reloads only ({e})")
+                self._incremental = False
+                rows = self._fetch_plates(fresh.location_license)
+            for r in rows:
+                fresh._add(r)
+        now = time.time()
+        idx.location_license, idx.location_name = fresh.location_license, fresh.location_name
+        idx.by_plate, idx.rows, idx.fuzzy = fresh.by_plate, fresh.rows, fresh.fuzzy
+        idx.max_updated_at = fresh.max_updated_at
+        idx.loaded_at = idx.checked_at = now
+        self.full_loads += 1
+
+    def _refresh_changes(self, idx: _LocationIndex) -> None:
+        rows = self._fetch_plates(idx.location_license, since=idx.max_updated_at)
+        for r in rows:
+            idx._add(r)
+        idx.checked_at = time.time()
+        self.incremental_loads += 1
+
+    def _ensure(self, location_id: str) -> _LocationIndex:
+        idx = self._index(location_id)
+        with idx.lock:
+            if time.time() - idx.loaded_at > self.ttl:
+                try:
+                    self._full_load(location_id, idx)
+                except Exception as e:
+                    if not idx.loaded_at:
+                        raise
+                    # DB ล่มชั่วคราว: ใช้ดัชนีเดิมต่อ แล้วลองใหม่หลัง miss_recheck วินาที
+                    logger.warning(f"⚠️ plate registry reload failed ({location_id}): {e}")
+                    idx.loaded_at = time.time() - self.ttl + self.miss_recheck
+        return idx
+
+    def invalidate(self, location_id: Optional[str] = None) -> None:
+        """บังคับให้โหลดใหม่ตอนใช้ครั้งถัดไป (None = ทุกสถานที่)"""
+        with self._lock:
+            targets = list(self._locations.values()) if location_id is None else \
+                [self._locations[location_id]] if location_id in self._locations else []
+        for idx in targets:
+            idx.loaded_at = 0.0
+
+    # ---------- lookup ----------
+    def _match(self, idx: _LocationIndex, plate: str, province: Optional[str]) -> Tuple[Optional[Any], str]:
+        entries = idx.by_plate.get(plate) or []
+        for prov, lid in entries:
+            if prov == (province or ""):
+                return lid, "strict"
+        if entries:
+            return entries[0][1], "plate_only"
+        return None, "none"
+
+    def _match_fuzzy(self, idx: _LocationIndex, plate: str,
+                     province: Optional[str]) -> Optional[Tuple[Any, str, float]]:
+        """(license_id, ป้ายที่ลงทะเบียน, ราคา) ของผู้สมัครที่ดีที่สุด; None ถ้าไม่มีหรือกำกวม"""
+        scored = []
+        for cand, cost in idx.fuzzy.candidates(plate, self.fuzzy_max_cost):
+            for prov, lid in idx.by_plate.get(cand) or []:
+                # จังหวัดตรงกันใช้ตัดสินตอนราคาเท่ากัน
+                scored.append((cost, prov != (province or ""), cand, lid))
+        if not scored:
+            return None
+        scored.sort(key=lambda x: x[:2])
+        best = scored[0]
+        if len(scored) > 1 and scored[1][:2] == best[:2] and scored[1][2] != best[2]:
+            self.fuzzy_ambiguous += 1
+            return None
+        return best[3], best[2], best[0]
+
+    def lookup(self, location_id: str, lp_number: Optional[str],
+               province: Optional[str]) -> Dict[str, Any]:
+        """ผลแบบเดียวกับ resolve_registration_for_detection (ไม่รวม is_registered ของป้ายที่อ่านไม่ได้)"""
+        self.lookups += 1
+        idx = self._ensure(location_id)
+        plate, prov = normalize_lp(lp_number), norm_province(province)
+        lid, policy = self._match(idx, plate, prov) if plate else (None, "none")
+
+        if lid is None and plate and idx.location_license and time.time() - idx.checked_at > self.miss_recheck:
+            # ไม่เจอ: เช็กแถวที่เพิ่งเพิ่ม/แก้ ก่อนตัดสิน (อย่างมาก 1 ครั้งต่อ miss_recheck วินาทีต่อสถานที่)
+            with idx.lock:
+                if time.time() - idx.checked_at > self.miss_recheck:
+                    if self._incremental and idx.max_updated_at:
+                        self._refresh_changes(idx)
+                    else:
+                        self._full_load(location_id, idx)
+            lid, policy = self._match(idx, plate, prov)
+
+        result = {
+            "is_registered": lid is not None,
+            "location_license": idx.location_license,
+            "location_name": idx.location_name,
+            "matched_license_id": lid,
+            "match_policy": policy,
+        }
+        if lid is None and plate and self.fuzzy:
+            with idx.lock:   # กันดัชนีถูกแก้ระหว่างค้น (incremental refresh)
+                found = self._match_fuzzy(idx, plate, prov)
+            if found is not None:
+                self.fuzzy_matches += 1
+                result.update(is_registered=True, matched_license_id=found[0], match_policy="fuzzy",
+                              matched_plate=found[1], match_cost=round(found[2], 2))
+        return result
+
+    def location_info(self, location_id: str) -> Tuple[Optional[str], Optional[str]]:
+        idx = self._ensure(location_id)
+        return idx.location_license, idx.location_name
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = {k: len(v.rows) for k, v in self._locations.items()}
+        return {
+            "locations": len(sizes),
+            "plates": sum(sizes.values()),
+            "lookups": self.lookups,
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+            "incremental": self._incremental,
+            "fuzzy_matches": self.fuzzy_matches,
+            "fuzzy_ambiguous": self.fuzzy_ambiguous,
+        }
+
+
+_registry: Optional[PlateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_plate_registry() -> PlateRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PlateRegistry()
+        return _registry
@@ -0,0 +1,163 @@
+# api_service/roboflow_client.py - client สำหรับ inference ผ่าน Roboflow hosted API
+# - ใช้ requests.Session เดียว (keep-alive + connection pool) แทนการเปิด connection ใหม่ทุกเฟรม
+# - ย่อภาพให้เท่าขนาด input ของโมเดลก่อน encode แล้วส่ง JPEG ดิบแบบ multipart (ไม่ base64 ใน JSON ที่ใหญ่ขึ้น ~33%)
+# - circuit breaker: remote ช้า/พังติดกันหลายครั้ง → หยุดเรียกชั่วคราว ให้ฝั่งผู้เรียกใช้โมเดล local แทน
+import os
+import threading
+import time
+import logging
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+ROBOFLOW_API_KEY = os.getenv("ROBOFLOW_API_KEY") or ""
+RF_INPUT_SIZE = int(os.getenv("RF_INPUT_SIZE", "640"))            # ด้านยาวของภาพที่ส่งไป (ขนาด input ของโมเดล)
+RF_CONNECT_TIMEOUT = float(os.getenv("RF_CONNECT_TIMEOUT", "2.0"))
+RF_READ_TIMEOUT = float(os.getenv("RF_READ_TIMEOUT", "3.0"))
+RF_SLOW_SECONDS = float(os.getenv("RF_SLOW_SECONDS", "1.5"))       # ตอบช้ากว่านี้นับเป็นความล้มเหลวของ breaker
+
+Box = Tuple[List[float], float]   # ([x1, y1, x2, y2], conf)
+
+
+class RemoteInferenceError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed    → เรียกได้ปกติ; ล้มเหลวติดกัน failure_threshold ครั้ง → open
+    open      → ไม่เรียกเลยจนครบ cooldown วินาที
+    half-open → ปล่อยให้ลอง 1 ครั้ง สำเร็จ = closed, ล้มเหลว = open ใหม่ (cooldown เพิ่มเป็น 2 เท่า สูงสุด max_cooldown)
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 15.0, max_cooldown: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            st = self._state()
+            if st == "closed":
+                return True
+            if st == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            self._cooldown = self.base_cooldown
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._probing:
+                # ลองแล้วยังพัง เปิดวงจรต่อนานขึ้น
+                self._probing = False
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                return
+            self._failures += 1
+            if self._opened_at is None and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+
+class RoboflowClient:
+    def __init__(self, model_url: str, confidence: float = 0.25, overlap: int = 20,
+                 input_size: int = RF_INPUT_SIZE, jpeg_quality: int = 85,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model_url = model_url
+        self.confidence = confidence
+        self.overlap = overlap
+        self.input_size = input_size
+        self.jpeg_quality = jpeg_quality
+        self.breaker = breaker or CircuitBreaker()
+        self.last_latency = 0.0
+        self.bytes_sent = 0
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def available(self) -> bool:
+        return self.breaker.allow()
+
+    def _prepare(self, img: np.ndarray) -> Tuple[bytes, float]:
+        """ย่อด้านยาวให้ไม่เกิน input_size แล้ว encode คืน (jpeg, scale ที่ใช้ย่อ)"""
+        h, w = img.shape[:2]
+        scale = 1.0
+        if self.input_size > 0 and max(h, w) > self.input_size:
+            scale = self.input_size / float(max(h, w))
+            img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            raise RemoteInferenceError("JPEG encode failed")
+        return buf.tobytes(), scale
+
+    def infer(self, img: np.ndarray) -> List[Box]:
+        """ส่งภาพไป Roboflow คืน [(xyxy, conf)] ในพิกัดของภาพต้นฉบับ (ล้มเหลว → RemoteInferenceError)"""
+        jpeg, scale = self._prepare(img)
+        params = {"confidence": self.confidence, "overlap": self.overlap}
+        if ROBOFLOW_API_KEY and "api_key=" not in self.model_url:
+            params["api_key"] = ROBOFLOW_API_KEY
+
+        started = time.monotonic()
+        try:
+            r = self._session.post(
+                self.model_url, params=params,
+                files={"file": ("frame.jpg", jpeg, "image/jpeg")},
+                timeout=(RF_CONNECT_TIMEOUT, RF_READ_TIMEOUT))
+            r.raise_for_status()
+            preds = r.json().get("predictions", [])
+        except (requests.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            raise RemoteInferenceError(f"roboflow request failed: {e}") from e
+        finally:
+            self.last_latency = time.monotonic() - started
+            self.bytes_sent += len(jpeg)
+
+        # ได้ผลแต่ช้าเกิน: ใช้ผลนี้ได้ แต่นับเป็นความล้มเหลวให้ breaker
+        if self.last_latency > RF_SLOW_SECONDS:
+            logger.warning(f"⚠️ roboflow slow: {self.last_latency:.2f}s")
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        inv = 1.0 / scale
+        boxes: List[Box] = []
+        for p in preds:
+            x, y, w, h = p["x"], p["y"], p["width"], p["height"]
+            boxes.append(([(x - w / 2) * inv, (y - h / 2) * inv, (x + w / 2) * inv, (y + h / 2) * inv],
+                          float(p.get("confidence", 0.0))))
+        return boxes
+
+    def close(self) -> None:
+        self._session.close()
@@ -0,0 +1,160 @@
+# utils/adaptive_quality.py - ปรับ fps / ความกว้างภาพ / JPEG quality / ความถี่ inference ต่อกล้องอัตโนมัติตามภาระเครื่อง
+# - display_worker รายงาน lag (อายุเฟรมตอนเริ่มประมวลผล) และ busy (เวลาที่ใช้ / ช่วงเวลาต่อเฟรม) ทุกเฟรม
+# - tick() ทุก interval วินาที: CPU สูงหรือกล้องตามไม่ทัน → ลดลง 1 ขั้น, ว่างติดกันหลายรอบ → เพิ่มขึ้น 1 ขั้น
+# - pin() ล็อกระดับของกล้องเองได้ (ไม่ให้ปรับอัตโนมัติ)
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import psutil  # มากับ ultralytics อยู่แล้ว แต่ไม่บังคับ
+except ImportError:  # pragma: no cover
+    psutil = None
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    display_fps: float
+    display_width: int      # 0 = ไม่ย่อ
+    jpeg_quality: int       # tier "display"
+    infer_hz: float         # รอบ detection ต่อวินาที (กล้องหลัก)
+
+
+# ขั้นที่ 0 = คุณภาพสูงสุด (ค่าเดิมก่อนมี controller)
+DEFAULT_LADDER: Tuple[QualityLevel, ...] = (
+    QualityLevel(60, 640, 60, 5.0),
+    QualityLevel(30, 640, 60, 5.0),
+    QualityLevel(20, 640, 50, 3.0),
+    QualityLevel(15, 480, 45, 2.0),
+    QualityLevel(10, 320, 40, 1.0),
+)
+
+
+def cpu_percent() -> Optional[float]:
+    """CPU ของทั้งเครื่อง (%) ตั้งแต่ครั้งก่อนที่เรียก; ไม่มี psutil ใช้ load average แทน"""
+    if psutil is not None:
+        return float(psutil.cpu_percent(interval=None))
+    try:
+        return os.getloadavg()[0] / float(os.cpu_count() or 1) * 100.0
+    except (AttributeError, OSError):
+        return None  # Windows ที่ไม่มี psutil
+
+
+class _CamState:
+    def __init__(self, level: int):
+        self.level = level
+        self.pinned: Optional[int] = None
+        self.lags: Deque[float] = deque(maxlen=256)
+        self.busy: Deque[float] = deque(maxlen=256)
+        self.good_streak = 0
+        self.bad_streak = 0
+        self.last_lag_p90 = 0.0
+        self.last_busy = 0.0
+        self.changed_at = time.time()
+
+
+class AdaptiveController:
+    def __init__(self, ladder: Sequence[QualityLevel] = DEFAULT_LADDER, enabled: bool = True,
+                 cpu_high: float = 85.0, cpu_low: float = 60.0, lag_high: float = 0.15,
+                 busy_high: float = 0.9, down_after: int = 2, up_after: int = 5):
+        self.ladder = tuple(ladder)
+        self.enabled = enabled
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.lag_high = lag_high
+        self.busy_high = busy_high
+        self.down_after = down_after      # ต้องแย่ติดกันกี่ tick ถึงลดขั้น (กันแกว่ง)
+        self.up_after = up_after          # ต้องดีติดกันกี่ tick ถึงเพิ่มขั้น
+        self.last_cpu: Optional[float] = None
+        self._cams: Dict[int, _CamState] = {}
+        self._lock = threading.Lock()
+
+    # ---------- camera ----------
+    def register(self, cam_id: int) -> None:
+        with self._lock:
+            self._cams.setdefault(cam_id, _CamState(0))
+
+    def unregister(self, cam_id: int) -> None:
+        with self._lock:
+            self._cams.pop(cam_id, None)
+
+    def observe(self, cam_id: int, lag: float, busy: float) -> None:
+        with self._lock:
+            st = self._cams.get(cam_id)
+            if st is not None:
+                st.lags.append(max(0.0, lag))
+                st.busy.append(max(0.0, busy))
+
+    def settings(self, cam_id: int) -> QualityLevel:
+        with self._lock:
+            st = self._cams.get(cam_id)
+            return self.ladder[st.level if st else 0]
+
+    def pin(self, cam_id: int, level: Optional[int]) -> bool:
+        """ล็อกกล้องไว้ที่ระดับ level (None = กลับไปปรับอัตโนมัติ)"""
+        if level is not None and not 0 <= level < len(self.ladder):
+            raise ValueError(f"level must be 0..{len(self.ladder) - 1}")
+        with self._lock:
+            st = self._cams.get(cam_id)
+            if st is None:
+                return False
+            st.pinned = level
+            if level is not None and st.level != level:
+                st.level = level
+                st.changed_at = time.time()
+            st.good_streak = st.bad_streak = 0
+            return True
+
+    # ---------- control loop ----------
+    def tick(self, cpu: Optional[float] = None) -> List[int]:
+        """ประเมินทุกกล้อง 1 รอบ คืน cam_id ที่ระดับเปลี่ยน"""
+        self.last_cpu = cpu
+        changed = []
+        with self._lock:
+            for cam_id, st in self._cams.items():
+                lags, busy = sorted(st.lags), list(st.busy)
+                st.lags.clear(); st.busy.clear()
+                st.last_lag_p90 = lags[int(len(lags) * 0.9)] if lags else 0.0
+                st.last_busy = sum(busy) / len(busy) if busy else 0.0
+                if not self.enabled or st.pinned is not None:
+                    continue
+
+                overloaded = ((cpu is not None and cpu >= self.cpu_high)
+                              or st.last_lag_p90 >= self.lag_high
+                              or st.last_busy >= self.busy_high)
+                relaxed = ((cpu is None or cpu <= self.cpu_low)
+                           and st.last_lag_p90 < self.lag_high / 2
+                           and st.last_busy < self.busy_high / 2)
+
+                if overloaded:
+                    st.bad_streak += 1; st.good_streak = 0
+                elif relaxed:
+                    st.good_streak += 1; st.bad_streak = 0
+                else:
+                    st.good_streak = st.bad_streak = 0
+
+                level = st.level
+                if st.bad_streak >= self.down_after and level < len(self.ladder) - 1:
+                    level += 1
+                elif st.good_streak >= self.up_after and level > 0:
+                    level -= 1
+                if level != st.level:
+                    st.level = level
+                    st.good_streak = st.bad_streak = 0
+                    st.changed_at = time.time()
+                    changed.append(cam_id)
+        return changed
+
+    def snapshot(self) -> Dict[int, dict]:
+        with self._lock:
+            return {cam_id: {
+                "level": st.level,
+                "pinned": st.pinned is not None,
+                "lag_p90_ms": round(st.last_lag_p90 * 1000, 1),
+                "busy": round(st.last_busy, 2),
+                "changed_at": st.changed_at,
+                **asdict(self.ladder[st.level]),
+            } for cam_id, st in self._cams.items()}
@@ -0,0 +1,92 @@
+# utils/camera_probe.py - สแกนหากล้อง (device index) แบบขนาน + cache ผลพร้อม TTL และ invalidate เมื่อมีการเสียบ/ถอดกล้อง
+import glob
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from .capture_source import open_device_capture
+
+
+def _device_signature() -> Optional[Tuple[str, ...]]:
+    """รายชื่ออุปกรณ์วิดีโอของระบบ (Linux) ใช้ตรวจ hot-plug; OS อื่นคืน None = ใช้ TTL อย่างเดียว"""
+    if sys.platform.startswith("linux"):
+        return tuple(sorted(glob.glob("/dev/video*")))
+    return None
+
+
+def _probe_one(index: int) -> bool:
+    cap, _ = open_device_capture(index, flush=1)
+    if cap is None:
+        return False
+    try: cap.release()
+    except: pass
+    return True
+
+
+def _probe_into(index: int, results: Dict[int, bool]) -> None:
+    try:
+        results[index] = _probe_one(index)
+    except Exception as e:
+        print(f"⚠️ probe camera index={index} failed: {e}")
+        results[index] = False
+
+
+class CameraProbeCache:
+    """
+    - probe() เปิดทุก index พร้อมกัน จำกัดเวลาต่ออุปกรณ์ด้วย timeout (ตัวที่ค้างถือว่าใช้ไม่ได้)
+    - ผลลัพธ์ cache ไว้ ttl วินาที หรือจนกว่ารายการอุปกรณ์ของระบบจะเปลี่ยน
+    - index ที่ pipeline เปิดใช้อยู่จะไม่ถูก probe ซ้ำ (เปิดซ้อนบน Windows จะแย่งกล้อง) แต่นับว่าใช้ได้
+    """
+
+    def __init__(self, ttl: float = 30.0, timeout: float = 2.0):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._found: List[int] = []
+        self._max_index = -1
+        self._expires = 0.0
+        self._signature: Optional[Tuple[str, ...]] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._expires = 0.0
+
+    def _fresh(self, max_index: int) -> bool:
+        return (time.monotonic() < self._expires
+                and max_index <= self._max_index
+                and _device_signature() == self._signature)
+
+    def probe(self, max_index: int = 8, in_use: Iterable[int] = (), force: bool = False) -> List[int]:
+        in_use = set(in_use)
+        # lock ทั้งรอบ: request ที่เข้ามาพร้อมกันจะรอใช้ผลของรอบเดียวกัน ไม่ probe ซ้ำ
+        with self._lock:
+            if force or not self._fresh(max_index):
+                candidates = [i for i in range(max_index + 1) if i not in in_use]
+                signature = _device_signature()
+                found: List[int] = []
+                if candidates:
+                    # daemon thread ต่ออุปกรณ์ (ไม่ใช้ ThreadPoolExecutor: worker ของมันถูก join ตอนปิดโปรแกรม
+                    # → VideoCapture ที่ค้างใน driver จะทำให้ process ปิดไม่ลง) ตัวที่ค้างเกิน timeout ถูกทิ้งไว้เบื้องหลัง
+                    results: Dict[int, bool] = {}
+                    threads = []
+                    for i in candidates:
+                        th = threading.Thread(target=_probe_into, args=(i, results),
+                                              name=f"camera-probe-{i}", daemon=True)
+                        th.start()
+                        threads.append((i, th))
+                    deadline = time.monotonic() + self.timeout
+                    for i, th in threads:
+                        th.join(max(0.0, deadline - time.monotonic()))
+                    for i, th in threads:
+                        if th.is_alive():
+                            print(f"⚠️ probe camera index={i} timed out")
+                        elif results.get(i):
+                            found.append(i)
+
+                self._found = sorted(found)
+                self._max_index = max_index
+                self._signature = signature
+                self._expires = time.monotonic() + self.ttl
+
+            found = [i for i in self._found if i <= max_index and i not in in_use]
+        return sorted(set(found) | {i for i in in_use if i <= max_index})
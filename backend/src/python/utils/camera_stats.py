@@ -0,0 +1,139 @@
+# utils/camera_stats.py - ตัวนับสถานะ/ปริมาณงานต่อกล้อง (grab fps, เฟรมหลุด, เวลา inference, lag, อายุเฟรมล่าสุด)
+# worker แต่ละตัวเรียก on_*() ราคาถูก (append ลง deque) ส่วน snapshot() สรุปค่าตอนมีคนขอ
+# render_prometheus() แปลงผลสรุปเป็น text format ของ Prometheus (ไม่ต้องพึ่ง prometheus_client)
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class RollingRate:
+    """จำนวนเหตุการณ์ต่อวินาทีในช่วง window วินาทีล่าสุด"""
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self._ts: Deque[float] = deque()
+        self._first = 0.0
+
+    def add(self, ts: float) -> None:
+        if not self._first:
+            self._first = ts
+        self._ts.append(ts)
+        self._trim(ts)
+
+    def _trim(self, now: float) -> None:
+        while self._ts and now - self._ts[0] > self.window:
+            self._ts.popleft()
+
+    def rate(self, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        self._trim(now)
+        # ช่วงแรกที่ยังเก็บไม่ครบ window หารด้วยเวลาที่ผ่านมาจริง (ไม่งั้น fps ต่ำกว่าจริงตอนเริ่ม)
+        span = min(self.window, now - self._first) if self._first else self.window
+        return len(self._ts) / span if span > 0 else 0.0
+
+
+class RollingStat:
+    """สถิติของค่าล่าสุดไม่เกิน size ตัว (เช่น เวลา inference เป็นวินาที)"""
+
+    def __init__(self, size: int = 240):
+        self._v: Deque[float] = deque(maxlen=size)
+
+    def add(self, v: float) -> None:
+        self._v.append(v)
+
+    def summary(self) -> Dict[str, float]:
+        v = sorted(self._v)
+        if not v:
+            return {"avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "avg_ms": round(sum(v) / len(v) * 1000, 2),
+            "p95_ms": round(v[min(len(v) - 1, int(len(v) * 0.95))] * 1000, 2),
+            "max_ms": round(v[-1] * 1000, 2),
+        }
+
+
+class CameraStats:
+    def __init__(self, cam_id: int, source: str = ""):
+        self.cam_id = cam_id
+        self.source = source
+        self._lock = threading.Lock()
+        self.grab_rate = RollingRate()
+        self.display_rate = RollingRate()
+        self.display_lag = RollingStat()
+        self.display_time = RollingStat()
+        self.inference_time = RollingStat()
+        self.frames_grabbed = 0
+        self.read_failures = 0
+        self.frames_displayed = 0
+        self.inferences = 0
+        self.inference_seconds = 0.0
+        self.last_frame_ts = 0.0
+        self.started_at = time.time()
+
+    # ---------- capture_worker ----------
+    def on_grab(self, ts: float) -> None:
+        with self._lock:
+            self.frames_grabbed += 1
+            self.last_frame_ts = ts
+            self.grab_rate.add(ts)
+
+    def on_read_failure(self) -> None:
+        with self._lock:
+            self.read_failures += 1
+
+    # ---------- display_worker ----------
+    def on_display(self, ts: float, lag: float, spent: float) -> None:
+        with self._lock:
+            self.frames_displayed += 1
+            self.display_rate.add(ts)
+            self.display_lag.add(lag)
+            self.display_time.add(spent)
+
+    # ---------- detection_worker ----------
+    def on_inference(self, seconds: float) -> None:
+        with self._lock:
+            self.inferences += 1
+            self.inference_seconds += seconds
+            self.inference_time.add(seconds)
+
+    def snapshot(self, dropped: int = 0) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "cam_id": self.cam_id,
+                "source": self.source,
+                "grab_fps": round(self.grab_rate.rate(now), 2),
+                "display_fps": round(self.display_rate.rate(now), 2),
+                "frames_grabbed": self.frames_grabbed,
+                "frames_displayed": self.frames_displayed,
+                "frames_dropped": dropped,
+                "read_failures": self.read_failures,
+                "last_frame_ts": self.last_frame_ts,
+                "display_lag": self.display_lag.summary(),
+                "display_time": self.display_time.summary(),
+                "inferences": self.inferences,
+                "inference_seconds": round(self.inference_seconds, 4),
+                "inference_time": self.inference_time.summary(),
+                "uptime_s": round(now - self.started_at, 1),
+            }
+
+
+# ---------- Prometheus ----------
+def _labels(d: Dict[str, Any]) -> str:
+    parts = []
+    for k, v in d.items():
+        s = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{s}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus(metrics: Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]) -> str:
+    """metrics: [(name, type, help, [(labels, value), ...]), ...] → text exposition format"""
+    lines = []
+    for name, mtype, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels) if labels else ''} {float(value):g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,325 @@
+# utils/capture_source.py - แหล่งภาพแบบเสียบเปลี่ยนได้: กล้อง USB (index), RTSP/HTTP (IP camera), ไฟล์วิดีโอ (replay)
+# ทุกคลาสมี interface แบบเดียวกับ cv2.VideoCapture (read/isOpened/release/get/set)
+# display_worker / detection_worker จึงใช้งานได้โดยไม่ต้องรู้ว่าภาพมาจากไหน
+# แหล่งภาพมาจาก request ของผู้ใช้ → make_source จำกัด: ไฟล์ต้องอยู่ใน CAMERA_MEDIA_DIR, stream ต้องเป็น scheme ที่อนุญาต
+#   และชี้ไปโฮสต์ใน CAMERA_STREAM_HOSTS หรือ address สาธารณะเท่านั้น (กัน SSRF ไป localhost / LAN / cloud metadata)
+import ipaddress
+import os
+import socket
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Tuple
+from urllib.parse import urlsplit
+import cv2
+
+CAMERA_MEDIA_DIR = os.getenv("CAMERA_MEDIA_DIR", "media")   # โฟลเดอร์เดียวที่ให้เปิดไฟล์วิดีโอ (replay) ได้
+CAMERA_STREAM_SCHEMES = tuple(
+    x.strip().lower() for x in os.getenv("CAMERA_STREAM_SCHEMES", "rtsp,rtsps,rtmp,http,https").split(",")
+    if x.strip())
+# กล้อง IP ในวง LAN ต้องระบุที่นี่: คั่นด้วย , เป็นชื่อโฮสต์ / IP / เครือข่าย CIDR เช่น "cam-gate.local,192.168.1.0/24"
+# โฮสต์อื่นนอกรายการต้อง resolve ได้เป็น address สาธารณะทุกตัว (ไม่ใช่ private / loopback / link-local 169.254.x.x)
+CAMERA_STREAM_HOSTS = tuple(
+    x.strip().lower() for x in os.getenv("CAMERA_STREAM_HOSTS", "").split(",") if x.strip())
+
+
+def _device_backends():
+    # Windows ต้องลอง DSHOW/MSMF ก่อน, Linux ใช้ V4L2, ที่เหลือให้ OpenCV เลือกเอง
+    if sys.platform.startswith("win"):
+        return [cv2.CAP_DSHOW, cv2.CAP_MSMF, None]
+    if sys.platform.startswith("linux"):
+        return [cv2.CAP_V4L2, None]
+    return [None]
+
+
+def open_device_capture(index: int, flush: int = 10):
+    """ลองเปิดกล้องด้วย backend หลายแบบตาม index ที่ระบุ คืน (cap, backend) หรือ (None, None)"""
+    for be in _device_backends():
+        try:
+            cap = cv2.VideoCapture(index, be) if be is not None else cv2.VideoCapture(index)
+            if not cap.isOpened():
+                try: cap.release()
+                except: pass
+                continue
+
+            # flush buffer
+            for _ in range(flush):
+                ok, _ = cap.read()
+                if not ok:
+                    break
+
+            ok, img = cap.read()
+            if ok and img is not None and img.size > 0:
+                return cap, be
+            cap.release()
+        except Exception as e:
+            print(f"⚠️ open camera index={index} with backend {be} failed: {e}")
+    return None, None
+
+
+class CaptureSource(ABC):
+    kind = "base"
+
+    def __init__(self):
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._released = False
+
+    def describe(self) -> str:
+        return self.kind
+
+    @abstractmethod
+    def open(self) -> bool:
+        """เปิดแหล่งภาพ คืน True ถ้าพร้อมอ่าน"""
+
+    @property
+    def frame_interval(self) -> float:
+        """วินาทีต่อเฟรมที่ผู้อ่านควรเว้น (0 = แหล่งภาพสดกำหนดจังหวะเอง อ่านได้ทันที)"""
+        return 0.0
+
+    def apply_preferred_mode(self) -> None:
+        """ตั้งความละเอียด/fps ที่อยากได้ (เฉพาะแหล่งที่ปรับได้)"""
+
+    def read(self) -> Tuple[bool, Any]:
+        if self._cap is None:
+            return False, None
+        return self._cap.read()
+
+    def isOpened(self) -> bool:
+        return not self._released and self._cap is not None and self._cap.isOpened()
+
+    def get(self, prop: int) -> float:
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def set(self, prop: int, value: float) -> bool:
+        return bool(self._cap.set(prop, value)) if self._cap is not None else False
+
+    def release(self) -> None:
+        self._released = True
+        if self._cap is not None:
+            try: self._cap.release()
+            except: pass
+        self._cap = None
+
+
+class DeviceSource(CaptureSource):
+    kind = "device"
+
+    def __init__(self, index: int):
+        super().__init__()
+        self.index = index
+        self.backend = None
+
+    def describe(self) -> str:
+        return f"device:{self.index}"
+
+    def open(self) -> bool:
+        self._cap, self.backend = open_device_capture(self.index)
+        return self._cap is not None
+
+    def apply_preferred_mode(self) -> None:
+        cap = self._cap
+        if cap is None:
+            return
+        # พยายาม 1280x720@60 ถ้าไม่ไหวลดเป็น 640x480@60
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        cap.set(cv2.CAP_PROP_FPS, 60)
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        except Exception:
+            fps = 0
+        if fps < 59:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            cap.set(cv2.CAP_PROP_FPS, 60)
+
+        for _ in range(12):  # flush หลังตั้งค่า
+            cap.read()
+
+
+class StreamSource(CaptureSource):
+    """RTSP/HTTP (IP camera) ถ้าหลุดจะต่อใหม่เองแบบ exponential backoff โดยไม่บล็อก worker"""
+    kind = "stream"
+
+    def __init__(self, url: str, min_backoff: float = 0.5, max_backoff: float = 30.0,
+                 timeout_ms: int = 5000):
+        super().__init__()
+        self.url = url
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.timeout_ms = timeout_ms
+        self._backoff = min_backoff
+        self._next_retry = 0.0
+        self.reconnects = 0
+
+    def describe(self) -> str:
+        return f"stream:{self.url}"
+
+    def _connect(self) -> bool:
+        params = []
+        for name in ("CAP_PROP_OPEN_TIMEOUT_MSEC", "CAP_PROP_READ_TIMEOUT_MSEC"):
+            prop = getattr(cv2, name, None)
+            if prop is not None:
+                params += [prop, self.timeout_ms]
+        try:
+            cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, params) if params \
+                else cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # เอาเฟรมสด ไม่ต้องเก็บคิวเก่า
+        except Exception as e:
+            print(f"⚠️ open stream {self.url} failed: {e}")
+            cap = None
+
+        if cap is None or not cap.isOpened():
+            self._schedule_retry()
+            return False
+        self._cap = cap
+        return True
+
+    def _schedule_retry(self) -> None:
+        if self._cap is not None:
+            try: self._cap.release()
+            except: pass
+        self._cap = None
+        self._next_retry = time.monotonic() + self._backoff
+        self._backoff = min(self.max_backoff, self._backoff * 2)
+
+    def open(self) -> bool:
+        return self._connect()
+
+    def isOpened(self) -> bool:
+        # ระหว่างรอต่อใหม่ยังถือว่า "เปิดอยู่" เพื่อให้ worker เรียก read() ต่อไปและได้ต่อใหม่
+        return not self._released
+
+    def read(self) -> Tuple[bool, Any]:
+        if self._released:
+            return False, None
+        if self._cap is None:
+            if time.monotonic() < self._next_retry:
+                return False, None
+            self.reconnects += 1
+            if not self._connect():
+                return False, None
+
+        ok, frame = self._cap.read()
+        if not ok or frame is None:
+            print(f"⚠️ stream {self.url} lost, retry in {self._backoff:.1f}s")
+            self._schedule_retry()
+            return False, None
+        self._backoff = self.min_backoff
+        return True, frame
+
+
+class FileSource(CaptureSource):
+    """
+    replay ไฟล์วิดีโอ; read() คืนเฟรมถัดไปทันที ไม่หน่วงเวลาเอง
+    ผู้อ่าน (capture_worker) เว้นจังหวะตาม frame_interval = fps เดิมของไฟล์ × rate (rate<=0 = เร็วที่สุดเท่าที่อ่านได้)
+    """
+    kind = "file"
+
+    def __init__(self, path: str, rate: float = 1.0, loop: bool = True):
+        super().__init__()
+        self.path = path
+        self.rate = rate
+        self.loop = loop
+        self._interval = 0.0
+
+    def describe(self) -> str:
+        return f"file:{self.path}"
+
+    def open(self) -> bool:
+        if not os.path.exists(self.path):
+            print(f"⚠️ video file not found: {self.path}")
+            return False
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            return False
+        self._cap = cap
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._interval = 1.0 / (fps * self.rate) if self.rate > 0 else 0.0
+        return True
+
+    @property
+    def frame_interval(self) -> float:
+        return self._interval
+
+    def read(self) -> Tuple[bool, Any]:
+        if self._cap is None or self._released:
+            return False, None
+
+        ok, frame = self._cap.read()
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._cap.read()
+        return ok, frame
+
+
+def _media_path(path: str, media_dir: str) -> str:
+    """พาธจริงของไฟล์ที่ขอ (สัมพัทธ์กับ media_dir) ต้องอยู่ใต้ media_dir เท่านั้น"""
+    root = os.path.realpath(media_dir)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"video file must be inside the media directory ({media_dir}): {path!r}")
+    return full
+
+
+def _check_stream_host(host: str, allowed: Optional[Tuple[str, ...]] = None) -> None:
+    """host ต้องอยู่ใน allowed (ชื่อ/IP/CIDR) หรือ resolve ได้เป็น address สาธารณะทั้งหมด ไม่งั้น ValueError"""
+    allowed = CAMERA_STREAM_HOSTS if allowed is None else allowed
+    host = host.lower().rstrip(".")
+    if host in allowed:
+        return
+    nets = []
+    for a in allowed:
+        try:
+            nets.append(ipaddress.ip_network(a, strict=False))
+        except ValueError:
+            pass   # เป็นชื่อโฮสต์ ไม่ใช่ IP/CIDR
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except OSError as e:
+        raise ValueError(f"cannot resolve stream host {host!r}: {e}")
+    for *_, sockaddr in infos:
+        ip = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if getattr(ip, "ipv4_mapped", None):
+            ip = ip.ipv4_mapped
+        if any(ip in n for n in nets):
+            continue
+        if not ip.is_global:
+            raise ValueError(f"stream host {host!r} resolves to non-public address {ip} "
+                             f"(add it to CAMERA_STREAM_HOSTS to allow)")
+
+
+def make_source(spec: Any, media_dir: Optional[str] = None) -> CaptureSource:
+    """
+    spec:
+      - int หรือ "2"                   → DeviceSource
+      - "rtsp://..." / "http://..."     → StreamSource (scheme ต้องอยู่ใน CAMERA_STREAM_SCHEMES,
+                                           โฮสต์อยู่ใน CAMERA_STREAM_HOSTS หรือเป็น address สาธารณะ)
+      - "path/to/video.mp4"             → FileSource (พาธสัมพัทธ์กับ media_dir และห้ามออกนอก media_dir)
+      - {"source": ..., "rate": 4.0, "loop": true} → ตามชนิดของ source พร้อม option
+    แหล่งภาพที่ไม่อนุญาต → ValueError
+    """
+    opts = {}
+    if isinstance(spec, dict):
+        opts = spec
+        spec = spec.get("source")
+
+    if isinstance(spec, bool):   # bool เป็น subclass ของ int: True ไม่ใช่กล้อง index 1
+        raise ValueError(f"invalid capture source: {spec!r}")
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.strip().isdigit()):
+        return DeviceSource(int(spec))
+    if not isinstance(spec, str) or not spec.strip():
+        raise ValueError(f"invalid capture source: {spec!r}")
+
+    s = spec.strip()
+    if "://" in s:
+        url = urlsplit(s)
+        if url.scheme.lower() not in CAMERA_STREAM_SCHEMES:
+            raise ValueError(f"stream scheme not allowed: {url.scheme!r} "
+                             f"(allowed: {', '.join(CAMERA_STREAM_SCHEMES)})")
+        if not url.hostname:
+            raise ValueError(f"stream url has no host: {s!r}")
+        _check_stream_host(url.hostname)
+        return StreamSource(s)
+    path = _media_path(s, media_dir or CAMERA_MEDIA_DIR)
+    return FileSource(path, rate=float(opts.get("rate", 1.0)), loop=bool(opts.get("loop", True)))
@@ -0,0 +1,252 @@
+# utils/clip_recorder.py - เก็บคลิปสั้นก่อน/หลังเหตุการณ์ (pre/post-roll) ต่อ detection โดยไม่ต้องอัดวิดีโอตลอดเวลา
+# - ต่อกล้องเก็บ ring buffer ของ JPEG ย้อนหลังไม่กี่วินาที (หน่วยความจำจำกัด)
+# - request() เข้าคิวทันทีที่เกิดเหตุการณ์ แล้ว thread เบื้องหลังรอครบ post-roll จึงเขียนไฟล์ .avi (MJPG) ลงดิสก์
+#   detection_id ที่ได้ทีหลัง (หลัง upload/OCR/insert) ผูกเข้าคลิปด้วย attach_detection()
+# - ดัชนีคลิปเก็บใน SQLite (clips) ไว้ค้น/อัปโหลดทีหลัง และลบคลิปเก่าเมื่อเกินโควต้าดิสก์
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    clip_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    detection_id TEXT,
+    location_id  TEXT,
+    cam_id       INTEGER,
+    event_ts     REAL,
+    path         TEXT,
+    frames       INTEGER,
+    bytes        INTEGER,
+    remote_url   TEXT,
+    created_at   TEXT
+)
+"""
+
+
+class JpegRingBuffer:
+    """JPEG ย้อนหลังของกล้อง 1 ตัว เก็บไม่เกิน retention วินาที"""
+
+    def __init__(self, retention: float):
+        self.retention = retention
+        self._buf: Deque[Tuple[float, bytes]] = deque()
+        self._lock = threading.Lock()
+
+    def append(self, ts: float, jpeg: bytes) -> None:
+        with self._lock:
+            self._buf.append((ts, jpeg))
+            while self._buf and ts - self._buf[0][0] > self.retention:
+                self._buf.popleft()
+
+    def between(self, t0: float, t1: float) -> List[Tuple[float, bytes]]:
+        with self._lock:
+            return [(ts, b) for ts, b in self._buf if t0 <= ts <= t1]
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(len(b) for _, b in self._buf)
+
+
+class ClipIndex:
+    """ดัชนีคลิปใน SQLite (ใช้ได้ทั้งฝั่ง engine ที่เขียนคลิป และฝั่ง API ที่แค่ค้น/อัปโหลด)"""
+
+    def __init__(self, clip_dir: str, max_disk_bytes: int = 2 * 1024 ** 3):
+        self.clip_dir = clip_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.index_path = os.path.join(clip_dir, "clips.sqlite3")
+        os.makedirs(clip_dir, exist_ok=True)
+        with self._db() as db:
+            db.execute(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.index_path, timeout=5)
+        try:
+            with db:  # commit/rollback อัตโนมัติ
+                yield db
+        finally:
+            db.close()
+
+    def add(self, detection_id: Optional[str], location_id: Optional[str], cam_id: int,
+            event_ts: float, path: str, frames: int) -> None:
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO clips (detection_id, location_id, cam_id, event_ts, path, frames, bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (detection_id, location_id, cam_id, event_ts, path,
+                 frames, os.path.getsize(path), datetime.now().isoformat(timespec="seconds")))
+
+    def set_detection(self, cam_id: int, event_ts: float, detection_id: str) -> int:
+        """ผูก detection_id เข้ากับคลิปของเหตุการณ์ (cam_id, event_ts) ที่เขียนไปแล้ว คืนจำนวนแถวที่แก้"""
+        with self._db() as db:
+            return db.execute("UPDATE clips SET detection_id = ? WHERE cam_id = ? AND event_ts = ?",
+                              (detection_id, cam_id, event_ts)).rowcount
+
+    def enforce_quota(self) -> None:
+        with self._db() as db:
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM clips").fetchone()[0]
+            if total <= self.max_disk_bytes:
+                return
+            for clip_id, path, size in db.execute(
+                    "SELECT clip_id, path, bytes FROM clips ORDER BY event_ts ASC").fetchall():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                db.execute("DELETE FROM clips WHERE clip_id = ?", (clip_id,))
+                total -= size or 0
+                if total <= self.max_disk_bytes:
+                    break
+
+    def list_clips(self, location_id: Optional[str] = None, detection_id: Optional[str] = None,
+                   limit: int = 100) -> List[Dict[str, Any]]:
+        q = "SELECT * FROM clips"
+        args: List[Any] = []
+        conds = []
+        if location_id:
+            conds.append("location_id = ?"); args.append(location_id)
+        if detection_id:
+            conds.append("detection_id = ?"); args.append(detection_id)
+        if conds:
+            q += " WHERE " + " AND ".join(conds)
+        q += " ORDER BY event_ts DESC LIMIT ?"
+        args.append(limit)
+        with self._db() as db:
+            db.row_factory = sqlite3.Row
+            return [dict(r) for r in db.execute(q, args).fetchall()]
+
+    def upload_pending(self, upload_fn: Callable[[str], str], limit: int = 10) -> int:
+        """อัปโหลดคลิปที่ยังไม่มี remote_url (upload_fn รับ path คืน url) คืนจำนวนที่อัปโหลดสำเร็จ"""
+        with self._db() as db:
+            rows = db.execute(
+                "SELECT clip_id, path FROM clips WHERE remote_url IS NULL ORDER BY event_ts ASC LIMIT ?",
+                (limit,)).fetchall()
+        done = 0
+        for clip_id, path in rows:
+            try:
+                url = upload_fn(path)
+            except Exception as e:
+                print(f"⚠️ clip upload failed ({path}):", e)
+                continue
+            if url:
+                with self._db() as db:
+                    db.execute("UPDATE clips SET remote_url = ? WHERE clip_id = ?", (url, clip_id))
+                done += 1
+        return done
+
+
+class ClipRecorder:
+    def __init__(self, clip_dir: str, pre_seconds: float = 5.0, post_seconds: float = 3.0,
+                 fps: float = 10.0, max_disk_bytes: int = 2 * 1024 ** 3, max_event_delay: float = 5.0):
+        """
+        max_event_delay: request() มาช้ากว่า event_ts ได้นานสุดกี่วินาที (เช่น รอ tracker ตัดสินว่ารถผ่านไปแล้ว)
+        ring buffer เก็บย้อนหลัง pre + post + max_event_delay วินาที กันเฟรม pre-roll หลุดก่อนถูกเขียน
+        """
+        self.clip_dir = clip_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_event_delay = max_event_delay
+        self.fps = fps
+        self.index = ClipIndex(clip_dir, max_disk_bytes)
+
+        self._buffers: Dict[int, JpegRingBuffer] = {}
+        self._buffers_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ---------- feed ----------
+    def buffer_for(self, cam_id: int) -> JpegRingBuffer:
+        with self._buffers_lock:
+            buf = self._buffers.get(cam_id)
+            if buf is None:
+                buf = self._buffers[cam_id] = JpegRingBuffer(
+                    self.pre_seconds + self.post_seconds + self.max_event_delay)
+            return buf
+
+    def feed(self, cam_id: int, ts: float, jpeg: bytes) -> None:
+        self.buffer_for(cam_id).append(ts, jpeg)
+
+    def drop_camera(self, cam_id: int) -> None:
+        with self._buffers_lock:
+            self._buffers.pop(cam_id, None)
+
+    # ---------- request ----------
+    def request(self, cam_id: int, event_ts: float, detection_id: Optional[str] = None,
+                location_id: Optional[str] = None) -> None:
+        self._queue.put({
+            "cam_id": cam_id, "event_ts": event_ts,
+            "detection_id": detection_id, "location_id": location_id})
+
+    def attach_detection(self, cam_id: int, event_ts: float, detection_id: Optional[str]) -> None:
+        """
+        ผูก detection_id เข้ากับคลิปที่ request ไว้แล้ว (cam_id, event_ts เดียวกับตอน request)
+        เข้าคิวเดียวกับ request → ทำหลังคลิปนั้นถูกเขียนเสมอ และไม่แตะ SQLite ใน thread ของผู้เรียก
+        """
+        if detection_id:
+            self._queue.put({"attach": detection_id, "cam_id": cam_id, "event_ts": event_ts})
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """หยุด writer thread (timeout = รอคลิปที่ค้างในคิวเขียนให้เสร็จก่อน)"""
+        self._queue.put(None)
+        if timeout:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            req = self._queue.get()
+            if req is None:
+                return
+            try:
+                if "attach" in req:
+                    self.index.set_detection(req["cam_id"], req["event_ts"], req["attach"])
+                    continue
+                # รอจน post-roll ครบก่อนค่อยตัดคลิป
+                wait = req["event_ts"] + self.post_seconds - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                self._write_clip(req)
+                self.index.enforce_quota()
+            except Exception as e:
+                print(f"❌ clip recorder error ({req}):", e)
+
+    def _write_clip(self, req: Dict[str, Any]) -> Optional[str]:
+        cam_id, event_ts = req["cam_id"], req["event_ts"]
+        with self._buffers_lock:
+            buf = self._buffers.get(cam_id)
+        frames = buf.between(event_ts - self.pre_seconds, event_ts + self.post_seconds) if buf else []
+        if not frames:
+            return None
+
+        day = datetime.fromtimestamp(event_ts).strftime("%Y-%m-%d")
+        out_dir = os.path.join(self.clip_dir, day)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"cam{cam_id}_{int(event_ts * 1000)}.avi")
+
+        writer = None
+        written = 0
+        try:
+            for _, jpeg in frames:
+                img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                if writer is None:
+                    h, w = img.shape[:2]
+                    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (w, h))
+                writer.write(img)
+                written += 1
+        finally:
+            if writer is not None:
+                writer.release()
+        if not written:
+            return None
+
+        self.index.add(req.get("detection_id"), req.get("location_id"), cam_id, event_ts, path, written)
+        return path
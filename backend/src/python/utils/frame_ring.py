@@ -0,0 +1,69 @@
+# utils/frame_ring.py - ring buffer เฟรมล่าสุดแบบมี timestamp ต่อกล้อง (grab thread เขียน, consumer หลายตัวอ่านตามจังหวะตัวเอง)
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+
+
+@dataclass(frozen=True)
+class TimedFrame:
+    seq: int
+    ts: float          # time.time() ตอน grab
+    frame: np.ndarray
+
+
+class FrameRing:
+    """
+    - push() ไม่เคยบล็อก: เฟรมเก่าสุดหลุดออกเองเมื่อเต็ม (เฟรมสดเสมอ ไม่ว่า consumer จะช้าแค่ไหน)
+    - wait_newer() ให้ consumer รอเฟรมที่ใหม่กว่า seq ที่เคยเห็น
+    - at(ts) ดึงเฟรมย้อนหลังที่ใกล้เวลาที่ขอที่สุด (เช่น เฟรมหลักฐานก่อนหน้าไม่กี่ร้อย ms)
+    """
+
+    def __init__(self, capacity: int = 8):
+        self._buf: deque = deque(maxlen=max(1, capacity))
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.dropped = 0  # เฟรมที่ถูกเขียนทับก่อนมี consumer มาอ่าน (ใช้ดูว่า consumer ตามไม่ทัน)
+        self._last_read_seq = 0
+
+    def push(self, frame: np.ndarray, ts: float) -> int:
+        with self._cond:
+            self._seq += 1
+            if len(self._buf) == self._buf.maxlen and self._buf[0].seq > self._last_read_seq:
+                self.dropped += 1
+            self._buf.append(TimedFrame(self._seq, ts, frame))
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self) -> Optional[TimedFrame]:
+        with self._cond:
+            if not self._buf:
+                return None
+            tf = self._buf[-1]
+            self._last_read_seq = max(self._last_read_seq, tf.seq)
+            return tf
+
+    def wait_newer(self, seq: int, timeout: float) -> Optional[TimedFrame]:
+        """รอจนมีเฟรม seq > ที่ให้มา คืนเฟรมล่าสุด (ข้ามเฟรมกลางทาง) หรือ None ถ้าหมดเวลา"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > seq, timeout=timeout):
+                return None
+            tf = self._buf[-1]
+            self._last_read_seq = max(self._last_read_seq, tf.seq)
+            return tf
+
+    def at(self, ts: float) -> Optional[TimedFrame]:
+        with self._cond:
+            if not self._buf:
+                return None
+            return min(self._buf, key=lambda tf: abs(tf.ts - ts))
+
+    def snapshot(self) -> List[TimedFrame]:
+        with self._cond:
+            return list(self._buf)
+
+    def clear(self) -> None:
+        with self._cond:
+            self._buf.clear()
+            self._cond.notify_all()
@@ -0,0 +1,130 @@
+# utils/jpeg_tiers.py - encode JPEG ครั้งเดียวต่อเฟรมต่อ tier แล้วแชร์ bytes ให้ทุก viewer ของกล้องนั้น
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Tier:
+    width: int      # ความกว้างเป้าหมาย (0 = ความละเอียดเดิมของกล้อง)
+    quality: int    # JPEG quality 0-100
+
+
+DEFAULT_TIERS: Dict[str, Tier] = {
+    "thumb": Tier(320, 50),
+    "display": Tier(640, 60),
+    "evidence": Tier(0, 90),
+}
+
+
+class TieredJpegEncoder:
+    """
+    ตัว encode ต่อกล้อง 1 ตัว
+    - publish() เก็บแค่เฟรมดิบ + เลข seq (ไม่ encode เลย ถ้าไม่มีใครดู ก็ไม่เสีย CPU)
+    - get(tier) encode แบบ lazy ครั้งแรกที่มีคนขอ tier นั้นของ seq นั้น แล้ว cache ไว้
+      viewer คนถัดไปที่ขอ seq เดิมได้ bytes ชุดเดียวกัน → ต้นทุนขึ้นกับจำนวน tier ที่ใช้จริง ไม่ใช่จำนวน viewer
+    """
+
+    def __init__(self, tiers: Optional[Dict[str, Tier]] = None, subscriber_ttl: float = 2.0):
+        self.tiers = dict(tiers or DEFAULT_TIERS)
+        self.subscriber_ttl = subscriber_ttl
+        self._lock = threading.Lock()
+        self._tier_locks = {name: threading.Lock() for name in self.tiers}
+        self._frame: Optional[np.ndarray] = None
+        self._prescaled: Dict[int, np.ndarray] = {}
+        self._seq = 0
+        self._ts = 0.0
+        self._cache: Dict[str, Tuple[int, float, bytes]] = {}  # tier -> (seq, ts, jpeg)
+        self._last_seen: Dict[str, float] = {}
+        self.encode_count: Dict[str, int] = {name: 0 for name in self.tiers}
+        self.encode_seconds: Dict[str, float] = {name: 0.0 for name in self.tiers}
+
+    def publish(self, frame: np.ndarray, ts: float,
+                prescaled: Optional[Dict[int, np.ndarray]] = None) -> int:
+        """
+        รับเฟรมใหม่ (ความละเอียดเต็ม) คืนเลข seq
+        prescaled: {width: frame} ที่ย่อไว้แล้ว ใช้แทนการ resize ซ้ำ
+          (เช่น เฟรมกว้าง display_width ตามระดับคุณภาพปัจจุบันที่ display_worker ย่อไว้แสดงผลอยู่แล้ว)
+        """
+        with self._lock:
+            self._seq += 1
+            self._frame = frame
+            self._prescaled = dict(prescaled or {})
+            self._ts = ts
+            return self._seq
+
+    def set_tier(self, name: str, tier: Tier) -> None:
+        """เปลี่ยนขนาด/quality ของ tier ที่มีอยู่ (เช่น ตอนปรับคุณภาพอัตโนมัติ) เฟรมถัดไปใช้ค่าใหม่"""
+        with self._lock:
+            if name not in self.tiers:
+                raise KeyError(f"unknown tier: {name}")
+            if self.tiers[name] != tier:
+                self.tiers[name] = tier
+                self._cache.pop(name, None)
+
+    def latest(self) -> Tuple[int, float]:
+        with self._lock:
+            return self._seq, self._ts
+
+    def _scaled(self, frame: np.ndarray, prescaled: Dict[int, np.ndarray], width: int) -> np.ndarray:
+        if width <= 0:
+            return frame
+        if width in prescaled:
+            return prescaled[width]
+        # ใช้ภาพที่เล็กที่สุดที่ยังกว้างกว่าเป้าหมาย เป็นต้นทางการย่อ
+        src = frame
+        for w in sorted(prescaled):
+            if w >= width:
+                src = prescaled[w]
+                break
+        h, w = src.shape[:2]
+        if w <= width:
+            return src
+        return cv2.resize(src, (width, int(h * width / float(w))), interpolation=cv2.INTER_AREA)
+
+    def get(self, tier: str, viewer: bool = True) -> Optional[Tuple[bytes, int, float]]:
+        """
+        คืน (jpeg_bytes, seq, ts) ของเฟรมล่าสุดใน tier ที่ขอ หรือ None ถ้ายังไม่มีเฟรม
+        viewer=False: ผู้ขอภายใน (เช่น ตัวอัดคลิป) ไม่นับเป็นคนดูใน active_tiers()
+        """
+        spec = self.tiers.get(tier)
+        if spec is None:
+            raise KeyError(f"unknown tier: {tier}")
+
+        with self._lock:
+            if viewer:
+                self._last_seen[tier] = time.monotonic()
+            frame, prescaled, seq, ts = self._frame, self._prescaled, self._seq, self._ts
+            cached = self._cache.get(tier)
+        if frame is None:
+            return None
+        if cached and cached[0] == seq:
+            return cached[2], seq, ts
+
+        # viewer หลายคนขอพร้อมกัน → encode คนเดียว ที่เหลือรอรับ bytes เดียวกัน
+        with self._tier_locks[tier]:
+            with self._lock:
+                cached = self._cache.get(tier)
+            if cached and cached[0] >= seq:
+                return cached[2], cached[0], cached[1]
+
+            t0 = time.perf_counter()
+            img = self._scaled(frame, prescaled, spec.width)
+            ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), spec.quality])
+            if not ok:
+                return None
+            data = buf.tobytes()
+            with self._lock:
+                self._cache[tier] = (seq, ts, data)
+                self.encode_count[tier] += 1
+                self.encode_seconds[tier] += time.perf_counter() - t0
+            return data, seq, ts
+
+    def active_tiers(self) -> List[str]:
+        """tier ที่มีคนขอภายใน subscriber_ttl วินาทีล่าสุด"""
+        now = time.monotonic()
+        with self._lock:
+            return [t for t, seen in self._last_seen.items() if now - seen <= self.subscriber_ttl]
@@ -0,0 +1,111 @@
+# utils/lowlight.py - ปรับภาพแสงน้อย (CLAHE + gamma) แบบเตรียม LUT/CLAHE ไว้ล่วงหน้า ใช้ซ้ำได้ทุกเฟรม
+import os
+import threading
+from functools import lru_cache
+from typing import Tuple
+import cv2
+import numpy as np
+
+DEFAULT_GAMMA = 1.5
+DEFAULT_CLIP_LIMIT = 2.0
+DEFAULT_TILE = (8, 8)
+
+# ค่าเฉลี่ยความสว่าง (0-255) ที่ต่ำกว่านี้ถือว่าแสงน้อย ต้อง enhance
+LUMA_THRESHOLD = float(os.getenv("LOWLIGHT_LUMA_THRESHOLD", "80"))
+STATS_WIDTH = 64  # ย่อภาพเหลือเท่านี้ก่อนคำนวณสถิติ (ถูกกว่าเฉลี่ยทั้งเฟรมมาก)
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=16)
+def gamma_lut(gamma: float = DEFAULT_GAMMA) -> np.ndarray:
+    """ตาราง gamma 256 ค่า (คำนวณครั้งเดียวต่อค่า gamma)"""
+    x = np.arange(256, dtype=np.float64) / 255.0
+    lut = (np.power(x, 1.0 / gamma) * 255).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+def _clahe(clip_limit: float, tile: Tuple[int, int]):
+    """CLAHE object ต่อ thread (cv2.CLAHE ไม่ thread-safe จึงไม่แชร์ข้าม thread)"""
+    cache = getattr(_local, "clahe", None)
+    if cache is None:
+        cache = _local.clahe = {}
+    key = (clip_limit, tile)
+    obj = cache.get(key)
+    if obj is None:
+        obj = cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile)
+    return obj
+
+
+def mean_luma(bgr: np.ndarray) -> float:
+    """ความสว่างเฉลี่ยจากภาพย่อ (สถิติหยาบ ๆ พอสำหรับตัดสินว่ากลางวัน/กลางคืน)"""
+    h, w = bgr.shape[:2]
+    if w > STATS_WIDTH:
+        small = cv2.resize(bgr, (STATS_WIDTH, max(1, int(h * STATS_WIDTH / w))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = bgr
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    return float(gray.mean())
+
+
+def needs_enhancement(bgr: np.ndarray, threshold: float = LUMA_THRESHOLD) -> bool:
+    return mean_luma(bgr) < threshold
+
+
+def enhance_lowlight(bgr: np.ndarray, gamma: float = DEFAULT_GAMMA,
+                     clip_limit: float = DEFAULT_CLIP_LIMIT,
+                     tile: Tuple[int, int] = DEFAULT_TILE) -> np.ndarray:
+    """ปรับภาพแสงน้อย: CLAHE บนช่อง Y + gamma (ผลลัพธ์เท่ากับเวอร์ชันเดิมใน backend.py)"""
+    ycrcb = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)
+    y, cr, cb = cv2.split(ycrcb)
+    y = _clahe(clip_limit, tile).apply(y)
+    out = cv2.cvtColor(cv2.merge([y, cr, cb]), cv2.COLOR_YCrCb2BGR)
+    return cv2.LUT(out, gamma_lut(gamma))
+
+
+def auto_enhance(bgr: np.ndarray, threshold: float = LUMA_THRESHOLD) -> np.ndarray:
+    """enhance เฉพาะเฟรมที่มืด (กลางวันคืนภาพเดิม ไม่เสีย CPU)"""
+    if threshold <= 0 or not needs_enhancement(bgr, threshold):
+        return bgr
+    return enhance_lowlight(bgr)
+
+
+def _legacy_enhance_lowlight(bgr):
+    # เวอร์ชันเดิมจาก backend.py (สร้าง CLAHE + ตาราง gamma ใหม่ทุกครั้ง) ไว้เทียบใน benchmark
+    ycrcb = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)
+    y, cr, cb = cv2.split(ycrcb)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    y = clahe.apply(y)
+    out = cv2.cvtColor(cv2.merge([y, cr, cb]), cv2.COLOR_YCrCb2BGR)
+    table = np.array([((i / 255.0) ** (1.0 / 1.5)) * 255 for i in np.arange(256)]).astype("uint8")
+    return cv2.LUT(out, table)
+
+
+if __name__ == "__main__":
+    # benchmark: python -m backend.src.python.utils.lowlight
+    import time
+
+    rng = np.random.default_rng(0)
+    frames = {
+        "dark": rng.integers(0, 60, (480, 640, 3), dtype=np.uint8),
+        "daylight": rng.integers(90, 255, (480, 640, 3), dtype=np.uint8),
+    }
+    variants = {
+        "legacy": _legacy_enhance_lowlight,
+        "cached": enhance_lowlight,
+        "auto": auto_enhance,
+        "stats_only": needs_enhancement,
+    }
+    assert np.array_equal(_legacy_enhance_lowlight(frames["dark"]), enhance_lowlight(frames["dark"]))
+
+    n = 300
+    for fname, frame in frames.items():
+        for vname, fn in variants.items():
+            fn(frame)
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn(frame)
+            ms = (time.perf_counter() - t0) * 1000 / n
+            print(f"{fname:<9} {vname:<11} {ms:7.3f} ms/frame")
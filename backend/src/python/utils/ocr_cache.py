@@ -0,0 +1,260 @@
+# utils/ocr_cache.py - cache ผล OCR ป้ายทะเบียน key = (location, perceptual hash ของภาพ crop ป้าย)
+# รถจอดนิ่งหน้าไม้กั้นได้เฟรมซ้ำๆ ที่ป้ายหน้าตาเหมือนเดิม → ใช้ผลเดิมแทนการเรียก OCR (เสียเงิน + ช้า) ซ้ำ
+# - dHash 64 บิต เป็น key หลัก; hash ที่ห่างไม่เกิน OCR_CACHE_MAX_DISTANCE บิต (Hamming) นับเป็นผู้สมัคร
+# - hash อย่างเดียวแยกป้ายที่ต่างกันตัวอักษรเดียวไม่ได้ จึงยืนยันซ้ำด้วย thumbnail: จัดแนวภาพก่อน (ECC affine — กล่องป้าย
+#   ของเฟรมติดกันขยับ/ย่อขยายไม่กี่ pixel) แล้ววัดค่าต่างของช่วงแนวตั้งที่ต่างมากสุด ต้องไม่เกิน OCR_CACHE_MAX_DIFF
+#   (เฟรมติดกันของป้ายเดิม ≈ 0.1, ป้ายที่ต่างกันตัวอักษรเดียว ≳ 0.2 เพราะตัวที่ต่างกระจุกอยู่ช่วงเดียว)
+# - in-memory LRU จำกัดจำนวน + TTL สั้น; ตั้ง OCR_CACHE_SQLITE เพื่อเก็บลงไฟล์ให้อยู่รอดตอน restart / ใช้ร่วมหลาย process
+#   put() ไม่แตะดิสก์ (thread ของ cache เขียน SQLite ให้); get() เทียบภาพ/อ่าน SQLite → ผู้เรียกฝั่ง async รันใน executor
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "1") == "1"
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", "60"))
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "1024"))
+OCR_CACHE_MAX_DISTANCE = int(os.getenv("OCR_CACHE_MAX_DISTANCE", "24"))  # บิตที่ต่างได้สูงสุดที่ยังนับเป็นผู้สมัคร (ตัดสินจริงด้วย thumbnail)
+OCR_CACHE_MAX_DIFF = float(os.getenv("OCR_CACHE_MAX_DIFF", "0.15"))      # ค่าต่างของ thumbnail หลังจัดแนว (thumb_distance)
+OCR_CACHE_SQLITE = os.getenv("OCR_CACHE_SQLITE", "")
+THUMB_SIZE = (192, 48)      # เล็กกว่านี้ ECC จัดแนวป้ายที่ขยับไม่ลง
+THUMB_MARGIN = (8, 4)       # ขอบที่ไม่นับหลังจัดแนว (ส่วนที่เลื่อนเข้ามาจากนอกภาพ)
+DIFF_BLOCKS = 12            # ช่วงแนวตั้ง ≈ ความกว้างตัวอักษร 1 ตัว
+_MAX_WARP = 0.15            # จัดแนวได้ไม่เกิน ±15% (ย่อขยาย/เอียง) และเลื่อนไม่เกิน 10% / 20% ของกว้าง/สูง
+_ECC_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-4)
+
+
+def dhash(img: np.ndarray, size: int = 8) -> int:
+    """difference hash 64 บิต (size=8) ของภาพ BGR/เทา"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray.astype(np.float32), (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def thumbnail(img: np.ndarray) -> np.ndarray:
+    """ภาพเทาขนาดเล็ก (uint8) ใช้ยืนยันว่าเป็นภาพเดียวกันจริง (normalize แสงตอนเทียบใน thumb_distance)"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def _normalized(t: np.ndarray) -> np.ndarray:
+    g = t.astype(np.float32)
+    return (g - g.mean()) / (g.std() + 1e-6)
+
+
+def _warp_ok(warp: np.ndarray, w: int, h: int) -> bool:
+    return (float(np.abs(warp[:, :2] - np.eye(2, dtype=np.float32)).max()) <= _MAX_WARP
+            and abs(float(warp[0, 2])) <= 0.1 * w and abs(float(warp[1, 2])) <= 0.2 * h)
+
+
+def thumb_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    ค่าต่างของ thumbnail สองภาพ (normalize แสงแล้ว): จัดแนว b ให้ตรง a ด้วย ECC แล้วคืนค่าเฉลี่ยของช่วงแนวตั้งที่ต่างมากสุด
+    ใช้ค่าสูงสุดรายช่วงแทนค่าเฉลี่ยทั้งภาพ: ตัวอักษรที่ต่างกัน 1 ตัวถูกเฉลี่ยทั้งป้ายแล้วเล็กกว่าการที่กล่องขยับ 1 pixel
+    """
+    if a.shape != b.shape:
+        return float("inf")
+    fa, fb = _normalized(a), _normalized(b)
+    h, w = fa.shape
+    try:
+        _, warp = cv2.findTransformECC(fa, fb, np.eye(2, 3, dtype=np.float32), cv2.MOTION_AFFINE,
+                                       _ECC_CRITERIA, None, 3)
+        if _warp_ok(warp, w, h):
+            fb = cv2.warpAffine(fb, warp, (w, h), flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP,
+                                borderMode=cv2.BORDER_REPLICATE)
+    except cv2.error:
+        pass   # จัดแนวไม่ลง (ภาพเรียบ/ต่างกันมาก) → เทียบตรงๆ
+    mx, my = THUMB_MARGIN
+    d = np.abs(fa - fb)[my:h - my, mx:w - mx]
+    return max(float(c.mean()) for c in np.array_split(d, DIFF_BLOCKS, axis=1))
+
+
+def plate_signature(img: np.ndarray) -> Tuple[int, np.ndarray]:
+    return dhash(img), thumbnail(img)
+
+
+def _signed(h: int) -> int:
+    # SQLite INTEGER เป็น signed 64 บิต
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _unsigned(h: int) -> int:
+    return h + (1 << 64) if h < 0 else h
+
+
+class OCRCache:
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE, ttl: float = OCR_CACHE_TTL,
+                 max_distance: int = OCR_CACHE_MAX_DISTANCE, max_diff: float = OCR_CACHE_MAX_DIFF,
+                 sqlite_path: str = OCR_CACHE_SQLITE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.max_diff = max_diff
+        self._lock = threading.Lock()      # กัน _mem + ตัวนับ (ไม่ถือระหว่างเทียบภาพ/อ่านเขียนดิสก์)
+        # (location, phash) -> (ts, thumbnail, result)
+        self._mem: "OrderedDict[Tuple[str, int], Tuple[float, np.ndarray, Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()   # connection เดียวใช้ร่วมระหว่าง get() กับ writer thread
+        self._writes: "queue.Queue[Tuple[str, int, bytes, str, float]]" = queue.Queue()
+        self.hits = 0
+        self.near_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.rejected = 0      # hash ใกล้แต่ thumbnail ไม่ผ่าน (น่าจะคนละป้าย)
+        self.stores = 0
+        if sqlite_path:
+            try:
+                self._db = sqlite3.connect(sqlite_path, check_same_thread=False, timeout=2.0)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                    " location TEXT NOT NULL, phash INTEGER NOT NULL, thumb BLOB NOT NULL, result TEXT NOT NULL,"
+                    " ts REAL NOT NULL,"
+                    " PRIMARY KEY (location, phash))")
+                self._db.execute("CREATE INDEX IF NOT EXISTS ocr_cache_loc_ts ON ocr_cache (location, ts)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ OCR cache sqlite disabled: {e}")
+                self._db = None
+        if self._db is not None:
+            threading.Thread(target=self._writer, name="ocr-cache-writer", daemon=True).start()
+
+    def _near(self, a: int, b: int) -> bool:
+        return bin(a ^ b).count("1") <= self.max_distance
+
+    def _same(self, a: np.ndarray, b: np.ndarray) -> bool:
+        ok = thumb_distance(a, b) <= self.max_diff
+        if not ok:
+            with self._lock:
+                self.rejected += 1
+        return ok
+
+    def get(self, location_id: Optional[str], phash: int, thumb: np.ndarray) -> Optional[Dict[str, Any]]:
+        """บล็อก (เทียบภาพ + อ่าน SQLite ถ้าเปิดไว้) ผู้เรียกจาก event loop ให้รันใน executor"""
+        loc = str(location_id or "")
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get((loc, phash))
+            exact = hit if hit and now - hit[0] <= self.ttl else None
+            # hash ไม่ตรงเป๊ะ: hash ใกล้เคียงของ location เดียวกัน (cache เล็ก สแกนตรงๆ ได้) ใหม่สุดก่อน
+            near = [(t, result) for (l, h), (ts, t, result) in reversed(self._mem.items())
+                    if l == loc and h != phash and now - ts <= self.ttl and self._near(h, phash)]
+        if exact is not None and self._same(exact[1], thumb):
+            with self._lock:
+                if (loc, phash) in self._mem:
+                    self._mem.move_to_end((loc, phash))
+                self.hits += 1
+            return dict(exact[2])
+        for t, result in near:
+            if self._same(t, thumb):
+                with self._lock:
+                    self.hits += 1
+                    self.near_hits += 1
+                return dict(result)
+        if self._db is not None:
+            found = self._db_get(loc, phash, thumb, now)
+            if found is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.db_hits += 1
+                    self._remember(loc, phash, now, thumb, found)
+                return dict(found)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _db_get(self, loc: str, phash: int, thumb: np.ndarray, now: float) -> Optional[Dict[str, Any]]:
+        try:
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT phash, thumb, result FROM ocr_cache WHERE location = ? AND ts >= ?"
+                    " ORDER BY ts DESC LIMIT 256", (loc, now - self.ttl)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ OCR cache sqlite read failed: {e}")
+            return None
+        for h, blob, result in rows:
+            if len(blob) != THUMB_SIZE[0] * THUMB_SIZE[1] or not self._near(_unsigned(h), phash):
+                continue   # แถวจาก thumbnail ขนาดเก่า
+            t = np.frombuffer(blob, dtype=np.uint8).reshape(THUMB_SIZE[1], THUMB_SIZE[0])
+            if self._same(t, thumb):
+                return json.loads(result)
+        return None
+
+    def _remember(self, loc: str, phash: int, ts: float, thumb: np.ndarray, result: Dict[str, Any]) -> None:
+        self._mem[(loc, phash)] = (ts, thumb, result)
+        self._mem.move_to_end((loc, phash))
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def put(self, location_id: Optional[str], phash: int, thumb: np.ndarray, result: Dict[str, Any]) -> None:
+        """ไม่บล็อก: เก็บใน memory ทันที ส่วน SQLite เข้าคิวให้ writer thread เขียน"""
+        loc = str(location_id or "")
+        now = time.time()
+        with self._lock:
+            self._remember(loc, phash, now, thumb, dict(result))
+            self.stores += 1
+        if self._db is not None:
+            self._writes.put((loc, _signed(phash), thumb.astype(np.uint8).tobytes(),
+                              json.dumps(result, ensure_ascii=False), now))
+
+    def _writer(self) -> None:
+        while True:
+            row = self._writes.get()
+            try:
+                with self._db_lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO ocr_cache (location, phash, thumb, result, ts) VALUES (?, ?, ?, ?, ?)",
+                        row)
+                    self._db.execute("DELETE FROM ocr_cache WHERE ts < ?", (row[4] - self.ttl,))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ OCR cache sqlite write failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    def flush(self) -> None:
+        """รอให้ writer thread เขียนทุกแถวที่ค้างลง SQLite"""
+        if self._db is not None:
+            self._writes.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._mem),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "stores": self.stores,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "ttl_s": self.ttl,
+                "sqlite": self._db is not None,
+                "pending_writes": self._writes.qsize(),
+            }
+
+
+_cache: Optional[OCRCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """None ถ้าปิด cache (OCR_CACHE_ENABLED=0)"""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
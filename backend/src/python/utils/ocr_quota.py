@@ -0,0 +1,187 @@
+# utils/ocr_quota.py - นับการใช้ OCR ภายนอก (AI4Thai) ต่อสถานที่ต่อวัน + จำกัดอัตราด้วย token bucket
+# - บันทึกทุก HTTP call ที่ยิงจริง (รวม retry / hedge): จำนวน, latency, bytes ที่ส่ง, ประเภท error
+# - token bucket (OCR_RATE_PER_SEC, OCR_BURST) + โควตารายวันรวมทั้ง key (OCR_DAILY_QUOTA, 0 = ไม่จำกัด)
+# - งานสำคัญ (PRIORITY_HIGH: รถขาเข้า) รอ token ได้สั้นๆ; งานรอง (PRIORITY_LOW: รถขาออก, OCR ซ้ำจากเฟรมสำรอง)
+#   ถูกตัดเมื่อใกล้เต็ม (เหลือ token / โควตาวันนี้ไม่ถึง OCR_LOW_PRIORITY_RESERVE) → ผู้เรียกใช้ cache / local OCR แทน
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+
+OCR_RATE_PER_SEC = float(os.getenv("OCR_RATE_PER_SEC", "0"))     # 0 = ไม่จำกัดอัตรา
+OCR_BURST = float(os.getenv("OCR_BURST", "10"))
+OCR_DAILY_QUOTA = int(os.getenv("OCR_DAILY_QUOTA", "0"))         # call ต่อวัน (ตามเวลาไทย) 0 = ไม่จำกัด
+OCR_LOW_PRIORITY_RESERVE = float(os.getenv("OCR_LOW_PRIORITY_RESERVE", "0.2"))  # สัดส่วนที่กันไว้ให้งานสำคัญ
+OCR_HIGH_PRIORITY_WAIT = float(os.getenv("OCR_HIGH_PRIORITY_WAIT", "2.0"))     # งานสำคัญรอ token ได้กี่วินาที
+
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+TH_TZ = ZoneInfo("Asia/Bangkok")
+
+
+def _today() -> str:
+    return datetime.now(TH_TZ).strftime("%Y-%m-%d")
+
+
+class TokenBucket:
+    """rate token ต่อวินาที เก็บได้สูงสุด burst; rate <= 0 = ไม่จำกัด"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+        self._ts = now
+
+    def level(self) -> float:
+        """สัดส่วน token ที่เหลือ 0-1"""
+        if self.rate <= 0:
+            return 1.0
+        with self._lock:
+            self._refill()
+            return self._tokens / self.burst
+
+    def try_take(self, min_level: float = 0.0) -> bool:
+        """หยิบ 1 token ถ้าหยิบแล้วยังเหลืออย่างน้อย min_level × burst"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens - 1.0 >= min_level * self.burst - 1e-9:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """อีกกี่วินาทีจะมี token ให้หยิบ"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (1.0 - self._tokens) / self.rate)
+
+
+def _new_usage() -> Dict[str, Any]:
+    return {"calls": 0, "bytes_sent": 0, "latency_sum_s": 0.0, "latency_max_s": 0.0,
+            "errors": {}, "throttled": 0}
+
+
+class OCRQuota:
+    def __init__(self, rate: float = OCR_RATE_PER_SEC, burst: float = OCR_BURST,
+                 daily_quota: int = OCR_DAILY_QUOTA, reserve: float = OCR_LOW_PRIORITY_RESERVE,
+                 high_wait: float = OCR_HIGH_PRIORITY_WAIT):
+        self.bucket = TokenBucket(rate, burst)
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.high_wait = high_wait
+        self._lock = threading.Lock()
+        self._day = _today()
+        self._usage: Dict[str, Dict[str, Any]] = {}   # location -> ตัวนับของวันนี้
+        self._day_calls = 0
+
+    def _roll(self) -> None:
+        day = _today()
+        if day != self._day:
+            self._day, self._usage, self._day_calls = day, {}, 0
+
+    def _loc(self, location_id: Optional[str]) -> Dict[str, Any]:
+        key = str(location_id or "unknown")
+        u = self._usage.get(key)
+        if u is None:
+            u = self._usage[key] = _new_usage()
+        return u
+
+    # ---------- accounting ----------
+    def record(self, location_id: Optional[str], latency: float, bytes_sent: int,
+               error: Optional[str] = None) -> None:
+        """บันทึก HTTP call 1 ครั้งที่ยิงไปจริง (error = ประเภท เช่น "timeout", "http_429", None = สำเร็จ)"""
+        with self._lock:
+            self._roll()
+            u = self._loc(location_id)
+            u["calls"] += 1
+            u["bytes_sent"] += bytes_sent
+            u["latency_sum_s"] += latency
+            u["latency_max_s"] = max(u["latency_max_s"], latency)
+            if error:
+                u["errors"][error] = u["errors"].get(error, 0) + 1
+            self._day_calls += 1
+
+    def _throttled(self, location_id: Optional[str]) -> None:
+        with self._lock:
+            self._roll()
+            self._loc(location_id)["throttled"] += 1
+
+    # ---------- scheduling ----------
+    def _quota_left(self) -> float:
+        """สัดส่วนโควตาวันนี้ที่เหลือ 0-1"""
+        if self.daily_quota <= 0:
+            return 1.0
+        with self._lock:
+            self._roll()
+            return max(0.0, 1.0 - self._day_calls / self.daily_quota)
+
+    def near_quota(self) -> bool:
+        return self._quota_left() <= self.reserve or self.bucket.level() <= self.reserve
+
+    async def acquire(self, location_id: Optional[str], priority: str = PRIORITY_HIGH) -> bool:
+        """
+        True = ยิง OCR ภายนอกได้; False = ให้ใช้ cache / local แทน
+        งานรองต้องเหลือ token/โควตาเกิน reserve; งานสำคัญใช้ได้จนหมด และรอ token ได้ไม่เกิน high_wait วินาที
+        """
+        left = self._quota_left()
+        if left <= 0.0 or (priority != PRIORITY_HIGH and left <= self.reserve):
+            self._throttled(location_id)
+            return False
+        if priority != PRIORITY_HIGH:
+            ok = self.bucket.try_take(min_level=self.reserve)
+        else:
+            deadline = time.monotonic() + self.high_wait
+            ok = self.bucket.try_take()
+            while not ok and time.monotonic() < deadline:
+                await asyncio.sleep(min(self.bucket.wait_time() + 0.01, max(0.0, deadline - time.monotonic())))
+                ok = self.bucket.try_take()
+        if not ok:
+            self._throttled(location_id)
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        left, near = self._quota_left(), self.near_quota()
+        with self._lock:
+            self._roll()
+            locations = {}
+            for loc, u in self._usage.items():
+                locations[loc] = {**u, "errors": dict(u["errors"]),
+                                  "latency_avg_s": round(u["latency_sum_s"] / u["calls"], 3) if u["calls"] else 0.0,
+                                  "latency_sum_s": round(u["latency_sum_s"], 3),
+                                  "latency_max_s": round(u["latency_max_s"], 3)}
+            return {
+                "day": self._day,
+                "calls_today": self._day_calls,
+                "daily_quota": self.daily_quota or None,
+                "quota_left": round(left, 4),
+                "rate_per_sec": self.bucket.rate or None,
+                "bucket_level": round(self.bucket.level(), 4),
+                "near_quota": near,
+                "locations": locations,
+            }
+
+
+_quota: Optional[OCRQuota] = None
+_quota_lock = threading.Lock()
+
+
+def get_ocr_quota() -> OCRQuota:
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            _quota = OCRQuota()
+        return _quota
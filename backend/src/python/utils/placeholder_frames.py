@@ -0,0 +1,33 @@
+# utils/placeholder_frames.py - ภาพแทนเฟรมกล้อง (ยังไม่พร้อม / ภาพค้าง / ปิดอยู่) render ครั้งเดียวต่อ (กล้อง, สถานะ) แล้ว cache
+# /frame_raw ถูก poll ถี่ที่สุดตอนกล้องมีปัญหา ถ้า render + encode ทุก request จะกิน CPU ตามจำนวน client
+import hashlib
+from functools import lru_cache
+from typing import Tuple
+import cv2
+import numpy as np
+
+STATE_STARTING = "starting"
+STATE_STALLED = "stalled"
+STATE_STOPPED = "stopped"
+
+_TEXT = {
+    STATE_STARTING: ("STARTING... CAM {cam}", (0, 200, 255)),
+    STATE_STALLED: ("NO SIGNAL - CAM {cam}", (0, 0, 255)),
+    STATE_STOPPED: ("CAMERA STOPPED - CAM {cam}", (160, 160, 160)),
+}
+
+# client ควรรอกี่วินาทีก่อนขอใหม่ (ส่งเป็น Retry-After)
+RETRY_AFTER = {STATE_STARTING: 1, STATE_STALLED: 2, STATE_STOPPED: 5}
+
+
+@lru_cache(maxsize=256)
+def placeholder_jpeg(cam_id: int, state: str, width: int = 640, height: int = 480) -> Tuple[bytes, str]:
+    """คืน (jpeg_bytes, etag) ของภาพแทนเฟรม (etag ไม่มีเครื่องหมายคำพูด)"""
+    text, color = _TEXT.get(state, ("WAITING... CAM {cam}", (0, 0, 255)))
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.putText(img, text.format(cam=cam_id), (50, height // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+    data = buf.tobytes() if ok else b""
+    etag = "ph-" + hashlib.sha1(data).hexdigest()[:16]
+    return data, etag
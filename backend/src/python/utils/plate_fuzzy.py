@@ -0,0 +1,102 @@
+# utils/plate_fuzzy.py - จับคู่เลขทะเบียนแบบทนตัวอักษรที่ OCR อ่านเพี้ยน (ข/ฆ, 0/O, ม/น ...)
+# - ดัชนีแบบ deletion-neighborhood (แนว SymSpell): เก็บทุกสตริงที่ได้จากการลบตัวอักษรไม่เกิน max_edits ตัว
+#   ป้ายที่ห่างกันไม่เกิน max_edits ครั้ง (แทน/เพิ่ม/ลบ) จะมีคีย์ร่วมกันอย่างน้อยหนึ่งคีย์ → ได้ผู้สมัครโดยไม่ต้องสแกนทั้งหมด
+# - ผู้สมัครถูกจัดอันดับด้วย edit distance แบบถ่วงน้ำหนัก: คู่ตัวอักษรที่ OCR สับสนบ่อยมีราคาถูก, ตัวอื่นราคา 1
+# ป้ายหนึ่งยาวไม่เกิน ~8 ตัว → คีย์ต่อป้ายไม่กี่สิบ, ค้นหนึ่งครั้งใช้เวลาระดับไมโครวินาที
+from itertools import combinations
+from typing import Dict, Iterable, List, Set, Tuple
+
+# คู่ที่ OCR อ่านสลับกันบ่อย (สมมาตร) → ราคาการแทน
+_CONFUSIONS: List[Tuple[str, str, float]] = [
+    # พยัญชนะไทยที่หน้าตาคล้ายกัน
+    ("ข", "ฆ", 0.3), ("ข", "ช", 0.4), ("ช", "ซ", 0.3), ("ฆ", "ม", 0.5),
+    ("ม", "น", 0.4), ("ม", "ห", 0.5), ("น", "ห", 0.5), ("บ", "ป", 0.3),
+    ("บ", "ษ", 0.5), ("ผ", "ฝ", 0.3), ("พ", "ฟ", 0.3), ("พ", "ฬ", 0.4),
+    ("ค", "ด", 0.4), ("ค", "ต", 0.4), ("ด", "ต", 0.3), ("ค", "ศ", 0.4),
+    ("ถ", "ภ", 0.3), ("ถ", "ฤ", 0.5), ("ร", "ธ", 0.4), ("ร", "ว", 0.5),
+    ("ท", "ฑ", 0.4), ("ท", "ห", 0.5), ("ฎ", "ฏ", 0.3), ("ฎ", "ฐ", 0.5),
+    ("อ", "ฮ", 0.3), ("อ", "ฉ", 0.5), ("ล", "ส", 0.5), ("ส", "ศ", 0.4),
+    ("ก", "ถ", 0.5), ("ย", "ษ", 0.5), ("ณ", "ฌ", 0.4), ("ญ", "ฌ", 0.4),
+    # ตัวเลข
+    ("1", "7", 0.4), ("3", "8", 0.4), ("6", "8", 0.4), ("0", "8", 0.5),
+    ("5", "6", 0.5), ("8", "9", 0.5), ("4", "9", 0.5),
+    # ตัวเลข ↔ ตัวอักษรละติน (OCR บางตัวคืนละติน; normalize_lp ทำเป็นตัวใหญ่แล้ว)
+    ("0", "O", 0.2), ("0", "D", 0.4), ("1", "I", 0.2), ("1", "L", 0.4),
+    ("2", "Z", 0.3), ("5", "S", 0.3), ("6", "G", 0.4), ("8", "B", 0.3),
+]
+SUB_COST: Dict[Tuple[str, str], float] = {}
+for _a, _b, _c in _CONFUSIONS:
+    SUB_COST[(_a, _b)] = SUB_COST[(_b, _a)] = _c
+INDEL_COST = 1.0
+
+
+def plate_distance(a: str, b: str, limit: float = float("inf")) -> float:
+    """Levenshtein ถ่วงน้ำหนักด้วย SUB_COST (เกิน limit เมื่อไหร่หยุดคืน inf)"""
+    if a == b:
+        return 0.0
+    prev = [j * INDEL_COST for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [i * INDEL_COST]
+        for j, cb in enumerate(b, 1):
+            sub = 0.0 if ca == cb else SUB_COST.get((ca, cb), 1.0)
+            cur.append(min(prev[j - 1] + sub, prev[j] + INDEL_COST, cur[j - 1] + INDEL_COST))
+        if min(cur) > limit:
+            return float("inf")
+        prev = cur
+    return prev[-1]
+
+
+def _deletes(s: str, max_edits: int) -> Set[str]:
+    out = {s}
+    for k in range(1, min(max_edits, len(s)) + 1):
+        for idx in combinations(range(len(s)), k):
+            out.add("".join(c for i, c in enumerate(s) if i not in idx))
+    return out
+
+
+class FuzzyPlateIndex:
+    """ดัชนีเลขทะเบียน (ที่ normalize แล้ว) ของสถานที่หนึ่ง; add/discard ได้ทีละป้าย"""
+
+    def __init__(self, plates: Iterable[str] = (), max_edits: int = 2):
+        self.max_edits = max_edits
+        self._keys: Dict[str, Set[str]] = {}
+        self._plates: Set[str] = set()
+        for p in plates:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def add(self, plate: str) -> None:
+        if not plate or plate in self._plates:
+            return
+        self._plates.add(plate)
+        for k in _deletes(plate, self.max_edits):
+            self._keys.setdefault(k, set()).add(plate)
+
+    def discard(self, plate: str) -> None:
+        if plate not in self._plates:
+            return
+        self._plates.discard(plate)
+        for k in _deletes(plate, self.max_edits):
+            bucket = self._keys.get(k)
+            if bucket is not None:
+                bucket.discard(plate)
+                if not bucket:
+                    del self._keys[k]
+
+    def candidates(self, query: str, max_cost: float) -> List[Tuple[str, float]]:
+        """[(plate, cost)] ที่ราคาไม่เกิน max_cost เรียงจากใกล้สุด (ไม่รวมตัวที่ตรงเป๊ะ)"""
+        if not query:
+            return []
+        seen: Set[str] = set()
+        for k in _deletes(query, self.max_edits):
+            seen.update(self._keys.get(k, ()))
+        seen.discard(query)
+        out = []
+        for p in seen:
+            cost = plate_distance(query, p, max_cost)
+            if cost <= max_cost:
+                out.append((p, cost))
+        out.sort(key=lambda x: (x[1], x[0]))
+        return out
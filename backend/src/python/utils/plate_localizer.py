@@ -0,0 +1,136 @@
+# utils/plate_localizer.py - หาตำแหน่งป้ายทะเบียนด้วยโมเดล YOLO ขนาดเล็ก (local) แล้วตัดเฉพาะส่วนป้ายเป็น JPEG
+# ใช้ก่อนส่ง OCR: ภาพที่ส่งเล็กลงมาก (upload เร็วขึ้น, ฝั่ง API ประมวลผลเร็วขึ้น) และเฟรมที่มีรถหลายคันได้ OCR แยกป้าย
+# ไม่ตั้ง PLATE_MODEL_PATH หรือไม่มี ultralytics = ปิดใช้งาน (ผู้เรียกส่งทั้งเฟรมเหมือนเดิม)
+import os
+import threading
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+from .ocr_cache import plate_signature
+
+logger = logging.getLogger(__name__)
+
+PLATE_MODEL_PATH = os.getenv("PLATE_MODEL_PATH", "")
+PLATE_CONF = float(os.getenv("PLATE_CONF", "0.35"))
+PLATE_IMGSZ = int(os.getenv("PLATE_IMGSZ", "640"))
+PLATE_PAD = float(os.getenv("PLATE_PAD", "0.12"))            # ขยายกรอบออกไปกี่เท่าของขนาดป้าย (กันตัวอักษรขอบโดนตัด)
+PLATE_CROP_WIDTH = int(os.getenv("PLATE_CROP_WIDTH", "320"))  # ย่อ/ขยาย crop ให้กว้างเท่านี้ก่อน encode
+PLATE_JPEG_QUALITY = int(os.getenv("PLATE_JPEG_QUALITY", "90"))
+PLATE_MAX = int(os.getenv("PLATE_MAX", "4"))                  # OCR ไม่เกินกี่ป้ายต่อเฟรม
+
+
+@dataclass
+class PlateCrop:
+    box: Tuple[int, int, int, int]   # xyxy ในพิกัดเฟรมเดิม (รวม padding แล้ว)
+    conf: float
+    jpeg: bytes
+    phash: int = 0                   # dHash ของ crop (key ของ OCR cache)
+    thumb: Optional[np.ndarray] = None   # thumbnail ยืนยันว่าเป็นภาพเดียวกันก่อนใช้ผลจาก cache
+
+
+class PlateLocalizer:
+    def __init__(self, model_path: str = PLATE_MODEL_PATH, conf: float = PLATE_CONF):
+        self.model_path = model_path
+        self.conf = conf
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return self._get_model() is not None
+
+    def _get_model(self):
+        if self._model is not None or self._failed:
+            return self._model
+        with self._lock:
+            if self._model is None and not self._failed:
+                if not self.model_path or not os.path.exists(self.model_path):
+                    self._failed = True
+                    if self.model_path:
+                        logger.warning(f"⚠️ plate model not found: {self.model_path} (OCR ทั้งเฟรม)")
+                    return None
+                try:
+                    from ultralytics import YOLO
+                    self._model = YOLO(self.model_path)
+                    print(f"✅ Plate model loaded: {self.model_path}")
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"⚠️ plate model load failed: {e} (OCR ทั้งเฟรม)")
+        return self._model
+
+    def detect(self, img: np.ndarray) -> List[Tuple[List[float], float]]:
+        """[(xyxy, conf)] ของป้ายที่เจอ เรียงจากมั่นใจมากไปน้อย"""
+        model = self._get_model()
+        if model is None or img is None:
+            return []
+        with self._lock:   # model ของ ultralytics ไม่ thread-safe
+            results = model.predict(img, conf=self.conf, imgsz=PLATE_IMGSZ, verbose=False)
+        out = []
+        for r in results or []:
+            for b in r.boxes:
+                out.append((b.xyxy[0].tolist(), float(b.conf[0].item())))
+        out.sort(key=lambda x: -x[1])
+        return out
+
+    def crops(self, img: np.ndarray, max_plates: int = PLATE_MAX,
+              within: Optional[Tuple[float, float, float, float]] = None) -> List[PlateCrop]:
+        """
+        ตัดป้ายที่เจอเป็น JPEG (มั่นใจมากสุดก่อน ไม่เกิน max_plates ป้าย)
+        within: กล่องรถ xyxy → เอาเฉพาะป้ายที่จุดกลางอยู่ในกล่อง 1 ป้าย (ใหญ่สุด เสมอกันเอาที่ใกล้กลางรถสุด)
+        กันไม่ให้อ่านป้ายของคันอื่นที่อยู่ในเฟรมเดียวกัน
+        """
+        h, w = img.shape[:2]
+        found = self.detect(img)
+        if within is not None:
+            found = pick_plate_in_box(found, within)
+        crops: List[PlateCrop] = []
+        for (x1, y1, x2, y2), conf in found[:max_plates]:
+            pw, ph = x2 - x1, y2 - y1
+            if pw < 4 or ph < 2:
+                continue
+            px, py = pw * PLATE_PAD, ph * PLATE_PAD
+            bx1, by1 = max(0, int(x1 - px)), max(0, int(y1 - py))
+            bx2, by2 = min(w, int(x2 + px)), min(h, int(y2 + py))
+            roi = img[by1:by2, bx1:bx2]
+            if roi.size == 0:
+                continue
+            if PLATE_CROP_WIDTH > 0 and roi.shape[1] != PLATE_CROP_WIDTH:
+                scale = PLATE_CROP_WIDTH / float(roi.shape[1])
+                interp = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+                roi = cv2.resize(roi, (PLATE_CROP_WIDTH, max(1, int(roi.shape[0] * scale))), interpolation=interp)
+            ok, buf = cv2.imencode(".jpg", roi, [int(cv2.IMWRITE_JPEG_QUALITY), PLATE_JPEG_QUALITY])
+            if ok:
+                crops.append(PlateCrop((bx1, by1, bx2, by2), conf, buf.tobytes(), *plate_signature(roi)))
+        return crops
+
+
+def pick_plate_in_box(plates: List[Tuple[List[float], float]],
+                      box: Tuple[float, float, float, float]) -> List[Tuple[List[float], float]]:
+    """จาก [(xyxy, conf)] เลือกป้ายของรถคันที่อยู่ในกล่อง box: จุดกลางป้ายอยู่ในกล่อง → ใหญ่สุด → ใกล้กลางกล่องสุด (คืน 0-1 ป้าย)"""
+    bx1, by1, bx2, by2 = box
+    mx, my = (bx1 + bx2) / 2, (by1 + by2) / 2
+    inside = []
+    for xyxy, conf in plates:
+        x1, y1, x2, y2 = xyxy
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        if bx1 <= cx <= bx2 and by1 <= cy <= by2:
+            area = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+            inside.append((-area, (cx - mx) ** 2 + (cy - my) ** 2, xyxy, conf))
+    if not inside:
+        return []
+    best = min(inside, key=lambda t: (t[0], t[1]))
+    return [(best[2], best[3])]
+
+
+_localizer: Optional[PlateLocalizer] = None
+_localizer_lock = threading.Lock()
+
+
+def get_plate_localizer() -> PlateLocalizer:
+    global _localizer
+    with _localizer_lock:
+        if _localizer is None:
+            _localizer = PlateLocalizer()
+        return _localizer
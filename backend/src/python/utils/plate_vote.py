@@ -0,0 +1,64 @@
+# utils/plate_vote.py - รวมผล OCR ของป้ายเดียวกันจากหลายเฟรมด้วยการโหวตทีละตัวอักษร (ถ่วงน้ำหนักด้วย conf)
+# เฟรมหนึ่งอ่าน "1ขข1234" อีกเฟรมอ่าน "1ฆข1234" อีกเฟรม "1ขข1284" → ได้ "1ขข1234"
+# - โหวตเฉพาะผลที่ความยาวเท่ากัน (เลือกกลุ่มความยาวที่น้ำหนักรวมมากสุด) ไม่พยายาม align ตัวอักษรที่หาย/เกิน
+# - จังหวัดโหวตแยกตามรหัสจังหวัด (ป้ายหลายเฟรมอาจอ่านจังหวัดได้บ้างไม่ได้บ้าง)
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from .thai_provinces import province_code
+
+
+def _weight(read: Dict[str, Any]) -> float:
+    try:
+        return max(float(read.get("conf") or 0.0), 1.0)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def vote_plates(reads: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    reads: ผล OCR (dict แบบ AI4Thai) ที่อ่านป้ายได้ของรถคันเดียวกัน
+    คืน dict ของผลที่มั่นใจสุดในกลุ่ม โดยแทน lp_number/conf ด้วยผลโหวต + ocr_votes (จำนวนเฟรมที่ใช้โหวต)
+    """
+    if not reads:
+        return None
+    if len(reads) == 1:
+        return dict(reads[0])
+
+    by_len: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for r in reads:
+        by_len[len("".join((r.get("lp_number") or "").split()))].append(r)
+    group = max(by_len.values(), key=lambda g: sum(_weight(r) for r in g))
+    group = sorted(group, key=_weight, reverse=True)   # เสมอกัน → เชื่อเฟรมที่มั่นใจกว่า
+
+    chars, shares = [], []
+    total = sum(_weight(r) for r in group)
+    plates = ["".join(r["lp_number"].split()) for r in group]
+    for i in range(len(plates[0])):
+        votes: Dict[str, float] = {}
+        for p, r in zip(plates, group):
+            votes[p[i]] = votes.get(p[i], 0.0) + _weight(r)
+        ch = max(votes, key=votes.get)     # dict เก็บลำดับที่เจอก่อน → เสมอกันได้ตัวของเฟรมที่มั่นใจกว่า
+        chars.append(ch)
+        shares.append(votes[ch] / total)
+    fused = "".join(chars)
+
+    prov_votes: Dict[str, float] = {}
+    prov_raw: Dict[str, str] = {}
+    for r in sorted(reads, key=_weight, reverse=True):
+        raw = r.get("province")
+        code = province_code(raw) or (raw or "").strip()
+        if code:
+            prov_votes[code] = prov_votes.get(code, 0.0) + _weight(r)
+            prov_raw.setdefault(code, raw)
+
+    base = next((r for r, p in zip(group, plates) if p == fused), group[0])
+    result = dict(base)
+    result["lp_number"] = fused
+    # ความมั่นใจของผลรวม = conf ของเฟรมที่ดีสุด × สัดส่วนเสียงโหวตเฉลี่ย (เฟรมเห็นตรงกันหมด = conf เดิม)
+    result["conf"] = round(_weight(group[0]) * sum(shares) / len(shares), 2)
+    if prov_votes:
+        result["province"] = prov_raw[max(prov_votes, key=prov_votes.get)]
+    result["ocr_votes"] = len(group)
+    if all(p != fused for p in plates):
+        result["ocr_fused"] = True
+    return result
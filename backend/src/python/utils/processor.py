@@ -1,18 +1,25 @@
 # utils/processor.py - Connect supabase client, call OCR service from AI for Thai, insert OCR data into supabase
 from typing import Dict, Any
 from ..db.supabase_client import get_supabase_client
+from .thai_provinces import parse_province
 
 def insert_detection_payload(payload: Dict[str, Any]):
     direction = (payload.get("direction") or "in").lower()
     if direction not in ("in", "out"):
         direction = "in"
 
+    # จังหวัด: แปลงครั้งเดียวตอนบันทึก เก็บรหัสมาตรฐาน + ชื่อไทย ไว้คู่กับค่าดิบจาก OCR
+    plate = dict(payload.get("detected_plate") or {})
+    prov = parse_province(plate.get("province"))
+    if prov:
+        plate["province_code"], plate["province_th"] = prov[0], prov[2]
+
     # สร้าง payload 
     row = {
         "location_id": payload["location_id"],
         "model_id": payload["model_id"],
         "image_path": payload.get("image_path") or [],          
-        "detected_plate": payload.get("detected_plate") or {}, 
+        "detected_plate": plate, 
         "direction": direction,
         "is_sticker": bool(payload.get("is_sticker", False)) 
     }
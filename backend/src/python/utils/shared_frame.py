@@ -0,0 +1,99 @@
+# utils/shared_frame.py - ช่องเฟรมล่าสุดใน shared memory ต่อกล้อง (engine process เขียน, API process อ่าน) ไม่ต้อง pickle ภาพข้าม process
+# layout: [header 64 bytes][BGR pixels]
+#   header: seq (u64, เลขคี่ = กำลังเขียน), ts (f64), demand_ts (f64 ฝั่งผู้อ่านเขียน), h, w, c (u32)
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+import numpy as np
+
+HEADER_SIZE = 64
+_SEQ = struct.Struct("<Q")          # offset 0
+_TS = struct.Struct("<d")           # offset 8
+_DEMAND = struct.Struct("<d")       # offset 16
+_SHAPE = struct.Struct("<III")      # offset 24
+
+DEFAULT_MAX_FRAME_BYTES = 1920 * 1080 * 3
+
+
+class SharedFrameSlot:
+    """
+    seqlock แบบผู้เขียนคนเดียว: writer ตั้ง seq เป็นคี่ก่อนเขียน แล้วเป็นคู่เมื่อเสร็จ
+    reader อ่าน seq ก่อน/หลัง copy ถ้าไม่ตรงกันหรือเป็นคี่ = เฟรมฉีก อ่านใหม่
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self.capacity = shm.size - HEADER_SIZE
+
+    @classmethod
+    def create(cls, max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES) -> "SharedFrameSlot":
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + max_frame_bytes)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameSlot":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    # ---------- writer (engine) ----------
+    def write(self, frame: np.ndarray, ts: float) -> bool:
+        if frame.dtype != np.uint8 or frame.nbytes > self.capacity:
+            return False
+        buf = self._shm.buf
+        seq = _SEQ.unpack_from(buf, 0)[0]
+        _SEQ.pack_into(buf, 0, seq + 1)                       # คี่ = กำลังเขียน
+        h, w = frame.shape[:2]
+        c = frame.shape[2] if frame.ndim == 3 else 1
+        _TS.pack_into(buf, 8, ts)
+        _SHAPE.pack_into(buf, 24, h, w, c)
+        dst = np.ndarray(frame.shape, dtype=np.uint8, buffer=buf, offset=HEADER_SIZE)
+        np.copyto(dst, frame)
+        _SEQ.pack_into(buf, 0, seq + 2)                       # คู่ = เสร็จแล้ว
+        return True
+
+    def demand_age(self) -> float:
+        """กี่วินาทีแล้วที่ไม่มีใครขอเฟรม (writer ใช้ตัดสินว่าต้อง copy ลง shared memory ไหม)"""
+        return time.time() - _DEMAND.unpack_from(self._shm.buf, 16)[0]
+
+    # ---------- reader (API) ----------
+    def touch_demand(self) -> None:
+        _DEMAND.pack_into(self._shm.buf, 16, time.time())
+
+    def header(self) -> Tuple[int, float]:
+        """(seq, ts) ของเฟรมล่าสุด (seq ปัดเป็นเฟรมที่เขียนเสร็จแล้ว; 0 = ยังไม่มีเฟรม)"""
+        buf = self._shm.buf
+        seq = _SEQ.unpack_from(buf, 0)[0]
+        return seq - (seq & 1), _TS.unpack_from(buf, 8)[0]
+
+    def read(self, retries: int = 3) -> Optional[Tuple[int, float, np.ndarray]]:
+        buf = self._shm.buf
+        for _ in range(retries):
+            seq1 = _SEQ.unpack_from(buf, 0)[0]
+            if seq1 == 0:
+                return None
+            if seq1 & 1:
+                time.sleep(0.001); continue
+            ts = _TS.unpack_from(buf, 8)[0]
+            h, w, c = _SHAPE.unpack_from(buf, 24)
+            shape = (h, w, c) if c > 1 else (h, w)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=HEADER_SIZE).copy()
+            if _SEQ.unpack_from(buf, 0)[0] == seq1:
+                return seq1, ts, frame
+        return None
+
+    def close(self) -> None:
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # ยังมี view ค้างอยู่ ปล่อยให้ GC ปิดเอง
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
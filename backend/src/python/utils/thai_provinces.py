@@ -0,0 +1,156 @@
+# utils/thai_provinces.py - รายชื่อจังหวัดบนป้ายทะเบียน (รหัส ISO 3166-2:TH, ชื่ออังกฤษ, ชื่อไทย)
+# รูปแบบเดียวกับที่ AI4Thai คืนใน field "province" เช่น "th-10:Bangkok (กรุงเทพมหานคร)"
+# parse_province() แปลงข้อความจังหวัดรูปแบบใดก็ได้ (label ของ AI4Thai, รหัส ISO, ชื่อไทย/อังกฤษ) เป็นรหัสมาตรฐาน
+# ใช้ตอนบันทึก detection ครั้งเดียว แล้วทั้งการตรวจทะเบียนและหน้าแสดงผลใช้รหัส/ชื่อที่ได้ ไม่ต้องตัดสตริงซ้ำทุกแถว
+import difflib
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+PROVINCES: List[Tuple[str, str, str]] = [
+    ("TH-10", "Bangkok", "กรุงเทพมหานคร"),
+    ("TH-11", "Samut Prakan", "สมุทรปราการ"),
+    ("TH-12", "Nonthaburi", "นนทบุรี"),
+    ("TH-13", "Pathum Thani", "ปทุมธานี"),
+    ("TH-14", "Phra Nakhon Si Ayutthaya", "พระนครศรีอยุธยา"),
+    ("TH-15", "Ang Thong", "อ่างทอง"),
+    ("TH-16", "Lop Buri", "ลพบุรี"),
+    ("TH-17", "Sing Buri", "สิงห์บุรี"),
+    ("TH-18", "Chai Nat", "ชัยนาท"),
+    ("TH-19", "Saraburi", "สระบุรี"),
+    ("TH-20", "Chon Buri", "ชลบุรี"),
+    ("TH-21", "Rayong", "ระยอง"),
+    ("TH-22", "Chanthaburi", "จันทบุรี"),
+    ("TH-23", "Trat", "ตราด"),
+    ("TH-24", "Chachoengsao", "ฉะเชิงเทรา"),
+    ("TH-25", "Prachin Buri", "ปราจีนบุรี"),
+    ("TH-26", "Nakhon Nayok", "นครนายก"),
+    ("TH-27", "Sa Kaeo", "สระแก้ว"),
+    ("TH-30", "Nakhon Ratchasima", "นครราชสีมา"),
+    ("TH-31", "Buri Ram", "บุรีรัมย์"),
+    ("TH-32", "Surin", "สุรินทร์"),
+    ("TH-33", "Si Sa Ket", "ศรีสะเกษ"),
+    ("TH-34", "Ubon Ratchathani", "อุบลราชธานี"),
+    ("TH-35", "Yasothon", "ยโสธร"),
+    ("TH-36", "Chaiyaphum", "ชัยภูมิ"),
+    ("TH-37", "Amnat Charoen", "อำนาจเจริญ"),
+    ("TH-38", "Bueng Kan", "บึงกาฬ"),
+    ("TH-39", "Nong Bua Lam Phu", "หนองบัวลำภู"),
+    ("TH-40", "Khon Kaen", "ขอนแก่น"),
+    ("TH-41", "Udon Thani", "อุดรธานี"),
+    ("TH-42", "Loei", "เลย"),
+    ("TH-43", "Nong Khai", "หนองคาย"),
+    ("TH-44", "Maha Sarakham", "มหาสารคาม"),
+    ("TH-45", "Roi Et", "ร้อยเอ็ด"),
+    ("TH-46", "Kalasin", "กาฬสินธุ์"),
+    ("TH-47", "Sakon Nakhon", "สกลนคร"),
+    ("TH-48", "Nakhon Phanom", "นครพนม"),
+    ("TH-49", "Mukdahan", "มุกดาหาร"),
+    ("TH-50", "Chiang Mai", "เชียงใหม่"),
+    ("TH-51", "Lamphun", "ลำพูน"),
+    ("TH-52", "Lampang", "ลำปาง"),
+    ("TH-53", "Uttaradit", "อุตรดิตถ์"),
+    ("TH-54", "Phrae", "แพร่"),
+    ("TH-55", "Nan", "น่าน"),
+    ("TH-56", "Phayao", "พะเยา"),
+    ("TH-57", "Chiang Rai", "เชียงราย"),
+    ("TH-58", "Mae Hong Son", "แม่ฮ่องสอน"),
+    ("TH-60", "Nakhon Sawan", "นครสวรรค์"),
+    ("TH-61", "Uthai Thani", "อุทัยธานี"),
+    ("TH-62", "Kamphaeng Phet", "กำแพงเพชร"),
+    ("TH-63", "Tak", "ตาก"),
+    ("TH-64", "Sukhothai", "สุโขทัย"),
+    ("TH-65", "Phitsanulok", "พิษณุโลก"),
+    ("TH-66", "Phichit", "พิจิตร"),
+    ("TH-67", "Phetchabun", "เพชรบูรณ์"),
+    ("TH-70", "Ratchaburi", "ราชบุรี"),
+    ("TH-71", "Kanchanaburi", "กาญจนบุรี"),
+    ("TH-72", "Suphan Buri", "สุพรรณบุรี"),
+    ("TH-73", "Nakhon Pathom", "นครปฐม"),
+    ("TH-74", "Samut Sakhon", "สมุทรสาคร"),
+    ("TH-75", "Samut Songkhram", "สมุทรสงคราม"),
+    ("TH-76", "Phetchaburi", "เพชรบุรี"),
+    ("TH-77", "Prachuap Khiri Khan", "ประจวบคีรีขันธ์"),
+    ("TH-80", "Nakhon Si Thammarat", "นครศรีธรรมราช"),
+    ("TH-81", "Krabi", "กระบี่"),
+    ("TH-82", "Phangnga", "พังงา"),
+    ("TH-83", "Phuket", "ภูเก็ต"),
+    ("TH-84", "Surat Thani", "สุราษฎร์ธานี"),
+    ("TH-85", "Ranong", "ระนอง"),
+    ("TH-86", "Chumphon", "ชุมพร"),
+    ("TH-90", "Songkhla", "สงขลา"),
+    ("TH-91", "Satun", "สตูล"),
+    ("TH-92", "Trang", "ตรัง"),
+    ("TH-93", "Phatthalung", "พัทลุง"),
+    ("TH-94", "Pattani", "ปัตตานี"),
+    ("TH-95", "Yala", "ยะลา"),
+    ("TH-96", "Narathiwat", "นราธิวาส"),
+]
+
+_BY_THAI: Dict[str, Tuple[str, str, str]] = {p[2]: p for p in PROVINCES}
+_BY_CODE: Dict[str, Tuple[str, str, str]] = {p[0]: p for p in PROVINCES}
+_BY_ENGLISH: Dict[str, Tuple[str, str, str]] = {"".join(p[1].lower().split()): p for p in PROVINCES}
+_BY_ENGLISH.update({"bangkokmetropolis": _BY_CODE["TH-10"], "krungthepmahanakhon": _BY_CODE["TH-10"],
+                    "phangnga": _BY_CODE["TH-82"], "phang-nga": _BY_CODE["TH-82"]})
+_BY_THAI.update({"กรุงเทพฯ": _BY_CODE["TH-10"], "กทม": _BY_CODE["TH-10"], "กทม.": _BY_CODE["TH-10"],
+                 "กรุงเทพ": _BY_CODE["TH-10"]})
+
+# "th-10:Bangkok (กรุงเทพมหานคร)" / "TH-10" / "th-10:Bangkok"
+_LABEL_RE = re.compile(r"^\s*(th-\d{2})\s*(?::\s*([^()]*?))?\s*(?:\((.*?)\))?\s*$", re.IGNORECASE)
+_THAI_PREFIX_RE = re.compile(r"^(?:จังหวัด|จ\.)")
+
+
+def ai4thai_label(code: str, english: str, thai: str) -> str:
+    """รูปแบบเดียวกับ field province ของ AI4Thai: "th-10:Bangkok (กรุงเทพมหานคร)" """
+    return f"{code.lower()}:{english} ({thai})"
+
+
+def match_thai_province(text: str, cutoff: float = 0.6) -> Optional[Tuple[str, str, str]]:
+    """หา (code, english, thai) ที่ใกล้กับข้อความภาษาไทยที่ OCR อ่านได้ (ตัวอักษรเพี้ยนได้บ้าง)"""
+    t = "".join((text or "").split())
+    if not t:
+        return None
+    if t in _BY_THAI:
+        return _BY_THAI[t]
+    for p in PROVINCES:
+        if p[2] in t:
+            return p
+    close = difflib.get_close_matches(t, list(_BY_THAI), n=1, cutoff=cutoff)
+    return _BY_THAI[close[0]] if close else None
+
+
+@lru_cache(maxsize=1024)
+def parse_province(raw: Optional[str]) -> Optional[Tuple[str, str, str]]:
+    """ข้อความจังหวัดรูปแบบใดก็ได้ → (code, english, thai) หรือ None ถ้าไม่รู้จัก (ค่าที่เจอซ้ำถูก cache)"""
+    text = (raw or "").strip()
+    if not text:
+        return None
+    m = _LABEL_RE.match(text)
+    if m:
+        found = _BY_CODE.get(m.group(1).upper())
+        if found:
+            return found
+    compact = "".join(text.split())
+    english = _BY_ENGLISH.get(compact.lower())
+    if english:
+        return english
+    if m and m.group(3):    # รหัสไม่รู้จักแต่มีชื่อไทยในวงเล็บ
+        compact = "".join(m.group(3).split())
+    thai = _THAI_PREFIX_RE.sub("", compact)
+    if thai in _BY_THAI:
+        return _BY_THAI[thai]
+    if re.search(r"[ก-๙]", thai):
+        return match_thai_province(thai)
+    return None
+
+
+def province_code(raw: Optional[str]) -> Optional[str]:
+    """รหัส ISO เช่น "TH-10" (ใช้เทียบ/เก็บ)"""
+    p = parse_province(raw)
+    return p[0] if p else None
+
+
+def province_thai(raw: Optional[str]) -> Optional[str]:
+    """ชื่อไทยเต็ม เช่น "กรุงเทพมหานคร" (ใช้แสดงผล)"""
+    p = parse_province(raw)
+    return p[2] if p else None
@@ -0,0 +1,80 @@
+# utils/tripwire.py - เส้น tripwire เสมือนต่อกล้อง ใช้หา direction (in/out) จากเส้นทางของรถที่ track ได้
+# ตาราง camera_tripwires (schema: supabase/migrations/20261019120000_camera_tripwires.sql):
+#   location_id, camera_index (int), x1, y1, x2, y2 (0..1 สัดส่วนของภาพ), in_side ("left" | "right"), is_active
+#   in_side = ฝั่งของเส้นเมื่อมองจาก (x1,y1) ไป (x2,y2) ที่ถือว่า "เข้า" — รถข้ามไปฝั่งนั้น = in, ข้ามกลับ = out
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from ..db.supabase_client import get_supabase_client
+
+Point = Tuple[float, float]
+
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+@dataclass(frozen=True)
+class Tripwire:
+    p1: Point
+    p2: Point
+    in_side: int = 1  # +1 = ฝั่งขวา (ภาพแกน y ชี้ลง), -1 = ฝั่งซ้าย
+
+    def side(self, p: Point) -> float:
+        return _cross(self.p1, self.p2, p)
+
+    def crossing(self, prev: Point, cur: Point) -> Optional[str]:
+        """ถ้าเส้นทาง prev→cur ตัดเส้น tripwire จริง คืน "in"/"out" ไม่งั้นคืน None"""
+        s_prev, s_cur = self.side(prev), self.side(cur)
+        if s_prev == 0 or s_prev * s_cur > 0:
+            return None
+        # ปลายทั้งสองของ tripwire ต้องอยู่คนละฝั่งของเส้นทางรถ (ตัดกันเป็น segment ไม่ใช่แค่เส้นตรง)
+        if _cross(prev, cur, self.p1) * _cross(prev, cur, self.p2) > 0:
+            return None
+        if s_cur == 0:
+            return None
+        return "in" if (s_cur > 0) == (self.in_side > 0) else "out"
+
+
+def direction_from_trajectory(wires: List[Tripwire], centroids, width: int, height: int) -> Optional[str]:
+    """
+    ดูเฉพาะช่วงล่าสุดของ trajectory (จุดก่อนหน้า → จุดปัจจุบัน)
+    centroids: [(ts, cx, cy), ...] เป็น pixel → แปลงเป็นสัดส่วนก่อนเทียบกับเส้น
+    """
+    if not wires or len(centroids) < 2 or width <= 0 or height <= 0:
+        return None
+    _, px, py = centroids[-2]
+    _, cx, cy = centroids[-1]
+    prev = (px / width, py / height)
+    cur = (cx / width, cy / height)
+    for w in wires:
+        d = w.crossing(prev, cur)
+        if d:
+            return d
+    return None
+
+
+def load_tripwires(location_id: str) -> Dict[int, List[Tripwire]]:
+    """โหลด tripwire ที่ active ของสถานที่ → {camera_index: [Tripwire, ...]}"""
+    out: Dict[int, List[Tripwire]] = {}
+    try:
+        sb = get_supabase_client()
+        rows = (sb.table("camera_tripwires")
+            .select("camera_index, x1, y1, x2, y2, in_side")
+            .eq("location_id", location_id)
+            .eq("is_active", True)
+            .execute()).data or []
+    except Exception as e:
+        logging.warning(f"[tripwire] load failed, fallback to default direction. reason={e}")
+        return out
+
+    for r in rows:
+        try:
+            wire = Tripwire(
+                p1=(float(r["x1"]), float(r["y1"])),
+                p2=(float(r["x2"]), float(r["y2"])),
+                in_side=-1 if (r.get("in_side") or "right").lower() == "left" else 1)
+            out.setdefault(int(r["camera_index"]), []).append(wire)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning(f"[tripwire] skip invalid row {r}: {e}")
+    return out
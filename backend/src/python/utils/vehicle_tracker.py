@@ -0,0 +1,171 @@
+# utils/vehicle_tracker.py - ติดตามรถข้ามเฟรม (IoU tracker) เพื่อให้รถ 1 คันที่ผ่าน = 1 detection event
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+Box = Tuple[float, float, float, float]  # (x1, y1, x2, y2) พิกัด pixel
+
+
+def box_area(b: Box) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+
+def iou(a: Box, b: Box) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if inter <= 0:
+        return 0.0
+    union = box_area(a) + box_area(b) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_center(b: Box) -> Tuple[float, float]:
+    return ((b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0)
+
+
+@dataclass
+class TrackFrame:
+    """เฟรมตัวเลือกของ track (เก็บไว้เฉพาะเฟรมที่ดีที่สุด top_k เฟรม)"""
+    ts: float
+    frame: np.ndarray
+    box: Box
+    plate_area: float
+    sticker_conf: float
+
+    def score(self) -> Tuple[float, float]:
+        # ป้ายใหญ่สุดก่อน (OCR อ่านง่ายสุด) แล้วค่อยดูความมั่นใจสติกเกอร์
+        return (self.plate_area, self.sticker_conf)
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: Box
+    first_ts: float
+    last_ts: float
+    hits: int = 1
+    misses: int = 0
+    max_sticker_conf: float = 0.0
+    centroids: List[Tuple[float, float, float]] = field(default_factory=list)  # (ts, cx, cy)
+    best: Optional[TrackFrame] = None
+    direction: Optional[str] = None   # "in"/"out" เมื่อข้าม tripwire
+    emitted: bool = False             # emit event ของคันนี้ไปแล้ว (เช่น ตอนข้ามเส้น)
+    # เฟรมดีที่สุด top_k เฟรม (เรียงดีสุดก่อน, top[0] คือ best) ใช้ OCR ซ้ำเมื่อผลแรกไม่มั่นใจ
+    # เฟรมที่ห่างกันไม่ถึง min_gap วินาทีหน้าตาแทบเหมือนกัน (OCR ผิดแบบเดิม) → เก็บแค่ตัวที่ดีกว่า
+    top: List[TrackFrame] = field(default_factory=list)
+    top_k: int = 1
+    min_gap: float = 0.0
+
+    def offer(self, cand: TrackFrame) -> None:
+        self.max_sticker_conf = max(self.max_sticker_conf, cand.sticker_conf)
+        near = [f for f in self.top if abs(f.ts - cand.ts) < self.min_gap]
+        if near:
+            if any(f.score() >= cand.score() for f in near):
+                return
+            self.top = [f for f in self.top if abs(f.ts - cand.ts) >= self.min_gap]
+        self.top.append(cand)
+        self.top.sort(key=TrackFrame.score, reverse=True)
+        del self.top[self.top_k:]
+        self.best = self.top[0]
+
+
+class VehicleTracker:
+    """
+    IoU tracker แบบเบา (greedy matching) สำหรับกล้อง 1 ตัว
+    - update() รับกล่องรถของเฟรมปัจจุบัน คืน track ที่ "จบแล้ว" (รถออกจากเฟรม)
+    - track ที่เห็นน้อยกว่า min_hits เฟรมถือเป็น noise ไม่ emit
+    - track ที่ emitted แล้ว (เช่น emit ตอนข้าม tripwire) จะไม่ถูกคืนซ้ำตอนจบ
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 10,
+                 min_hits: int = 3, max_history: int = 64, top_k: int = 1, min_gap: float = 0.0):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+        self.max_history = max_history
+        self.top_k = max(1, top_k)
+        self.min_gap = min_gap
+        self.tracks: Dict[int, Track] = {}
+        self._next_id = 1
+
+    def _match(self, boxes: List[Box]) -> Tuple[Dict[int, int], List[int]]:
+        """greedy จับคู่ IoU มากสุดก่อน → ({track_id: det_idx}, det ที่ไม่มีคู่)"""
+        pairs = []
+        for tid, tr in self.tracks.items():
+            for di, b in enumerate(boxes):
+                v = iou(tr.box, b)
+                if v >= self.iou_threshold:
+                    pairs.append((v, tid, di))
+        pairs.sort(reverse=True)
+
+        matched: Dict[int, int] = {}
+        used = set()
+        for _, tid, di in pairs:
+            if tid in matched or di in used:
+                continue
+            matched[tid] = di
+            used.add(di)
+        return matched, [i for i in range(len(boxes)) if i not in used]
+
+    def update(self, detections: List[Dict[str, Any]], frame: Optional[np.ndarray],
+               ts: float) -> List[Track]:
+        """
+        detections: [{"bbox": [x1,y1,x2,y2], "plate_area"?: float, "sticker_conf"?: float}, ...]
+        plate_area = พื้นที่กล่องป้ายจาก plate localizer (0 = มีตัวหาป้ายแต่เฟรมนี้ไม่เจอป้าย)
+        ไม่มี key plate_area (ไม่ได้เปิดตัวหาป้าย) จะใช้พื้นที่กล่องรถแทน (รถใกล้กล้อง = ป้ายใหญ่)
+        """
+        boxes: List[Box] = [tuple(map(float, d["bbox"][:4])) for d in detections]
+        matched, unmatched = self._match(boxes)
+
+        def _candidate(di: int) -> Optional[TrackFrame]:
+            if frame is None:
+                return None
+            d = detections[di]
+            plate_area = float(d["plate_area"]) if d.get("plate_area") is not None else box_area(boxes[di])
+            return TrackFrame(ts=ts, frame=frame, box=boxes[di], plate_area=plate_area,
+                              sticker_conf=float(d.get("sticker_conf") or 0.0))
+
+        for tid, di in matched.items():
+            tr = self.tracks[tid]
+            tr.box = boxes[di]
+            tr.last_ts = ts
+            tr.hits += 1
+            tr.misses = 0
+            cx, cy = box_center(tr.box)
+            tr.centroids.append((ts, cx, cy))
+            del tr.centroids[:-self.max_history]
+            cand = _candidate(di)
+            if cand is not None:
+                tr.offer(cand)
+
+        for di in unmatched:
+            tr = Track(track_id=self._next_id, box=boxes[di], first_ts=ts, last_ts=ts,
+                       top_k=self.top_k, min_gap=self.min_gap)
+            self._next_id += 1
+            cx, cy = box_center(tr.box)
+            tr.centroids.append((ts, cx, cy))
+            cand = _candidate(di)
+            if cand is not None:
+                tr.offer(cand)
+            self.tracks[tr.track_id] = tr
+
+        finished: List[Track] = []
+        for tid in list(self.tracks):
+            if tid in matched:
+                continue
+            tr = self.tracks[tid]
+            if tr.first_ts == ts:  # เพิ่งสร้างในเฟรมนี้
+                continue
+            tr.misses += 1
+            if tr.misses > self.max_missed:
+                del self.tracks[tid]
+                if tr.hits >= self.min_hits and not tr.emitted:
+                    finished.append(tr)
+        return finished
+
+    def flush(self) -> List[Track]:
+        """ปิดทุก track ที่ค้างอยู่ (ใช้ตอน stop กล้อง)"""
+        done = [tr for tr in self.tracks.values() if tr.hits >= self.min_hits and not tr.emitted]
+        self.tracks.clear()
+        return done
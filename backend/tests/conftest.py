@@ -0,0 +1,7 @@
+# backend/tests/conftest.py - ให้ import โค้ด backend แบบ package (backend.src.python...) ได้จากทุกที่ที่รัน pytest
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
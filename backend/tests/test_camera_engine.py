@@ -0,0 +1,60 @@
+# backend/tests/test_camera_engine.py - supervisor ของ CameraEngineClient: restart โดยไม่ถือ lock ของ client ระหว่าง spawn
+import queue
+import threading
+
+from backend.src.python.api_service.camera_engine import CameraEngineClient, _EngineGroup
+
+
+class FakeProcess:
+    def __init__(self, alive: bool):
+        self.alive = alive
+        self.exitcode = None if alive else 1
+        self.pid = 4242
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None) -> None:
+        self.alive = False
+        self.exitcode = 0
+
+    def terminate(self) -> None:
+        self.alive = False
+
+
+def _crashed_group(client: CameraEngineClient) -> _EngineGroup:
+    g = _EngineGroup("gate", {"cameras": []}, {})
+    g.process = FakeProcess(alive=False)
+    g.events_q = queue.Queue()
+    g.result = {"opened": [0]}
+    g.next_restart = 1.0   # ถึงเวลา restart แล้ว
+    with client._lock:
+        client._groups[g.name] = g
+    return g
+
+
+def test_relaunch_spawns_outside_client_lock_and_stop_waits_for_it():
+    client = CameraEngineClient()
+    g = _crashed_group(client)
+    spawning, release = threading.Event(), threading.Event()
+    seen = {}
+
+    def slow_launch(group):
+        seen["client_lock_held"] = client._lock.locked()
+        spawning.set()
+        release.wait(5)   # spawn ช้า (import torch/ultralytics ใน process ใหม่)
+        group.cmd_q = queue.Queue()
+        group.process = FakeProcess(alive=True)
+
+    client._launch = slow_launch
+    client._ensure_supervisor()
+    assert spawning.wait(5)
+    assert seen["client_lock_held"] is False
+    assert client.cam_ids() == []   # API อื่นที่ใช้ lock ไม่ค้างระหว่าง spawn
+
+    client.stop("gate", wait=False)   # pop กลุ่มระหว่าง spawn ค้างอยู่
+    release.set()
+    client.stop("gate")               # รอ _shutdown เสร็จ
+    assert g.process.is_alive() is False
+    assert g.cmd_q.get_nowait() == "stop"
+    assert g.restarts == 1
@@ -0,0 +1,45 @@
+# backend/tests/test_capture_source.py - make_source: กันแหล่งภาพที่ไม่อนุญาต (SSRF ผ่าน stream url, bool เป็น index)
+import pytest
+
+from backend.src.python.utils import capture_source
+from backend.src.python.utils.capture_source import DeviceSource, StreamSource, make_source
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/frame",
+    "http://localhost/",
+    "http://169.254.169.254/latest/meta-data/",   # cloud metadata
+    "rtsp://192.168.1.10/stream1",
+    "rtsp://10.0.0.5/",
+    "http://[::1]/",
+    "http://[::ffff:127.0.0.1]/",
+    "http://0.0.0.0/",
+])
+def test_stream_to_non_public_address_is_rejected(url):
+    with pytest.raises(ValueError):
+        make_source(url)
+
+
+def test_public_stream_is_allowed():
+    assert isinstance(make_source("rtsp://8.8.8.8/live"), StreamSource)
+
+
+def test_allow_list_admits_lan_cameras(monkeypatch):
+    monkeypatch.setattr(capture_source, "CAMERA_STREAM_HOSTS", ("192.168.1.0/24", "localhost"))
+    assert isinstance(make_source("rtsp://192.168.1.10/stream1"), StreamSource)
+    assert isinstance(make_source("http://localhost:8080/video"), StreamSource)
+    with pytest.raises(ValueError):
+        make_source("rtsp://192.168.2.10/stream1")
+    with pytest.raises(ValueError):
+        make_source("http://169.254.169.254/")
+
+
+@pytest.mark.parametrize("spec", [True, False, {"source": True}])
+def test_bool_is_not_a_device_index(spec):
+    with pytest.raises(ValueError):
+        make_source(spec)
+
+
+def test_device_index():
+    src = make_source("2")
+    assert isinstance(src, DeviceSource) and src.index == 2
@@ -0,0 +1,67 @@
+# backend/tests/test_clip_recorder.py - คลิปก่อน/หลังเหตุการณ์: ขอคลิปตอน emit แล้วผูก detection_id ตามมาทีหลัง
+import time
+
+import cv2
+import numpy as np
+
+from backend.src.python.utils.clip_recorder import ClipRecorder
+
+
+def _jpeg(v: int) -> bytes:
+    return cv2.imencode(".jpg", np.full((48, 64, 3), v, dtype=np.uint8))[1].tobytes()
+
+
+def _feed(rec, t0, n, step=0.05):
+    for i in range(n):
+        rec.feed(1, t0 + i * step, _jpeg(i % 255))
+
+
+def _wait_clips(rec, n=1, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        rows = rec.index.list_clips()
+        if len(rows) >= n and all(r["detection_id"] for r in rows):
+            return rows
+        time.sleep(0.02)
+    return rec.index.list_clips()
+
+
+def test_retention_covers_event_delay(tmp_path):
+    rec = ClipRecorder(str(tmp_path), pre_seconds=1.0, post_seconds=0.5, max_event_delay=10.0)
+    try:
+        assert rec.buffer_for(1).retention == 11.5
+    finally:
+        rec.stop(timeout=2)
+
+
+def test_detection_attached_after_clip_written(tmp_path):
+    rec = ClipRecorder(str(tmp_path), pre_seconds=0.2, post_seconds=0.1, fps=10)
+    try:
+        now = time.time()
+        _feed(rec, now - 0.5, 10)
+        event_ts = now - 0.3
+        rec.request(1, event_ts, location_id="loc")
+        deadline = time.time() + 5
+        while not rec.index.list_clips() and time.time() < deadline:
+            time.sleep(0.02)
+        rec.attach_detection(1, event_ts, "det-1")
+        (row,) = _wait_clips(rec)
+        assert row["detection_id"] == "det-1"
+        assert row["location_id"] == "loc" and row["frames"] > 0
+    finally:
+        rec.stop(timeout=2)
+
+
+def test_detection_attached_before_clip_written(tmp_path):
+    # OCR/insert เสร็จก่อน post-roll ครบ: attach เข้าคิวหลัง request จึงทำหลังเขียนคลิปเสมอ
+    rec = ClipRecorder(str(tmp_path), pre_seconds=0.2, post_seconds=0.3, fps=10)
+    try:
+        now = time.time()
+        _feed(rec, now - 0.3, 6)
+        rec.request(1, now, location_id="loc")
+        rec.attach_detection(1, now, "det-2")
+        _feed(rec, now, 6)
+        (row,) = _wait_clips(rec)
+        assert row["detection_id"] == "det-2"
+    finally:
+        rec.stop(timeout=2)
@@ -0,0 +1,81 @@
+# backend/tests/test_ocr_cache.py - cache ผล OCR: crop ของเฟรมติดกัน (กล่องป้ายขยับ) ต้อง hit ที่ค่าดีฟอลต์ แต่ป้ายต่างกัน 1 ตัวต้อง miss
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.src.python.utils.ocr_cache import OCRCache, plate_signature, thumb_distance
+
+RESULT = {"lp_number": "1AB1234", "conf": 95.0}
+
+
+def _scene(text: str, noise: float = 3.0, seed: int = 0, bright: int = 0) -> np.ndarray:
+    """เฟรมกล้อง 640x480 ที่มีป้ายกว้าง ~110 px (ขนาดจริงที่ DETECT_WIDTH) ผ่าน JPEG แล้ว"""
+    plate = np.full((110, 330, 3), 235, np.uint8)
+    cv2.rectangle(plate, (5, 5), (325, 105), (30, 30, 30), 3)
+    cv2.putText(plate, text, (25, 70), cv2.FONT_HERSHEY_SIMPLEX, 1.9, (20, 20, 20), 5)
+    cv2.putText(plate, "BANGKOK", (100, 98), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (20, 20, 20), 2)
+    img = np.full((480, 640, 3), 90, np.uint8)
+    img[300:337, 260:370] = cv2.resize(plate, (110, 37), interpolation=cv2.INTER_AREA)
+    img = np.clip(img.astype(np.float32) + bright + np.random.default_rng(seed).normal(0, noise, img.shape), 0, 255)
+    return cv2.imdecode(cv2.imencode(".jpg", img.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 85])[1], cv2.IMREAD_COLOR)
+
+
+def _crop(img: np.ndarray, dx: int = 0, dy: int = 0, dw: int = 0) -> np.ndarray:
+    """ตัดแบบ PlateLocalizer.crops (pad 12% แล้วขยายเป็นกว้าง 320) จากกล่องที่ขยับได้ dx/dy/dw pixel"""
+    x1, y1, x2, y2 = 260 + dx, 300 + dy, 370 + dx + dw, 337 + dy
+    px, py = (x2 - x1) * 0.12, (y2 - y1) * 0.12
+    roi = img[int(y1 - py):int(y2 + py), int(x1 - px):int(x2 + px)]
+    return cv2.resize(roi, (320, int(roi.shape[0] * 320 / roi.shape[1])), interpolation=cv2.INTER_CUBIC)
+
+
+BASE = _crop(_scene("1AB 1234"))
+
+
+@pytest.mark.parametrize("dx,dy,dw,bright", [(0, 0, 0, 0), (1, 0, 0, 0), (2, 1, 0, -25), (-2, 0, 2, 10),
+                                             (3, -1, 0, 0), (0, 0, 4, 0)])
+def test_consecutive_frame_hits_at_default_max_diff(dx, dy, dw, bright):
+    cache = OCRCache()
+    cache.put("loc", *plate_signature(BASE), RESULT)
+    again = _crop(_scene("1AB 1234", seed=abs(dx * 10 + dy) + 7, bright=bright), dx, dy, dw)
+    assert cache.get("loc", *plate_signature(again)) == RESULT
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("text", ["1AB 1284", "1AB 1235", "1AB 1294", "1AB 1734", "1A8 1234", "7XY 9090"])
+def test_one_character_different_plate_misses(text):
+    cache = OCRCache()
+    cache.put("loc", *plate_signature(BASE), RESULT)
+    other = _crop(_scene(text, seed=99), dx=1)
+    assert cache.get("loc", *plate_signature(other)) is None
+
+
+def test_distance_separates_jitter_from_character_change():
+    jitter = max(thumb_distance(plate_signature(BASE)[1], plate_signature(_crop(_scene("1AB 1234", seed=s), s % 3, 0, s % 4))[1])
+                 for s in range(6))
+    change = min(thumb_distance(plate_signature(BASE)[1], plate_signature(_crop(_scene(t, seed=5)))[1])
+                 for t in ("1AB 1284", "1AB 1235", "1AB 1734"))
+    assert jitter < 0.15 < change
+
+
+def test_location_and_ttl_scope():
+    cache = OCRCache(ttl=0.05)
+    cache.put("a", *plate_signature(BASE), RESULT)
+    assert cache.get("b", *plate_signature(BASE)) is None
+    time.sleep(0.1)
+    assert cache.get("a", *plate_signature(BASE)) is None
+
+
+def test_sqlite_written_off_caller_thread_and_shared(tmp_path):
+    path = str(tmp_path / "ocr.sqlite3")
+    cache = OCRCache(sqlite_path=path)
+    with cache._db_lock:          # ดิสก์ "ช้า": put ต้องไม่รอ
+        t0 = time.monotonic()
+        cache.put("loc", *plate_signature(BASE), RESULT)
+        assert time.monotonic() - t0 < 0.5
+        assert cache.stats()["pending_writes"] == 1
+    cache.flush()
+    other = OCRCache(sqlite_path=path)   # process อื่น / หลัง restart
+    assert other.get("loc", *plate_signature(_crop(_scene("1AB 1234", seed=3), dx=1))) == RESULT
+    assert other.stats()["db_hits"] == 1
@@ -0,0 +1,154 @@
+# backend/tests/test_ocr_client.py - OCRClient ฝั่ง async: hedging ไม่ทิ้ง request ค้าง + AsyncClient ชุดเดียวใช้ซ้ำทุก loop
+import asyncio
+import threading
+
+import pytest
+
+from backend.src.python.api_service.ai4thai_ocr_LP_api import OCRClient
+
+
+@pytest.fixture
+def client():
+    c = OCRClient(url="http://ocr.invalid", api_key="test", retries=0, hedge_after=0)
+    yield c
+    c.close()
+
+
+def _slow_post(record, delay=10.0, result=None):
+    async def post(image_bytes, location_id):
+        record["started"] = record.get("started", 0) + 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            record["cancelled"] = record.get("cancelled", 0) + 1
+            raise
+        return result
+    return post
+
+
+def test_hedged_caller_cancelled_before_hedge_cancels_first(client):
+    client.hedge_after = 5.0
+    record = {}
+    client._post_once = _slow_post(record)
+
+    async def main():
+        task = asyncio.ensure_future(client._post_hedged(b"img", None))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert record == {"started": 1, "cancelled": 1}
+
+
+def test_async_client_reused_across_caller_loops(client):
+    seen = []
+
+    async def post(image_bytes, location_id):
+        seen.append((id(client._loop_state()[0]), threading.current_thread().name))
+        return {"lp_number": image_bytes.decode()}
+
+    client._post_once = post
+    assert asyncio.run(client.recognize_bytes(b"1"))["lp_number"] == "1"
+    assert asyncio.run(client.recognize_bytes(b"2"))["lp_number"] == "2"
+    assert seen[0] == seen[1] and seen[0][1] == "ocr-http"
+
+
+def test_close_releases_async_client(client):
+    async def post(image_bytes, location_id):
+        client._loop_state()
+        return {"lp_number": "1"}
+
+    client._post_once = post
+    asyncio.run(client.recognize_bytes(b"x"))
+    http = client._async[0]
+    client.close()
+    assert http.is_closed and client._async is None and client._io is None
+    assert asyncio.run(client.recognize_bytes(b"y")) == {"lp_number": "1"}   # ใช้ใหม่ได้
+
+
+def test_caller_cancel_cancels_request_on_client_loop(client):
+    client.single_flight = False
+    record = {}
+    client._post_once = _slow_post(record)
+
+    async def main():
+        task = asyncio.ensure_future(client.recognize_bytes(b"img"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert record == {"started": 1, "cancelled": 1}
+
+
+def _counting_post(record, delay=0.3):
+    async def post(image_bytes, location_id):
+        record["posts"] = record.get("posts", 0) + 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            record["cancelled"] = record.get("cancelled", 0) + 1
+            raise
+        return {"lp_number": "1กข1234", "conf": 95.0}
+    return post
+
+
+def test_single_flight_survives_leader_cancel(client):
+    record = {}
+    client._post_once = _counting_post(record)
+
+    async def main():
+        leader = asyncio.ensure_future(client.recognize_bytes(b"same"))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(client.recognize_bytes(b"same"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        return await waiter
+
+    got = asyncio.run(main())
+    assert got == {"lp_number": "1กข1234", "conf": 95.0}
+    assert record == {"posts": 1}
+    assert client.coalesced == 1 and client._inflight == {}
+
+
+def test_single_flight_cancelled_when_no_waiters_left(client):
+    record = {}
+    client._post_once = _counting_post(record, delay=10.0)
+
+    async def main():
+        a = asyncio.ensure_future(client.recognize_bytes(b"same"))
+        await asyncio.sleep(0.05)
+        b = asyncio.ensure_future(client.recognize_bytes(b"same"))
+        await asyncio.sleep(0.05)
+        a.cancel()
+        await asyncio.sleep(0.05)
+        assert "cancelled" not in record   # ยังมีคนรอ
+        b.cancel()
+        await asyncio.gather(a, b, return_exceptions=True)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert record == {"posts": 1, "cancelled": 1}
+    assert client._inflight == {}
+
+
+def test_sync_waiter_shares_async_request(client):
+    record = {}
+    client._post_once = _counting_post(record)
+    got = {}
+
+    async def main():
+        task = asyncio.ensure_future(client.recognize_bytes(b"same"))
+        await asyncio.sleep(0.05)
+        th = threading.Thread(target=lambda: got.update(sync=client.recognize_bytes_sync(b"same")))
+        th.start()
+        got["async"] = await task
+        await asyncio.get_running_loop().run_in_executor(None, th.join)
+
+    asyncio.run(main())
+    assert got["sync"] == got["async"] and got["sync"] is not got["async"]
+    assert record == {"posts": 1}
@@ -0,0 +1,95 @@
+# backend/tests/test_ocr_quota.py - token bucket + โควตารายวัน + ลำดับความสำคัญของงาน OCR ภายนอก
+import asyncio
+import time
+
+from backend.src.python.utils import ocr_quota
+from backend.src.python.utils.ocr_quota import PRIORITY_HIGH, PRIORITY_LOW, OCRQuota, TokenBucket
+
+
+def test_bucket_unlimited_when_rate_zero():
+    b = TokenBucket(0, 1)
+    assert all(b.try_take() for _ in range(100))
+    assert b.level() == 1.0 and b.wait_time() == 0.0
+
+
+def test_bucket_burst_then_empty():
+    b = TokenBucket(1.0, 3)
+    assert [b.try_take() for _ in range(4)] == [True, True, True, False]
+    assert 0.0 < b.wait_time() <= 1.0
+
+
+def test_bucket_min_level_keeps_reserve():
+    b = TokenBucket(0.001, 10)
+    taken = 0
+    while b.try_take(min_level=0.2):
+        taken += 1
+    assert taken == 8
+    assert b.try_take()   # ไม่กันสำรอง = หยิบต่อได้
+
+
+def test_bucket_refills_over_time():
+    b = TokenBucket(50.0, 1)
+    assert b.try_take() and not b.try_take()
+    time.sleep(0.05)
+    assert b.try_take()
+
+
+def test_record_and_stats_per_location():
+    q = OCRQuota(rate=0, daily_quota=0)
+    q.record("loc-a", 0.2, 1000)
+    q.record("loc-a", 0.4, 500, error="timeout")
+    q.record(None, 0.1, 10)
+    s = q.stats()
+    assert s["calls_today"] == 3
+    assert s["daily_quota"] is None and s["rate_per_sec"] is None
+    a = s["locations"]["loc-a"]
+    assert a["calls"] == 2 and a["bytes_sent"] == 1500
+    assert a["latency_avg_s"] == 0.3 and a["latency_max_s"] == 0.4
+    assert a["errors"] == {"timeout": 1}
+    assert "unknown" in s["locations"]
+
+
+def test_low_priority_refused_near_daily_quota():
+    q = OCRQuota(rate=0, daily_quota=10, reserve=0.2)
+    for _ in range(7):
+        q.record("loc", 0.1, 1)
+    assert not q.near_quota()
+    assert asyncio.run(q.acquire("loc", PRIORITY_LOW))
+    q.record("loc", 0.1, 1)
+    assert q.near_quota()
+    assert not asyncio.run(q.acquire("loc", PRIORITY_LOW))
+    assert asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+    assert q.stats()["locations"]["loc"]["throttled"] == 1
+
+
+def test_high_priority_refused_when_quota_spent():
+    q = OCRQuota(rate=0, daily_quota=2)
+    q.record("loc", 0.1, 1)
+    q.record("loc", 0.1, 1)
+    assert not asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+
+
+def test_high_priority_waits_for_token():
+    q = OCRQuota(rate=20.0, burst=1, daily_quota=0, high_wait=1.0)
+    assert asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+    t0 = time.monotonic()
+    assert asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_high_priority_gives_up_after_wait():
+    q = OCRQuota(rate=0.01, burst=1, daily_quota=0, high_wait=0.05)
+    assert asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+    assert not asyncio.run(q.acquire("loc", PRIORITY_HIGH))
+    assert q.stats()["locations"]["loc"]["throttled"] == 1
+
+
+def test_counters_reset_on_new_day(monkeypatch):
+    monkeypatch.setattr(ocr_quota, "_today", lambda: "2026-10-19")
+    q = OCRQuota(rate=0, daily_quota=1)
+    q.record("loc", 0.1, 1)
+    assert not asyncio.run(q.acquire("loc"))
+    monkeypatch.setattr(ocr_quota, "_today", lambda: "2026-10-20")
+    assert asyncio.run(q.acquire("loc"))
+    s = q.stats()
+    assert s["day"] == "2026-10-20" and s["calls_today"] == 0 and s["locations"] == {}
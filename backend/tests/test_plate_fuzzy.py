@@ -0,0 +1,63 @@
+# backend/tests/test_plate_fuzzy.py - edit distance ถ่วงน้ำหนัก + ดัชนี FuzzyPlateIndex
+import pytest
+
+from backend.src.python.utils.plate_fuzzy import FuzzyPlateIndex, plate_distance
+
+
+def test_distance_identical_is_zero():
+    assert plate_distance("1กข1234", "1กข1234") == 0.0
+
+
+def test_confusable_substitution_is_cheaper_than_unrelated():
+    assert plate_distance("1ขข1234", "1ฆข1234") == pytest.approx(0.3)
+    assert plate_distance("1ขข1234", "1ฮข1234") == pytest.approx(1.0)
+
+
+def test_confusion_cost_is_symmetric():
+    assert plate_distance("กข0123", "กขO123") == plate_distance("กขO123", "กข0123")
+
+
+def test_insert_and_delete_cost_one():
+    assert plate_distance("กข123", "กข1234") == pytest.approx(1.0)
+    assert plate_distance("กข1234", "กข123") == pytest.approx(1.0)
+
+
+def test_distance_stops_early_past_limit():
+    assert plate_distance("กข1234", "ฮฮ9999", limit=1.0) == float("inf")
+
+
+def test_candidates_ranked_by_cost_and_exclude_exact():
+    idx = FuzzyPlateIndex(["1ขข1234", "1ฆข1234", "1กข1234", "9ฮฮ9999"])
+    got = idx.candidates("1ขข1234", max_cost=1.0)
+    assert [p for p, _ in got] == ["1ฆข1234", "1กข1234"]
+    assert got[0][1] == pytest.approx(0.3)
+    assert all(p != "1ขข1234" for p, _ in got)
+
+
+def test_candidates_respect_max_cost():
+    idx = FuzzyPlateIndex(["1กข1234"])
+    assert idx.candidates("1ฮข1234", max_cost=0.8) == []
+    assert idx.candidates("1ฮข1234", max_cost=1.0) == [("1กข1234", 1.0)]
+
+
+def test_candidates_found_across_length_change():
+    idx = FuzzyPlateIndex(["กข1234"])
+    assert idx.candidates("กข123", max_cost=1.0) == [("กข1234", 1.0)]
+
+
+def test_add_discard_keeps_index_consistent():
+    idx = FuzzyPlateIndex(max_edits=2)
+    idx.add("กข1234")
+    idx.add("กข1234")
+    assert len(idx) == 1
+    idx.discard("กข1234")
+    assert len(idx) == 0
+    assert idx.candidates("กข1235", max_cost=2.0) == []
+    assert idx._keys == {}
+    idx.discard("ไม่มีอยู่")   # ไม่พัง
+
+
+def test_empty_query_and_plate_ignored():
+    idx = FuzzyPlateIndex(["", "กข1"])
+    assert len(idx) == 1
+    assert idx.candidates("", max_cost=5.0) == []
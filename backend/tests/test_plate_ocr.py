@@ -0,0 +1,112 @@
+# backend/tests/test_plate_ocr.py - OCR ป้ายจากเฟรม: กล้องสดอ่านเฉพาะป้ายของรถใน track (ไม่ใช่ป้ายที่มั่นใจสุดในฉาก)
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.src.python.api_service import plate_ocr
+from backend.src.python.utils.plate_localizer import PlateLocalizer, pick_plate_in_box
+
+# ฉากคิวหน้าไม้กั้น: รถ A ซ้าย (ป้ายสีขาว) รถ B ขวา (ป้ายสีเทา)
+CAR_A = (0.0, 100.0, 300.0, 400.0)
+CAR_B = (340.0, 100.0, 640.0, 400.0)
+PLATE_A = [100.0, 320.0, 200.0, 350.0]
+PLATE_B = [440.0, 320.0, 540.0, 350.0]
+
+
+def _scene() -> np.ndarray:
+    img = np.zeros((480, 640, 3), dtype=np.uint8)
+    img[320:350, 100:200] = 255
+    img[320:350, 440:540] = 128
+    return img
+
+
+class FakeLocalizer(PlateLocalizer):
+    def available(self) -> bool:
+        return True
+
+    def detect(self, img):
+        return [(PLATE_B, 0.95), (PLATE_A, 0.80)]
+
+
+class FakeChain:
+    """อ่านป้ายจากความสว่างของภาพ: ขาว = รถ A, เทา = รถ B (ป้ายของ B มั่นใจกว่าเสมอ)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def recognize(self, jpeg, location_id=None, priority=None):
+        self.calls += 1
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        bright = img.max()
+        if bright > 200:
+            return {"lp_number": "1กข1111", "conf": 80.0}
+        if bright > 100:
+            return {"lp_number": "2ฮฮ2222", "conf": 99.0}
+        return None
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(plate_ocr, "get_plate_localizer", lambda: FakeLocalizer(model_path=""))
+    monkeypatch.setattr(plate_ocr, "get_ocr_chain", lambda: fake)
+    monkeypatch.setattr(plate_ocr, "get_ocr_cache", lambda: None)
+    return fake
+
+
+def test_pick_plate_in_box_largest_then_central():
+    small = ([110.0, 330.0, 130.0, 340.0], 0.99)
+    big = ([100.0, 320.0, 200.0, 350.0], 0.5)
+    outside = ([440.0, 320.0, 600.0, 360.0], 0.99)
+    assert pick_plate_in_box([small, big, outside], CAR_A) == [big]
+    assert pick_plate_in_box([outside], CAR_A) == []
+    left = ([10.0, 320.0, 60.0, 340.0], 0.9)
+    mid = ([125.0, 320.0, 175.0, 340.0], 0.9)
+    assert pick_plate_in_box([left, mid], CAR_A) == [mid]
+
+
+def test_without_car_box_reads_every_plate(chain):
+    got = asyncio.run(plate_ocr.recognize_plates(_scene()))
+    assert got["lp_number"] == "2ฮฮ2222"
+    assert len(got["plates"]) == 2
+    assert chain.calls == 2
+
+
+def test_car_box_reads_only_that_cars_plate(chain):
+    got = asyncio.run(plate_ocr.recognize_plates(_scene(), car_box=CAR_A))
+    assert got["lp_number"] == "1กข1111"
+    assert "plates" not in got
+    assert chain.calls == 1
+
+
+def test_car_box_without_plate_sends_car_region_not_scene(chain, monkeypatch):
+    class NoPlate(FakeLocalizer):
+        def detect(self, img):
+            return []
+
+    monkeypatch.setattr(plate_ocr, "get_plate_localizer", lambda: NoPlate(model_path=""))
+    got = asyncio.run(plate_ocr.recognize_plates(_scene(), car_box=CAR_A))
+    assert got["lp_number"] == "1กข1111"
+    got = asyncio.run(plate_ocr.recognize_plates(_scene(), car_box=CAR_B))
+    assert got["lp_number"] == "2ฮฮ2222"
+
+
+def test_track_vote_never_mixes_plates_of_other_cars(chain):
+    # รถ A กำกวม (conf 80 < OCR_REQUERY_CONF) → อ่านเฟรมสำรองเพิ่ม; ป้าย B (conf 99) อยู่ในทุกเฟรม
+    frames = [_scene(), _scene(), _scene()]
+    got = asyncio.run(plate_ocr.recognize_track_plates(frames, boxes=[CAR_A, CAR_A, CAR_A]))
+    assert got["lp_number"] == "1กข1111"
+    assert got["ocr_votes"] == 3 and got["ocr_requeried"] == 2
+    assert chain.calls == 3   # 1 crop ต่อเฟรม ไม่ใช่ทุกป้ายในเฟรม
+
+
+def test_track_vote_follows_box_per_frame(chain):
+    # เฟรมสำรองรถขยับไปอีกตำแหน่ง: กล่องของเฟรมนั้นชี้ป้ายที่ถูกต้อง
+    moved = np.zeros((480, 640, 3), dtype=np.uint8)
+    moved[320:350, 440:540] = 255
+    moved[320:350, 100:200] = 128
+    got = asyncio.run(plate_ocr.recognize_track_plates([_scene(), moved], boxes=[CAR_A, CAR_B]))
+    assert got["lp_number"] == "1กข1111"
+    assert got["ocr_votes"] == 2
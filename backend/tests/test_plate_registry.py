@@ -0,0 +1,94 @@
+# backend/tests/test_plate_registry.py - ดัชนีป้ายทะเบียน: fallback เมื่อไม่มี updated_at และ incremental refresh
+import pytest
+from postgrest.exceptions import APIError
+
+from backend.src.python.api_service import plate_registry
+from backend.src.python.api_service.plate_registry import PlateRegistry
+
+LOC = "loc-1"
+LICENSE = "LIC-1"
+TS = "2026-01-01T00:00:00+00:00"
+
+
+class FakeQuery:
+    def __init__(self, sb, table, cols):
+        self.sb, self.table, self.cols = sb, table, cols
+        self.filters = []
+
+    def select(self, cols):
+        return FakeQuery(self.sb, self.table, cols)
+
+    def eq(self, col, val):
+        return self
+
+    def single(self):
+        return self
+
+    def gt(self, col, val):
+        self.filters.append(("gt", col, val))
+        return self
+
+    def gte(self, col, val):
+        self.filters.append(("gte", col, val))
+        return self
+
+    def range(self, start, end):
+        return self
+
+    def execute(self):
+        if self.table == "locations":
+            return type("R", (), {"data": {"location_license": LICENSE, "location_name": "Gate"}})()
+        self.sb.plate_queries.append((self.cols, self.filters))
+        if self.sb.errors:
+            raise self.sb.errors.pop(0)
+        rows = self.sb.rows
+        for op, col, val in self.filters:
+            rows = [r for r in rows if (r[col] >= val if op == "gte" else r[col] > val)]
+        if "updated_at" not in self.cols:
+            rows = [{k: v for k, v in r.items() if k != "updated_at"} for r in rows]
+        return type("R", (), {"data": rows})()
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.errors = []
+        self.plate_queries = []
+
+    def table(self, name):
+        return FakeQuery(self, name, "*")
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    fake = FakeSupabase([{"license_id": 1, "license_text": "1กข1111", "license_local": "", "updated_at": TS}])
+    monkeypatch.setattr(plate_registry, "get_supabase_client", lambda: fake)
+    return fake
+
+
+def test_missing_updated_at_disables_incremental(sb):
+    sb.errors.append(APIError({"code": "42703", "message": "column license_plate.updated_at does not exist"}))
+    reg = PlateRegistry(fuzzy=False)
+    assert reg.lookup(LOC, "1กข1111", None)["is_registered"]
+    assert reg.stats()["incremental"] is False
+    assert "updated_at" not in sb.plate_queries[-1][0]
+
+
+def test_other_errors_keep_incremental_mode(sb):
+    sb.errors.append(APIError({"code": "57014", "message": "canceling statement due to statement timeout"}))
+    reg = PlateRegistry(fuzzy=False)
+    with pytest.raises(APIError):
+        reg.lookup(LOC, "1กข1111", None)
+    assert reg.stats()["incremental"] is True
+    assert reg.lookup(LOC, "1กข1111", None)["is_registered"]
+
+
+def test_refresh_picks_up_rows_sharing_the_last_timestamp(sb):
+    reg = PlateRegistry(fuzzy=False, miss_recheck=0)
+    assert not reg.lookup(LOC, "2ฮฮ2222", None)["is_registered"]
+    # แถวใหม่ที่ updated_at เท่ากับแถวล่าสุดที่โหลดไปแล้ว (เขียนใน transaction/วินาทีเดียวกัน)
+    sb.rows.append({"license_id": 2, "license_text": "2ฮฮ2222", "license_local": "", "updated_at": TS})
+    got = reg.lookup(LOC, "2ฮฮ2222", None)
+    assert got["is_registered"] and got["matched_license_id"] == 2
+    assert sb.plate_queries[-1][1] == [("gte", "updated_at", TS)]
+    assert reg.stats()["plates"] == 2   # แถวเดิมที่ได้ซ้ำไม่ถูกนับสองครั้ง
@@ -0,0 +1,58 @@
+# backend/tests/test_plate_vote.py - โหวตผล OCR หลายเฟรมของป้ายเดียวกัน
+from backend.src.python.utils.plate_vote import vote_plates
+
+
+def _read(lp, conf=90.0, province="th-10:Bangkok (กรุงเทพมหานคร)"):
+    return {"lp_number": lp, "conf": conf, "province": province}
+
+
+def test_empty_and_single():
+    assert vote_plates([]) is None
+    one = _read("1กข1234")
+    got = vote_plates([one])
+    assert got == one and got is not one
+
+
+def test_per_character_vote_fixes_single_frame_errors():
+    got = vote_plates([_read("1ขข1234"), _read("1ฆข1234"), _read("1ขข1284")])
+    assert got["lp_number"] == "1ขข1234"
+    assert got["ocr_votes"] == 3
+    assert "ocr_fused" not in got
+
+
+def test_fused_plate_not_seen_in_any_frame_is_flagged():
+    got = vote_plates([_read("1ฆข1234"), _read("1ขข1284"), _read("1ขข9234")])
+    assert got["lp_number"] == "1ขข1234"
+    assert got["ocr_fused"] is True
+
+
+def test_spaces_ignored_and_length_groups_by_weight():
+    got = vote_plates([_read("1กข 1234", 90), _read("1กข1234", 80), _read("กข123", 99)])
+    assert got["lp_number"] == "1กข1234"
+    assert got["ocr_votes"] == 2
+
+
+def test_tie_goes_to_more_confident_frame():
+    got = vote_plates([_read("กข1234", 60), _read("กข1235", 95)])
+    assert got["lp_number"] == "กข1235"
+
+
+def test_conf_scaled_by_agreement():
+    agree = vote_plates([_read("กข1234", 90), _read("กข1234", 80)])
+    assert agree["conf"] == 90.0
+    split = vote_plates([_read("กข1234", 90), _read("กข1235", 80)])
+    assert split["conf"] < 90.0
+
+
+def test_province_voted_by_code():
+    got = vote_plates([
+        _read("กข1234", 90, province="เชียงใหม่"),
+        _read("กข1234", 80, province="th-50:Chiang Mai (เชียงใหม่)"),
+        _read("กข1234", 95, province="กทม"),
+    ])
+    assert got["province"] == "เชียงใหม่"
+
+
+def test_missing_province_keeps_voted_one():
+    got = vote_plates([_read("กข1234", 90, province=None), _read("กข1234", 80, province="นครปฐม")])
+    assert got["province"] == "นครปฐม"
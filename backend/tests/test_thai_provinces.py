@@ -0,0 +1,61 @@
+# backend/tests/test_thai_provinces.py - แปลงข้อความจังหวัดรูปแบบต่างๆ เป็น (code, english, thai)
+import pytest
+
+from backend.src.python.utils.thai_provinces import (
+    PROVINCES, ai4thai_label, match_thai_province, parse_province, province_code, province_thai,
+)
+
+BANGKOK = ("TH-10", "Bangkok", "กรุงเทพมหานคร")
+
+
+def test_table_is_complete_and_unique():
+    assert len(PROVINCES) == 77
+    assert len({p[0] for p in PROVINCES}) == 77
+    assert len({p[2] for p in PROVINCES}) == 77
+
+
+@pytest.mark.parametrize("raw", [
+    "th-10:Bangkok (กรุงเทพมหานคร)",
+    "TH-10",
+    "th-10:Bangkok",
+    "  th-10 : Bangkok ( กรุงเทพมหานคร ) ",
+    "Bangkok",
+    "bangkok metropolis",
+    "กรุงเทพมหานคร",
+    "กทม",
+    "กรุงเทพฯ",
+])
+def test_bangkok_forms(raw):
+    assert parse_province(raw) == BANGKOK
+
+
+def test_english_ignores_case_and_spaces():
+    assert parse_province("chiangmai") == ("TH-50", "Chiang Mai", "เชียงใหม่")
+    assert parse_province("NAKHON PATHOM")[0] == "TH-73"
+
+
+def test_thai_prefix_stripped():
+    assert province_code("จังหวัดเชียงใหม่") == "TH-50"
+    assert province_code("จ.นครปฐม") == "TH-73"
+
+
+def test_unknown_code_falls_back_to_thai_name():
+    assert province_code("th-99:Nowhere (เชียงใหม่)") == "TH-50"
+
+
+def test_fuzzy_thai_ocr_misread():
+    assert province_code("เชียงไหม่") == "TH-50"
+    assert match_thai_province("นครปธม") == ("TH-73", "Nakhon Pathom", "นครปฐม")
+
+
+@pytest.mark.parametrize("raw", [None, "", "   ", "Atlantis", "TH-99", "ฮฮฮฮฮฮฮฮฮฮ"])
+def test_unknown_returns_none(raw):
+    assert parse_province(raw) is None
+    assert province_code(raw) is None
+    assert province_thai(raw) is None
+
+
+def test_ai4thai_label_round_trip():
+    for p in PROVINCES:
+        assert parse_province(ai4thai_label(*p)) == p
+    assert ai4thai_label(*BANGKOK) == "th-10:Bangkok (กรุงเทพมหานคร)"
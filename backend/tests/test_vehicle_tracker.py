@@ -0,0 +1,109 @@
+# backend/tests/test_vehicle_tracker.py - IoU tracker: 1 คันที่ผ่าน = 1 track + เลือกเฟรมที่ดีที่สุดไป OCR
+import numpy as np
+import pytest
+
+from backend.src.python.utils.vehicle_tracker import TrackFrame, VehicleTracker, box_area, iou
+
+FRAME = np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def _det(x, w=100, **extra):
+    return {"bbox": [x, 0, x + w, 100], **extra}
+
+
+def _drive(tracker, xs, start_ts=0.0, **extra):
+    finished = []
+    for i, x in enumerate(xs):
+        finished += tracker.update([_det(x, **extra)], FRAME, start_ts + i)
+    return finished
+
+
+def test_box_helpers():
+    assert box_area((0, 0, 10, 5)) == 50
+    assert box_area((10, 0, 0, 5)) == 0
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == pytest.approx(1 / 3)
+    assert iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
+
+
+def test_one_vehicle_one_track_finished_after_max_missed():
+    tr = VehicleTracker(max_missed=2, min_hits=3)
+    assert _drive(tr, [0, 10, 20, 30]) == []
+    assert tr.update([], FRAME, 4) == []
+    assert tr.update([], FRAME, 5) == []
+    done = tr.update([], FRAME, 6)
+    assert len(done) == 1
+    assert done[0].hits == 4 and done[0].track_id == 1
+    assert tr.tracks == {}
+
+
+def test_short_track_is_noise():
+    tr = VehicleTracker(max_missed=0, min_hits=3)
+    _drive(tr, [0, 10])
+    assert tr.update([], FRAME, 2) == []
+    assert tr.tracks == {}
+
+
+def test_emitted_track_not_returned_again():
+    tr = VehicleTracker(max_missed=0, min_hits=1)
+    _drive(tr, [0, 10])
+    tr.tracks[1].emitted = True
+    assert tr.update([], FRAME, 2) == []
+
+
+def test_two_vehicles_tracked_separately():
+    tr = VehicleTracker(max_missed=0, min_hits=1)
+    for ts, xs in enumerate([(0, 500), (10, 490), (20, 480)]):
+        tr.update([_det(x) for x in xs], FRAME, ts)
+    assert sorted(t.box[0] for t in tr.tracks.values()) == [20, 480]
+    assert len(tr.flush()) == 2
+    assert tr.tracks == {}
+
+
+def test_best_frame_ranked_by_plate_area_not_car_box():
+    tr = VehicleTracker(min_hits=1)
+    tr.update([_det(0, w=200, plate_area=50.0)], FRAME, 0)
+    tr.update([_det(10, w=180, plate_area=400.0)], FRAME, 1)
+    tr.update([_det(20, w=160, plate_area=0.0)], FRAME, 2)
+    (track,) = tr.flush()
+    assert track.best.ts == 1 and track.best.plate_area == 400.0
+
+
+def test_car_box_area_used_without_localizer():
+    tr = VehicleTracker(min_hits=1)
+    tr.update([_det(0, w=100)], FRAME, 0)
+    tr.update([_det(10, w=120)], FRAME, 1)
+    (track,) = tr.flush()
+    assert track.best.ts == 1 and track.best.plate_area == box_area((10, 0, 130, 100))
+
+
+def test_sticker_conf_breaks_ties():
+    tr = VehicleTracker(min_hits=1)
+    tr.update([_det(0, plate_area=10.0, sticker_conf=0.4)], FRAME, 0)
+    tr.update([_det(0, plate_area=10.0, sticker_conf=0.9)], FRAME, 1)
+    (track,) = tr.flush()
+    assert track.best.ts == 1 and track.max_sticker_conf == 0.9
+
+
+def test_top_k_respects_min_gap():
+    tr = VehicleTracker(min_hits=1, top_k=3, min_gap=1.5)
+    for ts, area in enumerate([10.0, 30.0, 20.0, 25.0, 5.0]):
+        tr.update([_det(0, plate_area=area)], FRAME, float(ts))
+    (track,) = tr.flush()
+    ts = [f.ts for f in track.top]
+    assert len(ts) <= 3
+    assert all(abs(a - b) >= 1.5 for i, a in enumerate(ts) for b in ts[i + 1:])
+    assert track.best is track.top[0] and track.best.plate_area == 30.0
+
+
+def test_no_frame_keeps_no_candidate():
+    tr = VehicleTracker(min_hits=1)
+    tr.update([_det(0)], None, 0)
+    (track,) = tr.flush()
+    assert track.best is None and track.top == []
+
+
+def test_track_frame_score_order():
+    a = TrackFrame(0, FRAME, (0, 0, 1, 1), plate_area=10, sticker_conf=0.1)
+    b = TrackFrame(1, FRAME, (0, 0, 1, 1), plate_area=5, sticker_conf=0.9)
+    assert a.score() > b.score()
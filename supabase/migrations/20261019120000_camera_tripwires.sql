@@ -0,0 +1,22 @@
+-- camera_tripwires: เส้น tripwire เสมือนต่อกล้อง ใช้หา direction (in/out) ของรถในกล้องสด
+-- อ่านโดย backend/src/python/utils/tripwire.py (load_tripwires) ตอน engine ของสถานที่เริ่มทำงาน
+--   camera_index : cam_id ของกล้องใน engine (webcam = index ของ OpenCV, stream/ไฟล์ = id ที่ได้ตอน start-camera)
+--   x1,y1 → x2,y2: ปลายเส้นเป็นสัดส่วนของภาพ 0..1 (0,0 = มุมซ้ายบน)
+--   in_side      : ฝั่งของเส้นเมื่อมองจาก (x1,y1) ไป (x2,y2) ที่ถือว่า "เข้า" — รถข้ามไปฝั่งนั้น = in, ข้ามกลับ = out
+create table if not exists public.camera_tripwires (
+    tripwire_id   uuid primary key default gen_random_uuid(),
+    location_id   uuid not null references public.locations (location_id) on delete cascade,
+    camera_index  integer not null,
+    x1            double precision not null check (x1 between 0 and 1),
+    y1            double precision not null check (y1 between 0 and 1),
+    x2            double precision not null check (x2 between 0 and 1),
+    y2            double precision not null check (y2 between 0 and 1),
+    in_side       text not null default 'right' check (in_side in ('left', 'right')),
+    is_active     boolean not null default true,
+    created_at    timestamptz not null default now(),
+    check (x1 <> x2 or y1 <> y2)
+);
+
+create index if not exists camera_tripwires_location_active_idx
+    on public.camera_tripwires (location_id)
+    where is_active;